@@ -0,0 +1,12 @@
+"""Offline benchmarks for dpy-dialog.
+
+Dialogs run against the stand-ins in `benchmarks.fakes` (which the
+tests use too), so no Discord connection (or network access at all) is
+needed. Run
+
+    python -m benchmarks
+
+from the repository root; the package in src/ is benchmarked, whether or
+not dpydialog is installed. See `python -m benchmarks --help`. Results
+can be printed as JSON lines (`--json`) to compare runs in CI.
+"""
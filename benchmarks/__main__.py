@@ -0,0 +1,79 @@
+import os
+import sys
+
+# run from a checkout, the benchmarks measure the package in src/ rather
+# than whichever copy is installed
+_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__))), "src")
+if os.path.isdir(_SRC):
+    sys.path.insert(0, _SRC)
+
+from .scenarios import SCENARIOS
+from . import replay
+from . import bench
+import argparse
+import json
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+            prog="python -m benchmarks",
+            description="Benchmark dialogs against a fake bot.")
+    parser.add_argument("-n", "--dialogs", type=int, default=1000,
+                        help="dialogs open at once (default: %(default)s)")
+    parser.add_argument("-i", "--invalid", type=int, default=3,
+                        help="rejected replies per dialog "
+                             "(default: %(default)s)")
+    parser.add_argument("-k", "--kinds", default=",".join(SCENARIOS),
+                        help="comma separated dialog kinds "
+                             "(default: %(default)s)")
+    parser.add_argument("--json", action="store_true",
+                        help="print results as JSON lines")
+    parser.add_argument("--replay", metavar="TRACE",
+                        help="replay a trace written by TraceRecorder "
+                             "instead")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed, 0 for as fast as possible "
+                             "(default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.replay is not None:
+        result = replay.replay(args.replay, args.speed)
+        if args.json:
+            print(json.dumps(result._asdict()))
+        else:
+            print(f"{'dialogs':>8} {'msgs':>8} {'seconds':>8} "
+                  f"{'msgs/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+            print(f"{result.dialogs:>8} {result.messages:>8} "
+                  f"{result.seconds:>8.2f} "
+                  f"{result.messages_per_second:>10.0f} "
+                  f"{result.p50_latency * 1000:>8.3f} "
+                  f"{result.p99_latency * 1000:>8.3f}")
+        return 0
+
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+    unknown = set(kinds) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown kinds: {', '.join(sorted(unknown))}")
+
+    if not args.json:
+        print(f"{'kind':<8} {'dialogs':>8} {'msgs':>8} {'msgs/s':>10} "
+              f"{'p50 ms':>8} {'p99 ms':>8} {'B/dialog':>10} "
+              f"{'B/msg':>8} {'blocks/msg':>10}")
+    for kind in kinds:
+        result = bench.run(SCENARIOS[kind], args.dialogs, args.invalid)
+        if args.json:
+            print(json.dumps(result._asdict()))
+            continue
+        print(f"{result.kind:<8} {result.dialogs:>8} {result.messages:>8} "
+              f"{result.messages_per_second:>10.0f} "
+              f"{result.p50_latency * 1000:>8.3f} "
+              f"{result.p99_latency * 1000:>8.3f} "
+              f"{result.bytes_per_dialog:>10.0f} "
+              f"{result.alloc_bytes_per_message:>8.0f} "
+              f"{result.retained_blocks_per_message:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Runs a scenario against N concurrent dialogs and measures it.
+
+Each benchmark runs twice: once plainly, for throughput and latency,
+and once under `tracemalloc`, for memory, since tracing slows every
+allocation down.
+"""
+from . import fakes
+from .scenarios import Scenario
+import collections
+import tracemalloc
+import asyncio
+import typing
+import time
+import sys
+import dpydialog
+
+
+class Result(typing.NamedTuple):
+    kind: str
+    dialogs: int
+    messages: int
+    seconds: float
+    messages_per_second: float
+    p50_latency: float
+    p99_latency: float
+    bytes_per_dialog: float
+    alloc_bytes_per_message: float
+    retained_blocks_per_message: float
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Harness:
+    """N dialogs of one scenario, each in its own channel.
+
+    """
+    def __init__(self, scenario: Scenario, dialogs: int,
+                 **cfg_flags) -> None:
+        self.scenario = scenario
+        self.bot = fakes.Bot()
+        self.instrumentation = dpydialog.Instrumentation()
+        # dispatch times of replies not yet picked up, per dialog
+        self.pending: dict[int, collections.deque[float]] = {}
+        self.latencies: list[float] = []
+        self.instrumentation.subscribe(self._on_event)
+        self.contexts = [fakes.context(self.bot, channel_id=i, user_id=i,
+                                       guild=fakes.Guild(i % 10),
+                                       record=False)
+                         for i in range(1, dialogs + 1)]
+        self.dialogs = [dpydialog.Dialog(dpydialog.Config(
+                            self.bot, None, ctx,
+                            instrumentation=self.instrumentation,
+                            **cfg_flags))
+                        for ctx in self.contexts]
+        self.tasks: list[asyncio.Task] = []
+
+    def _on_event(self, event: dpydialog._instrument.Event) -> None:
+        # dispatch latency: from handing a message to the bot until the
+        # dialog waiting on it picks it up
+        if event.name != "message_received":
+            return
+        pending = self.pending.get(event.identity.user_id)
+        if pending:
+            self.latencies.append(time.perf_counter() - pending.popleft())
+
+    async def open(self) -> None:
+        self.tasks = [asyncio.ensure_future(self.scenario.run(dialog))
+                      for dialog in self.dialogs]
+        # let every dialog send its prompt and start waiting
+        while sum(ctx.channel.send_count for ctx in self.contexts) < len(
+                self.contexts):
+            await asyncio.sleep(0)
+
+    async def feed(self, replies: list[tuple[str, tuple]]) -> int:
+        sent = 0
+        for content, attachments in replies:
+            for ctx in self.contexts:
+                now = time.perf_counter()
+                self.pending.setdefault(ctx.author.id,
+                                        collections.deque()).append(now)
+                await self.bot.dispatch(fakes.Message(
+                        ctx.channel, fakes.User(ctx.author.id), content,
+                        attachments, created=now))
+                sent += 1
+            # one reply per dialog per round, like users taking turns
+            await asyncio.sleep(0)
+        return sent
+
+    async def close(self) -> None:
+        await asyncio.gather(*self.tasks)
+        for dialog in self.dialogs:
+            await dialog.close()
+
+
+async def _throughput(scenario: Scenario, dialogs: int, invalid: int,
+                      **cfg_flags) -> tuple[int, float, list[float]]:
+    harness = Harness(scenario, dialogs, **cfg_flags)
+    await harness.open()
+    started = time.perf_counter()
+    messages = await harness.feed(scenario.replies(invalid))
+    await harness.close()
+    return messages, time.perf_counter() - started, harness.latencies
+
+
+async def _memory(scenario: Scenario, dialogs: int, invalid: int,
+                  **cfg_flags) -> tuple[float, float, float]:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        harness = Harness(scenario, dialogs, **cfg_flags)
+        await harness.open()
+        opened, _ = tracemalloc.get_traced_memory()
+
+        # rejected replies keep every dialog open, so what they leave
+        # behind is what each message costs an open dialog
+        replies = scenario.replies(invalid)
+        tracemalloc.reset_peak()
+        blocks = sys.getallocatedblocks()
+        rejected = await harness.feed(replies[:invalid])
+        retained = sys.getallocatedblocks() - blocks
+        _, peak = tracemalloc.get_traced_memory()
+        await harness.feed(replies[invalid:])
+        await harness.close()
+    finally:
+        tracemalloc.stop()
+    per_message = max(rejected, 1)
+    return ((opened - before) / dialogs, (peak - opened) / per_message,
+            retained / per_message)
+
+
+def run(scenario: Scenario, dialogs: int = 1000, invalid: int = 3,
+        **cfg_flags) -> Result:
+    """Benchmark `scenario` with `dialogs` dialogs open at once.
+
+    Each dialog is sent `invalid` rejected replies before the replies
+    that complete it. `cfg_flags` are passed on to every `Config`.
+    """
+    messages, seconds, latencies = asyncio.run(
+            _throughput(scenario, dialogs, invalid, **cfg_flags))
+    per_dialog, alloc, retained = asyncio.run(
+            _memory(scenario, dialogs, invalid, **cfg_flags))
+    return Result(scenario.kind, dialogs, messages, seconds,
+                  messages / seconds if seconds else float("inf"),
+                  percentile(latencies, 0.5), percentile(latencies, 0.99),
+                  per_dialog, alloc, retained)
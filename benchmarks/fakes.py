@@ -0,0 +1,255 @@
+"""Stand-ins for the parts of discord.py that dialogs talk to.
+
+Shared by the benchmarks and the tests. Channels record what is sent to
+them and the messages they hold, for tests to look at; benchmarks create
+theirs with `record=False`, so they only count their sends and hold on
+to nothing.
+"""
+from discord.ext import commands
+import dpydialog
+import discord
+import itertools
+import asyncio
+import typing
+
+
+_ids = itertools.count(1)
+
+
+class User:
+    __slots__ = ("id", "roles", "bot")
+
+    def __init__(self, id: int, roles: typing.Iterable[int] = (),
+                 bot: bool = False) -> None:
+        self.id = id
+        self.roles = tuple(Role(role) for role in roles)
+        self.bot = bot
+
+
+class Role:
+    __slots__ = ("id",)
+
+    def __init__(self, id: int) -> None:
+        self.id = id
+
+
+class Guild:
+    __slots__ = ("id",)
+
+    def __init__(self, id: int) -> None:
+        self.id = id
+
+
+class Attachment:
+    __slots__ = ("id", "filename", "content_type", "size", "url", "data",
+                 "reads")
+
+    def __init__(self, filename: str, content_type: str | None = None,
+                 size: int = 1024, data: bytes = b"") -> None:
+        self.id = next(_ids)
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.url = f"https://cdn.invalid/{self.id}/{filename}"
+        self.data = data
+        self.reads = 0
+
+    async def read(self) -> bytes:
+        self.reads += 1
+        return self.data
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        return {"id": self.id, "filename": self.filename, "size": self.size,
+                "url": self.url, "proxy_url": self.url,
+                "content_type": self.content_type}
+
+
+class Message:
+    __slots__ = ("id", "content", "channel", "author", "guild",
+                 "attachments", "embeds", "created", "edits")
+
+    def __init__(self, channel: "Channel", author: User, content: str = "",
+                 attachments: typing.Iterable[Attachment] = (),
+                 embeds: list = None, created: float = 0.0) -> None:
+        self.id = next(_ids)
+        self.content = content
+        self.channel = channel
+        self.author = author
+        self.guild = channel.guild
+        self.attachments = list(attachments)
+        self.embeds = embeds or []
+        # when the message was dispatched, for latency measurements
+        self.created = created
+        # messages in channels that don't record share an empty tuple, so
+        # benchmarks don't pay for a list per message
+        self.edits: list[dict[str, typing.Any]] | tuple = ()
+        if channel.record:
+            self.edits = []
+            channel.messages[self.id] = self
+
+    async def edit(self, **kwargs) -> "Message":
+        self.channel.edit_count += 1
+        if self.channel.record:
+            self.edits.append(kwargs)
+            self.channel.edits.append((self, kwargs))
+        return self
+
+    async def reply(self, **kwargs) -> "Message":
+        return await self.channel.send(reference=self, **kwargs)
+
+
+class NotFoundResponse:
+    status = 404
+    reason = "Not Found"
+
+
+class Channel(discord.abc.Messageable):
+    """A channel that records what is sent to it instead of sending it.
+
+    """
+    __slots__ = ("id", "guild", "record", "send_count", "edit_count",
+                 "sent", "edits", "messages", "me")
+
+    def __init__(self, id: int, guild: Guild | None = None,
+                 record: bool = True) -> None:
+        self.id = id
+        self.guild = guild
+        self.record = record
+        self.send_count = 0
+        self.edit_count = 0
+        self.sent: list[dict[str, typing.Any]] = []
+        self.edits: list[tuple[Message, dict[str, typing.Any]]] = []
+        self.messages: dict[int, Message] = {}
+        self.me = User(0, bot=True)
+
+    async def send(self, content: str = None, **kwargs) -> Message:
+        self.send_count += 1
+        if self.record:
+            self.sent.append(kwargs)
+        embeds = [kwargs["embed"]] if "embed" in kwargs else kwargs.get(
+                "embeds")
+        return Message(self, self.me, content or "", embeds=embeds)
+
+    async def fetch_message(self, id: int) -> Message:
+        try:
+            return self.messages[id]
+        except KeyError:
+            raise discord.NotFound(NotFoundResponse(), "Unknown Message")
+
+    @property
+    def embeds(self) -> list[typing.Any]:
+        return [kwargs["embed"] for kwargs in self.sent if "embed" in kwargs]
+
+
+class Context(commands.Context):
+    """A `commands.Context` for a message sent in a `Channel`.
+
+    `commands.Context.__init__` is skipped; `channel`, `author` and
+    `guild` are derived from `message` as usual.
+    """
+    def __init__(self, message: Message, bot: "Bot") -> None:
+        self.message = message
+        self.bot = bot
+        self.interaction = None
+
+    async def send(self, content: str = None, **kwargs) -> Message:
+        return await self.message.channel.send(content, **kwargs)
+
+
+class InteractionResponse:
+    def __init__(self) -> None:
+        self.sent: list[dict[str, typing.Any]] = []
+        self.edits: list[dict[str, typing.Any]] = []
+
+    async def send_message(self, content: str = None, **kwargs) -> None:
+        self.sent.append({"content": content, **kwargs})
+
+    async def edit_message(self, **kwargs) -> None:
+        self.edits.append(kwargs)
+
+
+class Interaction:
+    """A component interaction, as the component router sees it.
+
+    """
+    type = discord.InteractionType.component
+
+    def __init__(self, user: User, custom_id: str,
+                 values: list[str] = None) -> None:
+        self.user = user
+        self.data: dict[str, typing.Any] = {"custom_id": custom_id}
+        if values is not None:
+            self.data["values"] = values
+        self.response = InteractionResponse()
+
+
+class Bot:
+    """Holds listeners and dispatches synthetic messages to them.
+
+    """
+    def __init__(self) -> None:
+        self.listeners: dict[str, list[typing.Callable]] = {}
+        self.channels: dict[int, Channel] = {}
+
+    def get_channel(self, id: int) -> Channel | None:
+        return self.channels.get(id)
+
+    def add_listener(self, func: typing.Callable, name: str) -> None:
+        self.listeners.setdefault(name, []).append(func)
+
+    def remove_listener(self, func: typing.Callable, name: str) -> None:
+        self.listeners.get(name, []).remove(func)
+
+    async def dispatch(self, message: Message) -> None:
+        for listener in self.listeners.get("on_message", ()):
+            await listener(message)
+
+    async def say(self, ctx: Context, content: str = "", user_id: int = None,
+                  attachments: typing.Iterable[Attachment] = (),
+                  roles: typing.Iterable[int] = ()) -> Message:
+        """Send `content` to the channel of `ctx`, as its author by default.
+
+        """
+        author = User(ctx.author.id if user_id is None else user_id, roles)
+        message = Message(ctx.channel, author, content, attachments)
+        await self.dispatch(message)
+        return message
+
+    async def click(self, ctx: Context, custom_id: str,
+                    values: list[str] = None,
+                    user_id: int = None) -> Interaction:
+        """Use the component `custom_id`, as the author of `ctx` by default.
+
+        """
+        interaction = Interaction(User(ctx.author.id if user_id is None
+                                       else user_id), custom_id, values)
+        for listener in self.listeners.get("on_interaction", ()):
+            await listener(interaction)
+        return interaction
+
+
+def context(bot: Bot, channel_id: int = 1, user_id: int = 2,
+            guild: Guild | None = None, record: bool = True) -> Context:
+    channel = Channel(channel_id, guild, record)
+    if record:
+        bot.channels[channel_id] = channel
+    return Context(Message(channel, User(user_id), "!dialog"), bot)
+
+
+async def settle(seconds: float = 0.01) -> None:
+    """Let every task waiting to run do so.
+
+    """
+    await asyncio.sleep(seconds)
+
+
+class LocalInspector(dpydialog.AttachmentInspector):
+    """Reads attachments from the fakes instead of over HTTP.
+
+    """
+    async def head(self, attachment: Attachment) -> bytes:
+        return attachment.data[:self.sniff_size]
+
+    async def stream(self, attachment: Attachment
+                     ) -> typing.AsyncIterator[bytes]:
+        yield attachment.data
@@ -0,0 +1,144 @@
+"""Replays a trace written by `dpydialog.TraceRecorder` against a fake bot.
+
+Traces don't record the parameters each dialog was started with, so
+every recorded dialog is replayed as the benchmark scenario of the same
+kind ("text" for kinds without one), and is sent the replies that were
+recorded for it at the times they were recorded, divided by `speed`
+(0 replays as fast as possible). Replies to components are not
+replayed. Dialogs that timed out in the trace are cancelled when they
+did, instead of waiting for their timeout.
+"""
+from .bench import percentile
+from . import fakes
+from .scenarios import SCENARIOS
+import asyncio
+import typing
+import time
+import dpydialog
+
+
+class ReplayResult(typing.NamedTuple):
+    dialogs: int
+    messages: int
+    seconds: float
+    messages_per_second: float
+    p50_latency: float
+    p99_latency: float
+
+
+class _Replayed:
+    __slots__ = ("context", "dialog", "task", "ready")
+
+    def __init__(self, context: fakes.Context, dialog: dpydialog.Dialog) -> None:
+        self.context = context
+        self.dialog = dialog
+        self.task: asyncio.Task | None = None
+        # set while the current step is waiting for replies
+        self.ready = asyncio.Event()
+        self.ready.set()
+
+
+class Replayer:
+    """Replays the events of one trace.
+
+    """
+    def __init__(self, trace: typing.Iterable[dict[str, typing.Any]],
+                 speed: float = 1.0, **cfg_flags) -> None:
+        if speed < 0:
+            raise ValueError("speed must be greater than or equal to 0")
+        self.events = [e for e in trace if "c" in e and (
+                           e["e"] in ("dialog_start", "timed_out")
+                           or e["e"] == "message_received" and "m" in e)]
+        self.speed = speed
+        self.cfg_flags = cfg_flags
+        self.bot = fakes.Bot()
+        self.instrumentation = dpydialog.Instrumentation()
+        self.instrumentation.subscribe(self._on_event)
+        self.replayed: dict[tuple[int, int], _Replayed] = {}
+        self.latencies: list[float] = []
+        self.dialogs = 0
+        self.messages = 0
+
+    def _on_event(self, event: dpydialog._instrument.Event) -> None:
+        replayed = self.replayed.get(event.identity)
+        if replayed is None:
+            return
+        if event.name == "dialog_start":
+            replayed.ready.clear()
+        elif event.name in ("prompt_sent", "dialog_end"):
+            replayed.ready.set()
+        elif event.name == "message_received":
+            self.latencies.append(time.perf_counter() - event.data.created)
+
+    def _get(self, channel_id: int, user_id: int) -> _Replayed:
+        replayed = self.replayed.get((channel_id, user_id))
+        if replayed is None:
+            context = fakes.context(self.bot, channel_id, user_id,
+                                    record=False)
+            replayed = self.replayed[channel_id, user_id] = _Replayed(
+                    context, dpydialog.Dialog(dpydialog.Config(
+                        self.bot, None, context,
+                        instrumentation=self.instrumentation,
+                        **self.cfg_flags)))
+        return replayed
+
+    @staticmethod
+    def _cancel(replayed: _Replayed) -> None:
+        if replayed.task is not None and not replayed.task.done():
+            replayed.task.cancel()
+        replayed.ready.set()
+
+    async def _apply(self, event: dict[str, typing.Any]) -> None:
+        replayed = self._get(event["c"], event["u"])
+        if event["e"] == "dialog_start":
+            # a step the recorded replies didn't complete is abandoned
+            self._cancel(replayed)
+            scenario = SCENARIOS.get(event["k"], SCENARIOS["text"])
+            replayed.ready.clear()
+            replayed.task = asyncio.ensure_future(
+                    scenario.run(replayed.dialog))
+            self.dialogs += 1
+        elif event["e"] == "timed_out":
+            self._cancel(replayed)
+        else:
+            await replayed.ready.wait()
+            context = replayed.context
+            attachments = [fakes.Attachment(*f) for f in event.get("f", ())]
+            await self.bot.dispatch(fakes.Message(
+                    context.channel, fakes.User(context.author.id),
+                    event["m"], attachments, created=time.perf_counter()))
+            self.messages += 1
+
+    async def run(self) -> ReplayResult:
+        started = time.perf_counter()
+        for event in self.events:
+            if self.speed:
+                delay = started + event["t"] / self.speed - (
+                        time.perf_counter())
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await self._apply(event)
+            # let the dialog pick the event up before the next one
+            await asyncio.sleep(0)
+        for replayed in self.replayed.values():
+            self._cancel(replayed)
+        await asyncio.gather(*(r.task for r in self.replayed.values()
+                               if r.task is not None),
+                             return_exceptions=True)
+        seconds = time.perf_counter() - started
+        for replayed in self.replayed.values():
+            await replayed.dialog.close()
+        return ReplayResult(self.dialogs, self.messages, seconds,
+                            self.messages / seconds if seconds else
+                            float("inf"),
+                            percentile(self.latencies, 0.5),
+                            percentile(self.latencies, 0.99))
+
+
+def replay(path: str, speed: float = 1.0, **cfg_flags) -> ReplayResult:
+    """Replay the trace at `path` at `speed` times its recorded pace.
+
+    `cfg_flags` are passed on to every `Config`.
+    """
+    return asyncio.run(Replayer(dpydialog.read_trace(path), speed,
+                                **cfg_flags).run())
@@ -0,0 +1,51 @@
+"""What each benchmarked dialog asks, and the replies users send to it.
+
+A scenario's `replies(i)` are the contents (and attachments) a user
+sends to their dialog: `invalid` rejected replies followed by the
+replies that complete it.
+"""
+from .fakes import Attachment
+import dpydialog
+import typing
+
+
+Reply = tuple[str, tuple[Attachment, ...]]
+
+
+class Scenario(typing.NamedTuple):
+    kind: str
+    run: typing.Callable[[dpydialog.Dialog], typing.Awaitable]
+    invalid: Reply
+    valid: tuple[Reply, ...]
+
+    def replies(self, invalid: int) -> list[Reply]:
+        return [self.invalid] * invalid + list(self.valid)
+
+
+CHOICES = [f"Option {i}" for i in range(1, 21)]
+PNG = (Attachment("image.png", "image/png", 2048),)
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "text": Scenario(
+        "text",
+        lambda d: d.text("Name", "What should we call you?"),
+        ("", ()), (("Ferris", ()),)),
+    "number": Scenario(
+        "number",
+        lambda d: d.number("Age", min_value=13, max_value=120),
+        ("twelve", ()), (("42", ()),)),
+    "choice": Scenario(
+        "choice",
+        lambda d: d.choice("Pick", CHOICES, min_choices=1, max_choices=3),
+        ("99", ()), (("3, 7", ()),)),
+    "file": Scenario(
+        "file",
+        lambda d: d.file("Upload", min_files=1, max_files=2,
+                         allowed_extensions=["png", "jpg"]),
+        ("no files here", ()), (("", PNG), ("done", ()))),
+    "prompt": Scenario(
+        "prompt",
+        lambda d: d.prompt("Rules", "Please read the rules."),
+        ("ok", ()), (("continue", ()),)),
+}
@@ -17,8 +17,31 @@ __download_url__ = "https://pypi.org/project/dpy-dialog/"
 
 __all__ = (
     "Dialog",
+    "Broadcast",
+    "Form",
+    "Field",
+    "FormResult",
+    "DialogStateStore",
+    "MemoryStateStore",
+    "SQLiteStateStore",
+    "Checkpoint",
+    "LeaseCoordinator",
+    "LeaseBackend",
+    "SQLiteLeaseBackend",
+    "LeaseKey",
+    "SendQueue",
+    "AdmissionController",
+    "offload",
+    "Instrumentation",
+    "MetricsAggregator",
+    "TraceRecorder",
+    "read_trace",
     "Config",
     "Formatter",
+    "Catalogue",
+    "ChoiceIndex",
+    "AttachmentInspector",
+    "FileResult",
     "exceptions",
     "constants",
     "default_formatters"
@@ -26,8 +49,23 @@ __all__ = (
 
 
 from ._dialog import Dialog
+from ._broadcast import Broadcast
+from ._form import Form, Field, FormResult
+from ._state import (DialogStateStore, MemoryStateStore, SQLiteStateStore,
+                     Checkpoint)
+from ._lease import (LeaseCoordinator, LeaseBackend, SQLiteLeaseBackend,
+                     LeaseKey)
+from ._sendqueue import SendQueue
+from ._admission import AdmissionController
+from ._offload import offload
+from ._instrument import Instrumentation, MetricsAggregator
+from ._trace import TraceRecorder, read_trace
 from ._config import Config
 from ._formatter import Formatter
+from ._templates import Catalogue
+from ._search import ChoiceIndex
+from ._attachments import AttachmentInspector
+from ._spool import FileResult
 from . import exceptions
 from . import constants
 from . import default_formatters
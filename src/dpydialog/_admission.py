@@ -0,0 +1,182 @@
+from ._lease import LeaseKey
+from . import exceptions
+import collections
+import asyncio
+import typing
+
+
+OVERFLOW = ("reject", "wait")
+
+
+class AdmissionInfo(typing.NamedTuple):
+    active: int
+    waiting: int
+    users: int
+    guilds: int
+
+
+class _Waiter(typing.NamedTuple):
+    key: LeaseKey
+    future: asyncio.Future
+
+
+class AdmissionController:
+    """Limits how many dialogs wait on replies at once.
+
+    Set as the `admission` flag of a `Config`, a dialog is admitted
+    before each step is sent (a `Form` run is admitted once for all of
+    its fields) and gives its slot back when the step is done. Limits
+    apply per user, per guild and globally; `None` means unlimited.
+
+    When a limit is reached, dialogs either raise `exceptions.Overloaded`
+    straight away (`overflow="reject"`), or wait for a slot for up to
+    `wait_timeout` seconds (`overflow="wait"`). Slots are handed to the
+    guild that was admitted least recently, so one busy guild can't
+    starve the others.
+    """
+    def __init__(self, max_per_user: int = None, max_per_guild: int = None,
+                 max_global: int = None, overflow: str = "reject",
+                 wait_timeout: float = None) -> None:
+        if overflow not in OVERFLOW:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW)}")
+        self.max_per_user = max_per_user
+        self.max_per_guild = max_per_guild
+        self.max_global = max_global
+        self.overflow = overflow
+        self.wait_timeout = wait_timeout
+        self._active = 0
+        self._users: collections.Counter[int] = collections.Counter()
+        self._guilds: collections.Counter[int] = collections.Counter()
+        self._waiting: collections.OrderedDict[
+            int, collections.deque[_Waiter]
+        ] = collections.OrderedDict()
+        self._nwaiting = 0
+        # when each guild was last admitted, for fairness between guilds
+        self._served: collections.OrderedDict[int, int] = (
+                collections.OrderedDict())
+        self._ticks = 0
+
+    def info(self) -> AdmissionInfo:
+        return AdmissionInfo(self._active, self._nwaiting, len(self._users),
+                             len(self._guilds))
+
+    def active(self, guild_id: int = None, user_id: int = None) -> int:
+        """The number of admitted dialogs (of a guild or user).
+
+        """
+        if user_id is not None:
+            return self._users[user_id]
+        if guild_id is not None:
+            return self._guilds[guild_id]
+        return self._active
+
+    def _blocked(self, key: LeaseKey) -> str | None:
+        if self.max_global is not None and self._active >= self.max_global:
+            return "global"
+        if (self.max_per_guild is not None
+            and self._guilds[key.guild_id] >= self.max_per_guild):
+            return "guild"
+        if (self.max_per_user is not None
+            and self._users[key.user_id] >= self.max_per_user):
+            return "user"
+        return None
+
+    def _take(self, key: LeaseKey) -> None:
+        self._active += 1
+        self._guilds[key.guild_id] += 1
+        self._users[key.user_id] += 1
+        self._ticks += 1
+        self._served[key.guild_id] = self._ticks
+        self._served.move_to_end(key.guild_id)
+        if len(self._served) > 4096:
+            self._served.popitem(last=False)
+
+    async def acquire(self, key: LeaseKey) -> None:
+        scope = self._blocked(key)
+        if scope is None and not self._nwaiting:
+            self._take(key)
+            return
+        if self.overflow == "reject":
+            # without waiters, a dialog can only be turned away by a limit
+            raise exceptions.Overloaded(scope)
+
+        waiter = _Waiter(key, asyncio.get_running_loop().create_future())
+        self._waiting.setdefault(key.guild_id,
+                                 collections.deque()).append(waiter)
+        self._nwaiting += 1
+        self._grant()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future),
+                                   self.wait_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.future.done():
+                # admitted just as we gave up
+                self.release(key)
+            else:
+                waiter.future.cancel()
+                self._discard(waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                raise exceptions.Overloaded(self._blocked(key)
+                                            or "global") from None
+            raise
+
+    def _discard(self, waiter: _Waiter) -> None:
+        queue = self._waiting.get(waiter.key.guild_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        self._nwaiting -= 1
+        if not queue:
+            del self._waiting[waiter.key.guild_id]
+        # a waiter that leaves may have been holding up others
+        self._grant()
+
+    def _first_fit(self, queue: collections.deque[_Waiter]
+                   ) -> _Waiter | None:
+        # waiters held back by their own user limit don't block the rest
+        # of their guild
+        for waiter in queue:
+            scope = self._blocked(waiter.key)
+            if scope is None:
+                return waiter
+            if scope != "user":
+                return None
+        return None
+
+    def _grant(self) -> None:
+        while self._nwaiting:
+            if self.max_global is not None and self._active >= self.max_global:
+                return
+            # of the guilds with a waiter that fits, the one admitted
+            # least recently goes first
+            best: tuple[int, _Waiter] | None = None
+            for guild_id, queue in self._waiting.items():
+                waiter = self._first_fit(queue)
+                if waiter is not None and (
+                        best is None or self._served.get(guild_id, -1)
+                        < self._served.get(best[0], -1)):
+                    best = guild_id, waiter
+            if best is None:
+                return
+            guild_id, waiter = best
+            queue = self._waiting[guild_id]
+            queue.remove(waiter)
+            if not queue:
+                del self._waiting[guild_id]
+            self._nwaiting -= 1
+            self._take(waiter.key)
+            waiter.future.set_result(None)
+
+    def release(self, key: LeaseKey) -> None:
+        self._active -= 1
+        self._guilds[key.guild_id] -= 1
+        if not self._guilds[key.guild_id]:
+            del self._guilds[key.guild_id]
+        self._users[key.user_id] -= 1
+        if not self._users[key.user_id]:
+            del self._users[key.user_id]
+        if self._nwaiting:
+            self._grant()
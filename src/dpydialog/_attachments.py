@@ -0,0 +1,245 @@
+import discord
+import aiohttp
+import asyncio
+import tempfile
+import typing
+import io
+
+
+# (offset, magic bytes, mimetype)
+SIGNATURES: tuple[tuple[int, bytes, str], ...] = (
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (0, b"BM", "image/bmp"),
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (0, b"Rar!\x1a\x07", "application/vnd.rar"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"fLaC", "audio/flac"),
+    (0, b"ID3", "audio/mpeg"),
+    (8, b"WAVE", "audio/x-wav"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+    (0, b"MZ", "application/x-msdownload"),
+    (0, b"\x7fELF", "application/x-executable"),
+)
+
+# container formats whose magic bytes are those of another format
+CONTAINERS: dict[str, tuple[str, ...]] = {
+    "application/zip": ("application/vnd.openxmlformats",
+                        "application/vnd.oasis.opendocument",
+                        "application/epub+zip", "application/java-archive"),
+    "video/mp4": ("video/", "audio/mp4", "image/heic", "image/avif"),
+    "video/webm": ("video/x-matroska", "audio/webm"),
+    "audio/ogg": ("video/ogg", "application/ogg"),
+}
+
+
+def sniff(data: bytes) -> str | None:
+    """Return the mimetype identified by the magic bytes of `data`.
+
+    """
+    for offset, magic, mtype in SIGNATURES:
+        if data[offset:offset + len(magic)] == magic:
+            return mtype
+    return None
+
+
+def is_allowed(sniffed: str | None, allowed_types: typing.Collection[str]
+               ) -> bool:
+    # content we can't identify (plain text, etc.) is left to the
+    # extension checks
+    if sniffed is None or not allowed_types or sniffed in allowed_types:
+        return True
+    return any(t.startswith(p) for p in CONTAINERS.get(sniffed, ())
+               for t in allowed_types)
+
+
+class AttachmentInspector:
+    """Checks and prefetches attachment contents for `Dialog.file`.
+
+    Attachments are streamed with a bounded number of concurrent requests
+    over a single shared HTTP session. Only the first `sniff_size` bytes
+    are read to identify a file unless `prefetch` is set to "memory" or
+    "file", in which case full contents are downloaded into `io.BytesIO`
+    buffers or temporary files and can be retrieved with `open`.
+
+    `Dialog.file` closes its inspector when the step ends; the contents
+    of the accepted attachments are handed to the `FileResult` first. An
+    inspector set as the `inspector` flag of a `Config` is instead shared
+    by every dialog using the config: each step checks attachments with
+    a `scope` of it, so they share its session and concurrency limit,
+    and the shared inspector is closed by its owner.
+    """
+    def __init__(self, concurrency: int = 4, sniff_size: int = 4096,
+                 prefetch: typing.Literal["memory", "file"] | None = None,
+                 session: aiohttp.ClientSession | None = None,
+                 chunk_size: int = 65536) -> None:
+        if prefetch not in (None, "memory", "file"):
+            raise ValueError("prefetch must be one of None, 'memory' or "
+                             "'file'")
+        self.concurrency = concurrency
+        self.sniff_size = sniff_size
+        self.prefetch = prefetch
+        self.chunk_size = chunk_size
+        self._session = session
+        self._owns_session = session is None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._prefetched: dict[int, typing.BinaryIO] = {}
+        self._parent: AttachmentInspector | None = None
+
+    def scope(self) -> "AttachmentInspector":
+        """Return an inspector sharing this one's session and concurrency
+        limit, with prefetched contents of its own.
+
+        Closing the scope only closes what it prefetched.
+        """
+        scope = object.__new__(type(self))
+        scope.__dict__.update(self.__dict__)
+        scope._prefetched = {}
+        scope._parent = self._parent or self
+        scope._owns_session = False
+        return scope
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._parent is not None:
+            return self._parent.session
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+            self._owns_session = True
+        return self._session
+
+    async def head(self, attachment: discord.Attachment) -> bytes:
+        """Read the first `sniff_size` bytes of an attachment.
+
+        """
+        headers = {"Range": f"bytes=0-{self.sniff_size - 1}"}
+        async with self._semaphore:
+            async with self.session.get(attachment.url,
+                                        headers=headers) as resp:
+                resp.raise_for_status()
+                # the server may ignore the range, so we stop reading
+                # once we have enough and let the response be closed
+                buf = bytearray()
+                while len(buf) < self.sniff_size:
+                    chunk = await resp.content.read(self.sniff_size - len(buf))
+                    if not chunk:
+                        break
+                    buf += chunk
+                return bytes(buf)
+
+    async def stream(self, attachment: discord.Attachment
+                     ) -> typing.AsyncIterator[bytes]:
+        """Yield the contents of an attachment in chunks.
+
+        """
+        async with self._semaphore:
+            async with self.session.get(attachment.url) as resp:
+                resp.raise_for_status()
+                async for chunk in resp.content.iter_chunked(self.chunk_size):
+                    yield chunk
+
+    async def fetch(self, attachment: discord.Attachment) -> typing.BinaryIO:
+        """Download an attachment into a buffer or temporary file.
+
+        """
+        fp = io.BytesIO() if self.prefetch != "file" else (
+                tempfile.TemporaryFile())
+        try:
+            async for chunk in self.stream(attachment):
+                fp.write(chunk)
+        except BaseException:
+            fp.close()
+            raise
+        fp.seek(0)
+        return fp
+
+    async def _check(self, attachment: discord.Attachment,
+                     allowed_types: typing.Collection[str]) -> bool:
+        if not self.prefetch:
+            return is_allowed(sniff(await self.head(attachment)),
+                              allowed_types)
+        fp = await self.fetch(attachment)
+        if not is_allowed(sniff(fp.read(self.sniff_size)), allowed_types):
+            fp.close()
+            return False
+        fp.seek(0)
+        self._prefetched[attachment.id] = fp
+        return True
+
+    async def inspect(self, attachments: typing.Iterable[discord.Attachment],
+                      allowed_types: typing.Collection[str]
+                      ) -> discord.Attachment | None:
+        """Check attachments concurrently.
+
+        Returns the first attachment found whose contents are not one of
+        `allowed_types`, or None if all of them are allowed. The checks
+        still running when one is rejected are cancelled.
+        """
+        attachments = list(attachments)
+        checks = {asyncio.ensure_future(self._check(a, allowed_types)): a
+                  for a in attachments}
+        pending = set(checks)
+        rejected = None
+        try:
+            while pending and rejected is None:
+                done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED)
+                for check in done:
+                    # attachments that couldn't be downloaded are rejected
+                    # too (every failure is looked at, so none is logged as
+                    # never retrieved)
+                    failed = check.exception() is not None
+                    if rejected is None and (failed or not check.result()):
+                        rejected = checks[check]
+        finally:
+            # the rest are cancelled on a rejection, or when the step is
+            # cut short by its check_timeout
+            for check in pending:
+                check.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        if rejected is not None:
+            # nothing from a rejected message is kept
+            self.discard(attachments)
+        return rejected
+
+    def open(self, attachment: discord.Attachment) -> typing.BinaryIO | None:
+        """Return the prefetched contents of an attachment, if any.
+
+        """
+        fp = self._prefetched.get(attachment.id)
+        if fp is not None:
+            fp.seek(0)
+        return fp
+
+    def take(self, attachment: discord.Attachment
+             ) -> typing.BinaryIO | None:
+        """Remove and return the prefetched contents of an attachment.
+
+        The caller becomes responsible for closing the returned file.
+        """
+        fp = self._prefetched.pop(attachment.id, None)
+        if fp is not None:
+            fp.seek(0)
+        return fp
+
+    def discard(self, attachments: typing.Iterable[discord.Attachment]
+                ) -> None:
+        for attachment in attachments:
+            fp = self._prefetched.pop(attachment.id, None)
+            if fp is not None:
+                fp.close()
+
+    async def close(self) -> None:
+        for fp in self._prefetched.values():
+            fp.close()
+        self._prefetched.clear()
+        if self._owns_session and self._session is not None:
+            await self._session.close()
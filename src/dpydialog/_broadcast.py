@@ -0,0 +1,205 @@
+from ._config import Config
+from ._formatter import Formatter
+from . import exceptions
+from . import _router
+from . import _runner
+from . import _timer
+from . import _instrument
+from . import types
+import discord
+import asyncio
+import typing
+import time
+
+
+class Broadcast:
+    """Asks everyone in a channel the same question at once.
+
+    Created with `Dialog.broadcast`. Each step sends a single prompt to
+    the channel and checks the replies of every allowed user (those in
+    `users`, or with a role in `roles`; anyone but bots when both are
+    None) with the step's usual checkfn. A user's first valid reply is
+    their result, and invalid replies are answered with the error embed.
+    A step ends at its timeout, once every user in `users` has a result,
+    or once `max_replies` users have one, and returns a dict of user ids
+    to results. The dialog's own user may end it early with the cancel
+    keyword, when cancellable.
+
+    Iterating over a broadcast yields (user_id, result) pairs of the
+    current (or next) step as they come in.
+    """
+    def __init__(self, dialog: typing.Any, users: typing.Iterable[int] = None,
+                 roles: typing.Iterable[int] = None,
+                 max_replies: int = None) -> None:
+        if max_replies is not None and max_replies < 1:
+            raise ValueError("max_replies must be greater than or equal to 1")
+        self.dialog = dialog
+        self.users = users if users is None else frozenset(users)
+        self.roles = roles if roles is None else frozenset(roles)
+        self.max_replies = max_replies
+        self.results: dict[int, typing.Any] | None = None
+        self._streams: list[asyncio.Queue] = []
+
+    async def text(self, *args, **kwargs) -> dict[int, str]:
+        return await self.dialog.text(*args, **kwargs)
+
+    async def number(self, *args, **kwargs) -> dict[int, float]:
+        return await self.dialog.number(*args, **kwargs)
+
+    async def choice(self, *args, **kwargs
+                     ) -> dict[int, tuple[tuple[str, ...], tuple[int, ...]]]:
+        # pages are navigated per user, and components aren't supported
+        if kwargs.get("use_itx") or kwargs.get("page_size") is not None:
+            raise ValueError("broadcasts can't page choices or use "
+                             "components")
+        return await self.dialog.choice(*args, **kwargs)
+
+    async def close(self) -> None:
+        await self.dialog.close()
+
+    async def __aenter__(self) -> "Broadcast":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def __aiter__(self) -> typing.AsyncIterator[tuple[int,
+                                                           typing.Any]]:
+        queue: asyncio.Queue[tuple[int, typing.Any] | None] = asyncio.Queue()
+        if self.results is not None:
+            for item in self.results.items():
+                queue.put_nowait(item)
+        self._streams.append(queue)
+        try:
+            while (item := await queue.get()) is not None:
+                yield item
+        finally:
+            self._streams.remove(queue)
+
+    def _allowed(self, message: discord.Message) -> bool:
+        author = message.author
+        if getattr(author, "bot", False):
+            return False
+        if self.users is None and self.roles is None:
+            return True
+        if self.users is not None and author.id in self.users:
+            return True
+        return self.roles is not None and any(
+                role.id in self.roles for role in getattr(author, "roles", ()))
+
+    def _done(self, results: dict[int, typing.Any]) -> bool:
+        if self.max_replies is not None and len(results) >= self.max_replies:
+            return True
+        return (self.users is not None and self.roles is None
+                and len(results) >= len(self.users))
+
+    async def _reply(self, cfg: Config, message: discord.Message,
+                     embed: discord.Embed) -> None:
+        # replies go to each user's own message, so they aren't coalesced
+        if cfg.send_queue is not None:
+            await cfg.send_queue.send(cfg.channel_id, message.reply,
+                                      embed=embed)
+        else:
+            await message.reply(embed=embed)
+
+    async def step(self, title: str, preface: str | None, body: str,
+                   checkfn: typing.Callable[[discord.Message], typing.Any],
+                   cfg: Config, formatter: Formatter,
+                   deadline: float | None | type[types.MISSING] = types.MISSING
+                   ) -> dict[int, typing.Any]:
+        if formatter.kind == "file":
+            raise ValueError("file steps can't be broadcast")
+        if deadline is types.MISSING:
+            deadline = _timer.deadline(cfg.timeout)
+        if (deadline is None and self.max_replies is None
+            and (self.users is None or self.roles is not None)):
+            raise ValueError("broadcasts need a timeout, max_replies or a "
+                             "set of users to end")
+        dialog = self.dialog
+        async with dialog._admission(cfg), dialog._instrumented(
+                cfg, formatter.kind):
+            # skipping is per user, so only the cancel keyword is shown
+            embed = formatter.dialog_embed(title, preface, body,
+                                           _timer.timestamp(deadline),
+                                           cfg.cancellable, False,
+                                           cfg.cancel_keyword,
+                                           cfg.skip_keyword,
+                                           cfg.dialog_embed_base,
+                                           dialog._locale(cfg))
+            await dialog._show(cfg, embed, kind=formatter.kind)
+            results = self.results = {}
+            router = _router.DialogRouter.get(cfg.bot)
+            with router.subscribe_channel(cfg.channel_id,
+                                          self._allowed) as subscription:
+                timer = deadline and _timer.TimerWheel.get().schedule(
+                        deadline, lambda: subscription.expire(timer))
+                try:
+                    await self._collect(checkfn, cfg, formatter.kind,
+                                        subscription, timer, results)
+                finally:
+                    if timer:
+                        timer.cancel()
+                    for queue in self._streams:
+                        queue.put_nowait(None)
+            return results
+
+    async def _collect(self, checkfn: typing.Callable[[discord.Message],
+                                                      typing.Any],
+                       cfg: Config, kind: str,
+                       subscription: _router.Subscription,
+                       timer: _timer.Timer | None,
+                       results: dict[int, typing.Any]) -> None:
+        inst = cfg.instrumentation
+        started = inst and _timer.now()
+        owner = cfg.identity and cfg.identity.user_id
+        while not self._done(results):
+            try:
+                message = await subscription.get(timer)
+            except exceptions.TimedOut:
+                if inst is not None:
+                    inst.emit(_instrument.TIMED_OUT, kind,
+                              identity=cfg.identity)
+                return
+            user_id = message.author.id
+            if user_id in results:
+                continue
+            identity = types.Identity(message.channel.id, user_id)
+            if inst is not None:
+                inst.emit(_instrument.MESSAGE_RECEIVED, kind,
+                          _timer.now() - started, identity=identity,
+                          data=message)
+
+            content = message.content and message.content.lower().strip()
+            if (cfg.cancellable and user_id == owner
+                and content == cfg.cancel_keyword):
+                if inst is not None:
+                    inst.emit(_instrument.CANCELLED, kind, identity=identity)
+                raise exceptions.Cancelled(message, time.time())
+
+            checked = inst and _timer.now()
+            try:
+                checkval = await _runner.resolve(checkfn(message), message,
+                                                 cfg.check_timeout)
+            except exceptions.CheckTimedOut:
+                checkval = Formatter().error_embed(
+                        cfg.error_embed_base,
+                        description="*Your response could not be checked "
+                                    "in time, please try again.*")
+            if isinstance(checkval, types.Rerender):
+                # e.g. narrowed search results, shown to their user only
+                checkval = checkval.embed
+            if inst is not None and checkval is not None:
+                inst.emit(_instrument.CHECK_FAILED
+                          if isinstance(checkval, discord.Embed)
+                          else _instrument.CHECK_PASSED, kind,
+                          _timer.now() - checked, identity=identity,
+                          data=checkval)
+            if isinstance(checkval, discord.Embed):
+                await self._reply(cfg, message, checkval)
+                continue
+            if checkval is None:
+                continue
+
+            results[user_id] = checkval
+            for queue in self._streams:
+                queue.put_nowait((user_id, checkval))
@@ -0,0 +1,187 @@
+from . import exceptions
+from . import _config
+from . import _router
+from . import _runner
+from . import _timer
+from . import _instrument
+from . import types
+from discord.ext import commands
+import discord
+import secrets
+import typing
+import weakref
+import time
+
+
+class ComponentRouter:
+    """Routes component interactions to the dialogs waiting on them.
+
+    A single `on_interaction` listener is added per bot. Every component
+    sent by a dialog has a custom_id of the form "<token>:<action>", and
+    interactions are looked up by token, so no `discord.ui.View` has to
+    be registered with discord.py per dialog.
+    """
+    def __init__(self, bot: commands.Bot) -> None:
+        # the bot holds the router (through its listener, and see `get`),
+        # so the router only holds the bot weakly
+        self._bot = weakref.ref(bot)
+        self._waiting: dict[str, _router.Subscription] = {}
+        bot.add_listener(self._on_interaction, "on_interaction")
+
+    @property
+    def bot(self) -> commands.Bot | None:
+        return self._bot()
+
+    @classmethod
+    def get(cls, bot: commands.Bot) -> "ComponentRouter":
+        # kept on the bot itself, so it is collected along with the bot
+        router = getattr(bot, "_dpydialog_component_router", None)
+        if router is None:
+            router = cls(bot)
+            setattr(bot, "_dpydialog_component_router", router)
+        return router
+
+    def subscribe(self) -> _router.Subscription:
+        # the token takes the place of the identity of a message
+        # subscription; it is what the component custom_ids start with
+        token = f"dpydialog:{secrets.token_hex(8)}"
+        subscription = self._waiting[token] = _router.Subscription(
+                self, token, None)
+        return subscription
+
+    def unsubscribe(self, subscription: _router.Subscription) -> None:
+        self._waiting.pop(subscription.identity, None)
+
+    def dispatch(self, interaction: discord.Interaction) -> None:
+        if interaction.type is not discord.InteractionType.component:
+            return
+        custom_id = (interaction.data or {}).get("custom_id", "")
+        subscription = self._waiting.get(custom_id.rpartition(":")[0])
+        if subscription is not None:
+            subscription.deliver(interaction)
+
+    async def _on_interaction(self, interaction: discord.Interaction) -> None:
+        self.dispatch(interaction)
+
+
+class ComponentRunner(typing.Generic[types.VT]):
+    """The `Runner` counterpart for dialogs answered through components.
+
+    """
+    def __init__(self, cfg: _config.Config, deadline: float | None,
+                 subscription: _router.Subscription,
+                 kind: str = "custom") -> None:
+        if cfg.identity is None:
+            raise ValueError("component dialogs require a Config with an "
+                             "identity")
+        self.cfg = cfg
+        self.kind = kind
+        self.deadline = deadline
+        self.subscription = subscription
+
+    def view(self, items: typing.Iterable[discord.ui.Item]) -> discord.ui.View:
+        view = discord.ui.View(timeout=None)
+        for item in items:
+            view.add_item(item)
+        token = self.subscription.identity
+        if self.cfg.cancellable:
+            view.add_item(discord.ui.Button(
+                    label=self.cfg.cancel_keyword.capitalize(),
+                    style=discord.ButtonStyle.danger,
+                    custom_id=f"{token}:cancel"))
+        if self.cfg.skippable:
+            view.add_item(discord.ui.Button(
+                    label=self.cfg.skip_keyword.capitalize(),
+                    style=discord.ButtonStyle.secondary,
+                    custom_id=f"{token}:skip"))
+        # the view only serializes the components; a stopped view isn't
+        # stored by discord.py, so interactions reach the component router
+        view.stop()
+        return view
+
+    async def run(self, checkfn: typing.Callable[[discord.Interaction],
+                                                 typing.Union[
+                                                     types.VT,
+                                                     discord.Embed
+                                                 ]]
+                  ) -> tuple[discord.Interaction | None, types.VT]:
+        subscription = self.subscription
+        timer = self.deadline and _timer.TimerWheel.get().schedule(
+                self.deadline, lambda: subscription.expire(timer))
+        try:
+            return await self._run(checkfn, timer)
+        except exceptions.TimedOut:
+            if self.cfg.instrumentation is not None:
+                self.cfg.instrumentation.emit(_instrument.TIMED_OUT,
+                                              self.kind,
+                                              identity=self.cfg.identity)
+            raise
+        finally:
+            if timer:
+                timer.cancel()
+
+    async def _run(self, checkfn: typing.Callable[[discord.Interaction],
+                                                  typing.Union[
+                                                      types.VT,
+                                                      discord.Embed
+                                                  ]],
+                   timer: _timer.Timer | None
+                   ) -> tuple[discord.Interaction | None, types.VT]:
+        inst = self.cfg.instrumentation
+        started = inst and _timer.now()
+        attempt = 0
+        while True:
+            interaction: discord.Interaction = await self.subscription.get(
+                    timer)
+            if interaction.user.id != self.cfg.identity.user_id:
+                await interaction.response.send_message(
+                        "*This dialog is not for you.*", ephemeral=True)
+                continue
+            action = interaction.data["custom_id"].rpartition(":")[2]
+            attempt += 1
+            if inst is not None:
+                inst.emit(_instrument.MESSAGE_RECEIVED, self.kind,
+                          _timer.now() - started, attempt, self.cfg.identity,
+                          interaction)
+
+            # handle cancel or skip; answered dialogs lose their components
+            if action == "cancel":
+                if inst is not None:
+                    inst.emit(_instrument.CANCELLED, self.kind,
+                              attempt=attempt, identity=self.cfg.identity)
+                await interaction.response.edit_message(view=None)
+                raise exceptions.Cancelled(None, time.time())
+            if action == "skip":
+                if inst is not None:
+                    inst.emit(_instrument.SKIPPED, self.kind,
+                              attempt=attempt, identity=self.cfg.identity)
+                await interaction.response.edit_message(view=None)
+                return interaction, None
+
+            # ensure value passes check
+            checked = inst and _timer.now()
+            try:
+                checkval = await _runner.resolve(checkfn(interaction),
+                                                 interaction,
+                                                 self.cfg.check_timeout)
+            except exceptions.CheckTimedOut:
+                if inst is not None:
+                    inst.emit(_instrument.CHECK_FAILED, self.kind,
+                              _timer.now() - checked, attempt,
+                              self.cfg.identity)
+                await interaction.response.send_message(
+                        "*Your response could not be checked in time, "
+                        "please try again.*", ephemeral=True)
+                continue
+            if inst is not None and checkval is not None:
+                inst.emit(_instrument.CHECK_FAILED
+                          if isinstance(checkval, discord.Embed)
+                          else _instrument.CHECK_PASSED, self.kind,
+                          _timer.now() - checked, attempt, self.cfg.identity,
+                          checkval)
+            if isinstance(checkval, discord.Embed):
+                await interaction.response.send_message(embed=checkval,
+                                                        ephemeral=True)
+                continue
+            await interaction.response.edit_message(view=None)
+            return interaction, checkval
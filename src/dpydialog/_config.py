@@ -1,46 +1,116 @@
+from ._lease import LeaseCoordinator
+from ._sendqueue import SendQueue
+from ._admission import AdmissionController
+from ._instrument import Instrumentation
+from ._attachments import AttachmentInspector
+from . import _timer
+from . import constants
+from . import types
 from discord.ext import commands
+import operator
 import discord
 import typing
-import time
+import warnings
 
 
 VALID_FLAGS = ["bot", "identity_checkfn", "utx", "dialog_embed_base",
                "error_embed_base", "cancellable", "cancel_keyword", "skippable",
-               "skip_keyword", "timeout"]
+               "skip_keyword", "timeout", "identity", "leases", "send_queue",
+               "panel", "panel_debounce", "admission", "input_rate",
+               "check_timeout", "instrumentation", "locale",
+               "inspector"]
+
+# the bases used when none is given; shared by every config so that their
+# embeds are compiled and cached once, and never mutated
+_DIALOG_EMBED_BASE: dict = {}
+_ERROR_EMBED_BASE: dict = {"color": constants.EMBED_COLOR__NEG}
 
 
 class Config:
+    """The flags shared by the steps of a dialog.
+
+    Configs are immutable. `override` returns a copy with some flags
+    changed, normalizing only those flags, and derived values
+    (`channel_id`, `best_sender` and `error_sender`) are worked out on
+    first use and cached on each config.
+
+    Embeds are built from `dialog_embed_base` and `error_embed_base` once
+    and cached by the identity of the base, so mutating a base in place
+    has no effect on later prompts and errors until
+    `Formatter.dialog_embed_cache.invalidate(base)` (or
+    `Formatter.error_embed_cache.invalidate(base)`) is called; passing a
+    new base object through `override` needs no invalidation.
+    """
+    __slots__ = (*VALID_FLAGS, "_channel_id", "_best_sender",
+                 "_error_sender")
+
     def __init__(self, bot: commands.Bot,
-                 identity_checkfn: typing.Callable[[discord.Message], bool],
-                 utx: commands.Context | discord.Interaction,
+                 identity_checkfn: typing.Optional[
+                     typing.Callable[[discord.Message], bool]],
+                 utx: (commands.Context | discord.Interaction
+                       | discord.abc.Messageable),
                  dialog_embed_base: dict | discord.Embed = None,
                  error_embed_base: dict | discord.Embed = None,
                  cancellable: bool = False, cancel_keyword: str = "cancel",
                  skippable: bool = False, skip_keyword: str = "skip",
-                 timeout: typing.Optional[int | float] = None) -> None:
-        self.bot = bot
-        self.identity_checkfn = identity_checkfn
-        self.utx = utx
-        self.dialog_embed_base = dialog_embed_base or {}
-        self.error_embed_base = error_embed_base or {"color": 0xeb4747}
-        self.cancellable = cancellable
-        self.cancel_keyword = cancel_keyword.lower().strip()
-        self.skippable = skippable
-        self.skip_keyword = skip_keyword.lower().strip()
-        self.timeout = timeout
-        self.bot = bot
-    
+                 timeout: typing.Optional[int | float] = None,
+                 identity: types.Identity | tuple[int, int] = None,
+                 leases: LeaseCoordinator = None,
+                 send_queue: SendQueue = None, panel: bool = False,
+                 panel_debounce: float = 0.25,
+                 admission: AdmissionController = None,
+                 input_rate: tuple[int, float] = None,
+                 check_timeout: float = None,
+                 instrumentation: Instrumentation = None,
+                 locale: str = None,
+                 inspector: AttachmentInspector = None) -> None:
+        # without an explicit identity or checkfn, dialogs wait on the
+        # channel and user the context/interaction originated from
+        if identity is None and identity_checkfn is None:
+            identity = types.Identity.from_utx(utx)
+        # input_rate is the (messages, seconds) a user may send to a single
+        # dialog step, and check_timeout how long a coroutine or offloaded
+        # checkfn may take per response; locale picks the translation of
+        # dialog embeds (by default that of the interaction, if any), and
+        # inspector is shared by the file steps of every dialog using it
+        for flag, value in zip(VALID_FLAGS, (
+                bot, identity_checkfn, utx, dialog_embed_base,
+                error_embed_base, cancellable, cancel_keyword, skippable,
+                skip_keyword, timeout, identity, leases, send_queue, panel,
+                panel_debounce, admission, input_rate, check_timeout,
+                instrumentation, locale, inspector)):
+            _SLOTS[flag].__set__(self, _normalize(flag, value))
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        raise AttributeError("Config objects are immutable; use override() "
+                             "to change their flags")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("Config objects are immutable")
+
     def override(self, **kwargs) -> "Config":
         if not kwargs:
             return self
-        new_kwargs = {flag:getattr(self, flag) for flag in VALID_FLAGS}
-        new_kwargs.update(kwargs)
-        return Config(**new_kwargs)
+        new = object.__new__(type(self))
+        for set_flag, value in zip(_SETTERS, _get_flags(self)):
+            set_flag(new, value)
+        for flag, value in kwargs.items():
+            if flag not in _SLOTS:
+                raise TypeError(f"override() got an unexpected keyword "
+                                f"argument '{flag}'")
+            _SLOTS[flag].__set__(new, _normalize(flag, value))
+        # as in __init__, a config left without an identity or checkfn waits
+        # on the channel and user its context/interaction originated from
+        if (("identity" in kwargs or "identity_checkfn" in kwargs
+             or "utx" in kwargs)
+            and new.identity is None and new.identity_checkfn is None):
+            _SLOTS["identity"].__set__(new, types.Identity.from_utx(new.utx))
+        return new
     
     def itx(self, ignore: bool = False) -> discord.Interaction | None:
         if isinstance(self.utx, discord.Interaction):
             return self.utx
-        if self.utx.interaction is not None:
+        if getattr(self.utx, "interaction", None) is not None:
             return self.utx.interaction
         if not ignore:
             raise ValueError("This Config object was not set up for use with "
@@ -54,7 +124,7 @@ class Config:
                              "contexts")
 
     def itx_sender(self, itx: discord.Interaction):
-        if itx.response.is_done:
+        if itx.response.is_done():
             return itx.followup.send
         return itx.response.send_message
     
@@ -62,12 +132,92 @@ class Config:
         return ctx.send
     
     @property
-    def best_sender(self):
+    def channel_id(self) -> int:
+        try:
+            return self._channel_id
+        except AttributeError:
+            pass
+        if self.identity is not None:
+            channel_id = self.identity.channel_id
+        elif self.itx(ignore=True):
+            channel_id = self.itx(ignore=True).channel_id
+        else:
+            channel_id = getattr(self.utx, "channel", self.utx).id
+        object.__setattr__(self, "_channel_id", channel_id)
+        return channel_id
+
+    def _sender(self):
         itx = self.itx(ignore=True)
         if itx:
-            return self.itx_sender(itx)
+            # whether to respond or follow up is decided per send
+            def send_itx(**kwargs) -> typing.Awaitable:
+                return self.itx_sender(itx)(**kwargs)
+            return send_itx
+        if (self.ctx(ignore=True) is None
+            and isinstance(self.utx, discord.abc.Messageable)):
+            # a plain channel, e.g. for forms resumed after a restart
+            return self.utx.send
         return self.ctx_sender(self.ctx())
+
+    @property
+    def best_sender(self):
+        try:
+            return self._best_sender
+        except AttributeError:
+            pass
+        sender = self._sender()
+        if self.send_queue is not None:
+            sender = self.send_queue.sender(self.channel_id, sender)
+        object.__setattr__(self, "_best_sender", sender)
+        return sender
+
+    @property
+    def error_sender(self):
+        """The sender for replies to invalid input.
+
+        With a `send_queue`, repeated replies to the dialog's identity (or
+        to its utx, when it has none) are coalesced, and may edit the
+        previous reply in place.
+        """
+        try:
+            return self._error_sender
+        except AttributeError:
+            pass
+        if self.send_queue is not None:
+            sender = self.send_queue.sender(
+                    self.channel_id, self._sender(), reply=True,
+                    target=self.identity or id(self.utx))
+        else:
+            sender = self.best_sender
+        object.__setattr__(self, "_error_sender", sender)
+        return sender
     
     @property
-    def timestamp(self) -> int | None:
-        return self.timeout and time.time() + self.timeout
+    def timestamp(self) -> float | None:
+        """Deprecated; dialogs show the deadline the timer wheel expires
+        them at, which is taken when each step starts.
+
+        """
+        warnings.warn("Config.timestamp is deprecated; deadlines are taken "
+                      "from the timer wheel when each step starts",
+                      DeprecationWarning, stacklevel=2)
+        return _timer.timestamp(_timer.deadline(self.timeout))
+
+
+def _normalize(flag: str, value: typing.Any) -> typing.Any:
+    if flag == "identity":
+        return value and types.Identity(*value)
+    if flag == "dialog_embed_base":
+        return value or _DIALOG_EMBED_BASE
+    if flag == "error_embed_base":
+        return value or _ERROR_EMBED_BASE
+    if flag in ("cancel_keyword", "skip_keyword"):
+        return value.lower().strip()
+    return value
+
+
+# the slot descriptors of the flags, so overrides copy them directly
+_SLOTS: dict[str, typing.Any] = {flag: Config.__dict__[flag]
+                                 for flag in VALID_FLAGS}
+_SETTERS = tuple(_SLOTS[flag].__set__ for flag in VALID_FLAGS)
+_get_flags = operator.attrgetter(*VALID_FLAGS)
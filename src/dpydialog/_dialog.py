@@ -1,25 +1,342 @@
 from ._config import Config
 from ._runner import Runner
 from ._formatter import Formatter
+from ._attachments import AttachmentInspector
+from ._spool import FileResult
+from ._lease import Lease, LeaseKey
+from ._panel import Panel
+from ._broadcast import Broadcast
+from . import _components
+from . import _stream
+from . import _router
+from . import _search
+from . import _timer
+from . import _instrument
 from . import default_formatters
 from . import exceptions
 from . import types
+import contextlib
+import asyncio
 import discord
+import weakref
 import typing
 
 
+_NOT_INSTRUMENTED = contextlib.nullcontext()
+
+
 class Dialog:
-    def __init__(self, cfg: Config) -> None:
+    def __init__(self, cfg: Config,
+                 subscription: _router.Subscription | None = None) -> None:
         self.cfg = cfg
-        self.exceptions = (exceptions.Cancelled, exceptions.TimedOut)
+        self.exceptions = (exceptions.Cancelled, exceptions.TimedOut,
+                           exceptions.Overloaded)
+        # results are only held weakly, so those the caller is done with
+        # don't pile up in long lived dialogs
+        self._files: weakref.WeakValueDictionary[int, FileResult] = (
+                weakref.WeakValueDictionary())
+        self._leases: dict[LeaseKey, Lease] = {}
+        self._panel: Panel | None = None
+        # admission slots taken by this dialog, with the number of steps
+        # using each; a step inside another (e.g. the fields of a `Form`
+        # run) shares its slot
+        self._admissions: dict[LeaseKey, list] = {}
+        # set while the dialog is used as an async context manager, to
+        # keep what its steps take until it is closed
+        self._held = False
+        # when set, every step waiting on the same identity as `cfg`
+        # shares this router subscription instead of registering its own
+        self.subscription = subscription
+        # used by `Form` to checkpoint sent prompts and to resume waiting
+        # on a prompt sent before a restart without sending it again
+        self._on_prompt: typing.Callable[[typing.Any, float | None],
+                                         None] | None = None
+        self._resume_deadline: float | None | type[types.MISSING] = (
+                types.MISSING)
+        # set on the dialogs backing a `Broadcast`
+        self._broadcast: Broadcast | None = None
+
+    def _subscription_for(self, cfg: Config) -> _router.Subscription | None:
+        if (self.subscription is not None
+            and cfg.identity == self.cfg.identity
+            and cfg.identity_checkfn is self.cfg.identity_checkfn):
+            return self.subscription
+        return None
+
+    @contextlib.asynccontextmanager
+    async def _leased(self, cfg: Config) -> typing.AsyncIterator[Lease | None]:
+        # a lease is held for a single step, unless it is already held for
+        # longer (e.g. for a whole `Form` run, or by a held dialog until
+        # `close`), so dialogs that are never closed don't keep their
+        # user's lease forever
+        if cfg.leases is None:
+            yield None
+            return
+        key = LeaseKey.from_cfg(cfg)
+        lease = self._leases.get(key)
+        if lease is not None:
+            yield lease
+            return
+        lease = self._leases[key] = await cfg.leases.acquire(key)
+        try:
+            yield lease
+        finally:
+            if not self._held:
+                self._leases.pop(key, None)
+                await lease.release()
+
+    def _panel_for(self, cfg: Config) -> Panel | None:
+        if not cfg.panel:
+            return None
+        if self._panel is None:
+            self._panel = Panel(cfg, cfg.panel_debounce)
+        return self._panel
+
+    async def _show(self, cfg: Config, embed: discord.Embed,
+                    view: discord.ui.View = None,
+                    kind: str = "custom") -> typing.Any:
+        sent = cfg.instrumentation and _timer.now()
+        panel = self._panel_for(cfg)
+        if panel is not None:
+            message = await panel.show(embed, view)
+        elif view is None:
+            message = await cfg.best_sender(embed=embed)
+        else:
+            message = await cfg.best_sender(embed=embed, view=view)
+        if cfg.instrumentation is not None:
+            cfg.instrumentation.emit(_instrument.PROMPT_SENT, kind,
+                                     _timer.now() - sent,
+                                     identity=cfg.identity, data=embed)
+        return message
+
+    def _runner(self, cfg: Config, deadline: float | None | type[types.MISSING]
+                = types.MISSING, kind: str = "custom",
+                prompt: typing.Any = None) -> Runner:
+        panel = self._panel_for(cfg)
+        if panel is not None:
+            return Runner(cfg, deadline, self._subscription_for(cfg),
+                          panel.reply, kind,
+                          lambda embed: self._show(cfg, embed, kind=kind))
+
+        # re-renders (e.g. other pages of a choice) edit the prompt in
+        # place rather than sending a new message for each of them
+        async def show(embed: discord.Embed) -> typing.Any:
+            nonlocal prompt
+            # interaction responses return a callback response, which
+            # holds the message
+            message = getattr(prompt, "resource", prompt)
+            if hasattr(message, "edit"):
+                try:
+                    return await message.edit(embed=embed)
+                except discord.HTTPException:
+                    # e.g. the prompt was deleted; it is sent again below
+                    pass
+            prompt = await self._show(cfg, embed, kind=kind)
+            return prompt
+
+        return Runner(cfg, deadline, self._subscription_for(cfg), None, kind,
+                      show)
+
+    @staticmethod
+    def _instrumented(cfg: Config, kind: str
+                      ) -> typing.AsyncContextManager[None]:
+        if cfg.instrumentation is None:
+            return _NOT_INSTRUMENTED
+        return cfg.instrumentation.step(kind, cfg.identity)
+
+    @contextlib.asynccontextmanager
+    async def _admission(self, cfg: Config) -> typing.AsyncIterator[None]:
+        # a slot is taken per step and released by the last step using
+        # it, unless the dialog is held (see `__aenter__`), in which case
+        # it is kept across steps until `close`
+        if cfg.admission is None:
+            yield
+            return
+        key = LeaseKey.from_cfg(cfg)
+        entry = self._admissions.get(key)
+        if entry is None:
+            await cfg.admission.acquire(key)
+            # another step may have taken the slot while we waited
+            entry = self._admissions.get(key)
+            if entry is None:
+                entry = self._admissions[key] = [cfg.admission, 0]
+            else:
+                cfg.admission.release(key)
+        entry[1] += 1
+        try:
+            yield
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not self._held:
+                del self._admissions[key]
+                entry[0].release(key)
+
+    @staticmethod
+    async def _guarded(lease: Lease | None,
+                       coro: typing.Awaitable) -> typing.Any:
+        if lease is None:
+            return await coro
+        return await lease.guard(coro)
+
+    def _file_result(self, message: discord.Message, cfg: Config,
+                     inspector: AttachmentInspector | None) -> FileResult:
+        # spooling later reuses the session of the config's inspector
+        result = FileResult(inspector=cfg.inspector)
+        result.add(message)
+        if inspector is not None:
+            result.adopt(inspector)
+        self._files[id(result)] = result
+        return result
+
+    async def close(self) -> None:
+        """Release any attachments spooled by this dialog's file results,
+        the leases and admission slots it holds, and apply pending panel
+        edits.
+
+        """
+        self._held = False
+        for key, entry in list(self._admissions.items()):
+            # slots still used by a running step are released by it
+            if not entry[1]:
+                del self._admissions[key]
+                entry[0].release(key)
+        for result in list(self._files.values()):
+            await result.close()
+        self._files.clear()
+        for lease in self._leases.values():
+            await lease.release()
+        self._leases.clear()
+        if self._panel is not None:
+            await self._panel.flush()
+
+    def broadcast(self, users: typing.Iterable[int] = None,
+                  roles: typing.Iterable[int] = None,
+                  max_replies: int = None, **cfg_overrides) -> Broadcast:
+        """Ask the text, number and choice steps of the returned
+        `Broadcast` to everyone allowed in this dialog's channel at once.
+
+        """
+        dialog = Dialog(self.cfg.override(**cfg_overrides))
+        dialog._broadcast = Broadcast(dialog, users, roles, max_replies)
+        return dialog._broadcast
+
+    async def __aenter__(self) -> "Dialog":
+        # the admission slot and lease taken by the first step are kept
+        # until the dialog is closed, rather than taken again by every
+        # step, so no other dialog can prompt the user in between
+        self._held = True
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
     
+    @staticmethod
+    def _locale(cfg: Config) -> str | None:
+        if cfg.locale is not None:
+            return cfg.locale
+        itx = cfg.itx(ignore=True)
+        return itx and str(itx.locale)
+
     @staticmethod
     def _dialog_embed(title: str, preface: str | None, body: str,
-                      cfg: Config, formatter: Formatter) -> discord.Embed:
-        return formatter.dialog_embed(title, preface, body, cfg.timestamp,
+                      cfg: Config, formatter: Formatter,
+                      deadline: float | None) -> discord.Embed:
+        return formatter.dialog_embed(title, preface, body,
+                                      _timer.timestamp(deadline),
                                       cfg.cancellable, cfg.skippable,
                                       cfg.cancel_keyword, cfg.skip_keyword,
-                                      cfg.dialog_embed_base)
+                                      cfg.dialog_embed_base,
+                                      Dialog._locale(cfg))
+
+    async def _step(self, title: str, preface: str | None, body: str,
+                    checkfn: typing.Callable[[discord.Message], typing.Any],
+                    cfg: Config, formatter: Formatter,
+                    deadline: float | None | type[types.MISSING] = types.MISSING
+                    ) -> typing.Any:
+        if self._broadcast is not None:
+            return await self._broadcast.step(title, preface, body, checkfn,
+                                              cfg, formatter, deadline)
+        # the lease is taken before anything is sent, so a user can't be
+        # prompted by two dialogs at once
+        async with self._admission(cfg), self._instrumented(
+                cfg, formatter.kind), self._leased(cfg) as lease:
+            if self._resume_deadline is not types.MISSING:
+                deadline, self._resume_deadline = (self._resume_deadline,
+                                                   types.MISSING)
+                # the prompt was sent before the dialog was resumed
+                message = None
+            else:
+                # the deadline is taken once, so the timestamp shown in the
+                # embed and the timeout enforced by the runner always agree
+                if deadline is types.MISSING:
+                    deadline = _timer.deadline(cfg.timeout)
+                embed = self._dialog_embed(title, preface, body, cfg,
+                                           formatter, deadline)
+                message = await self._show(cfg, embed, kind=formatter.kind)
+                if self._on_prompt is not None:
+                    self._on_prompt(message, deadline)
+
+            runner = self._runner(cfg, deadline, formatter.kind, message)
+            message, value = await self._guarded(lease, runner.run(checkfn))
+            return value
+
+    async def _component_step(self, title: str, preface: str | None,
+                              body: str,
+                              items: typing.Callable[[str], typing.Iterable[
+                                  discord.ui.Item]],
+                              checkfn: typing.Callable[[discord.Interaction],
+                                                       typing.Any],
+                              cfg: Config, formatter: Formatter,
+                              deadline: float | None | type[types.MISSING] = types.MISSING,
+                              show_deadline: bool = True) -> typing.Any:
+        async with self._admission(cfg), self._instrumented(
+                cfg, formatter.kind), self._leased(cfg) as lease:
+            if deadline is types.MISSING:
+                deadline = _timer.deadline(cfg.timeout)
+            router = _components.ComponentRouter.get(cfg.bot)
+            with router.subscribe() as subscription:
+                runner = _components.ComponentRunner(cfg, deadline,
+                                                     subscription,
+                                                     formatter.kind)
+                view = runner.view(items(subscription.identity))
+
+                # cancelling and skipping are done with buttons, so the
+                # embed doesn't tell the user to type the keywords
+                embed = formatter.dialog_embed(title, preface, body,
+                                               show_deadline and _timer.timestamp(deadline),
+                                               False, False, cfg.cancel_keyword,
+                                               cfg.skip_keyword,
+                                               cfg.dialog_embed_base,
+                                               self._locale(cfg))
+                message = await self._show(cfg, embed, view, formatter.kind)
+                try:
+                    interaction, value = await self._guarded(
+                            lease, runner.run(checkfn))
+                except (exceptions.TimedOut, asyncio.CancelledError):
+                    await self._strip(cfg, message)
+                    raise
+                return value
+
+    async def _strip(self, cfg: Config, message: typing.Any) -> None:
+        # answered, cancelled and skipped steps lose their components when
+        # the interaction is responded to; steps that time out or whose
+        # task is cancelled would otherwise keep components nobody listens
+        # to anymore
+        panel = self._panel_for(cfg)
+        if panel is not None:
+            panel.strip()
+            return
+        # interaction responses return a callback response, which holds
+        # the message
+        message = getattr(message, "resource", message)
+        itx = cfg.itx(ignore=True)
+        try:
+            if hasattr(message, "edit"):
+                await message.edit(view=None)
+            elif itx is not None:
+                await itx.edit_original_response(view=None)
+        except discord.HTTPException:
+            pass
 
     async def error(self, exc: Exception) -> None:
         formatter = Formatter()
@@ -29,33 +346,67 @@ class Dialog:
         elif isinstance(exc, exceptions.TimedOut):
             embed = formatter.error_embed(self.cfg.error_embed_base,
                                           description = "*This command has timed out.*")
+        elif isinstance(exc, exceptions.Overloaded):
+            embed = formatter.error_embed(self.cfg.error_embed_base,
+                                          description = "*Too many dialogs are open right now, please try again later.*")
         else:
             raise exc from exc
+        if self._panel is not None:
+            await self._panel.show(embed)
+            await self._panel.flush()
+            return
         await self.cfg.best_sender(embed=embed)
 
     async def prompt(self, title: str, body: str, length: int = None,
                      continue_keyword: str | None = "continue",
+                     use_itx: bool = False,
                      formatter: Formatter[type[types.MISSING]] = ..., **cfg_overrides) -> None:
         if length is None and continue_keyword is None:
             raise ValueError("one of 'length' or 'continue_keyword' must not be None")
         cfg = self.cfg.override(**cfg_overrides)
         if formatter == ...:
             formatter = default_formatters.PromptFormatter()
-        preface, body, checkfn = formatter.get_all(body, continue_keyword, length)
 
-        embed = self._dialog_embed(title, preface, body, cfg, formatter)
-        await cfg.best_sender(embed=embed)
+        if use_itx:
+            # the continue button replaces typing the continue keyword, and
+            # the prompt's length is the runner's deadline
+            deadline = _timer.deadline(length)
+            preface, body, checkfn = formatter.get_all(body, None, length,
+                                                       deadline)
+            try:
+                await self._component_step(
+                        title, preface, body,
+                        lambda token: formatter.components(token,
+                                                           continue_keyword),
+                        formatter.component_checkfn(),
+                        cfg.override(timeout=length), formatter,
+                        deadline, show_deadline=False)
+            except exceptions.TimedOut:
+                pass
+            return
 
-        # override cfg again after main embed is sent so the
-        # "automatically cancelled in..." str isn't appended to the end of it
-        cfg2 = cfg.override(timeout=length)
-        runner: Runner[type[types.MISSING]] = Runner(cfg2)
+        async with self._admission(cfg), self._instrumented(
+                cfg, formatter.kind), self._leased(cfg) as lease:
+            # the prompt continues when the timer wheel reaches this
+            # deadline, which is also the one shown in its body
+            deadline = _timer.deadline(length)
+            preface, body, checkfn = formatter.get_all(body, continue_keyword,
+                                                       length, deadline)
+            embed = self._dialog_embed(title, preface, body, cfg, formatter,
+                                       _timer.deadline(cfg.timeout))
+            message = await self._show(cfg, embed, kind=formatter.kind)
 
-        # runner.run will raise TimedOut if it reaches the timeout
-        try:
-            message, value = await runner.run(checkfn)
-        except exceptions.TimedOut:
-            return
+            # override cfg again after main embed is sent so the
+            # "automatically cancelled in..." str isn't appended to the end of it
+            cfg2 = cfg.override(timeout=length)
+            runner: Runner[type[types.MISSING]] = self._runner(
+                    cfg2, deadline, formatter.kind, message)
+
+            # runner.run will raise TimedOut if it reaches the timeout
+            try:
+                message, value = await self._guarded(lease, runner.run(checkfn))
+            except exceptions.TimedOut:
+                return
 
     async def text(self, title: str, body: str = None,
                    formatter: Formatter[str] = ..., **cfg_overrides) -> str:
@@ -63,13 +414,8 @@ class Dialog:
         if formatter == ...:
             formatter = default_formatters.TextFormatter()
         preface, body, checkfn = formatter.get_all(cfg.error_embed_base, body)
-
-        embed = self._dialog_embed(title, preface, body, cfg, formatter)
-        await cfg.best_sender(embed=embed)
-
-        runner: Runner[str] = Runner(cfg)
-        message, value = await runner.run(checkfn)
-        return value
+        return await self._step(title, preface, body, checkfn, cfg,
+                                formatter)
 
     async def number(self, title: str, body: str = None,
                      min_value: int | float = None,
@@ -81,58 +427,225 @@ class Dialog:
             formatter = default_formatters.NumberFormatter()
         preface, body, checkfn = formatter.get_all(cfg.error_embed_base, body,
                                                    min_value, max_value)
+        return await self._step(title, preface, body, checkfn, cfg,
+                                formatter)
 
-        embed = self._dialog_embed(title, preface, body, cfg, formatter)
-        await cfg.best_sender(embed=embed)
-
-        runner: Runner[float] = Runner(cfg)
-        message, value = await runner.run(checkfn)
-        return value
-
-    # pending: add `use_itx` option to use views
     async def choice(self, title: str, choices: typing.Iterable[str], body: str = None,
                      min_choices: int = None, max_choices: int = None,
                      keys: typing.Iterable[str] = None, remove_duplicates: bool = True,
+                     case_insensitive: bool = False,
+                     normalize_whitespace: bool = False,
+                     page_size: int = None,
+                     search: bool | _search.ChoiceIndex = False,
+                     use_itx: bool = False,
                      formatter: Formatter[tuple[tuple[str, ...], tuple[int, ...]]] = ...,
                      **cfg_overrides) -> tuple[tuple[str, ...], tuple[int, ...]]:
+        # select menus can't hold more than `component_limit` options, nor
+        # show custom keys or pick a choice twice, so bigger (or paged)
+        # choice sets, and those with keys or duplicates, fall back to
+        # typed replies
+        if (use_itx and page_size is None and not search and keys is None
+            and remove_duplicates):
+            choices = list(choices)
+            if len(choices) <= default_formatters.ChoiceFormatter.component_limit:
+                return await self._component_choice(title, choices, body,
+                                                    min_choices, max_choices,
+                                                    formatter, **cfg_overrides)
+        # searching needs every choice indexed; the index (passed in, or
+        # cached for this very sequence) then doubles as the source of
+        # the choices
+        if search is True:
+            search = _search.ChoiceIndex.get(choices)
+        if search:
+            choices = search.choices
+        else:
+            search = None
+        if page_size is not None:
+            return await self._paged_choice(title, choices, body, min_choices,
+                                            max_choices, keys,
+                                            remove_duplicates,
+                                            case_insensitive,
+                                            normalize_whitespace, page_size,
+                                            search, formatter, **cfg_overrides)
         if not keys:
             keys = [str(i) for i in range(1, len(choices) + 1)]
         cfg = self.cfg.override(**cfg_overrides)
         if formatter == ...:
             formatter = default_formatters.ChoiceFormatter()
+        deadline = _timer.deadline(cfg.timeout)
+
+        # narrowed lists of search results are shown in place of the
+        # prompt, through `Dialog._show`
+        def render(preface: str | None, body: str) -> types.Rerender:
+            return types.Rerender(self._dialog_embed(title, preface, body,
+                                                     cfg, formatter,
+                                                     deadline))
+
         preface, body, checkfn = formatter.get_all(cfg.error_embed_base, body, list(choices),
                                                    list(keys), min_choices, max_choices,
-                                                   remove_duplicates)
+                                                   remove_duplicates,
+                                                   case_insensitive,
+                                                   normalize_whitespace,
+                                                   search, render)
+        return await self._step(title, preface, body, checkfn, cfg,
+                                formatter, deadline)
+    
+    async def _component_choice(self, title: str, choices: list[str],
+                                body: str | None, min_choices: int | None,
+                                max_choices: int | None,
+                                formatter: Formatter[tuple[tuple[str, ...],
+                                                           tuple[int, ...]]],
+                                **cfg_overrides
+                                ) -> tuple[tuple[str, ...], tuple[int, ...]]:
+        cfg = self.cfg.override(**cfg_overrides)
+        if formatter == ...:
+            formatter = default_formatters.ChoiceFormatter()
+        return await self._component_step(
+                title, formatter.component_preface(min_choices, max_choices),
+                body or "Please make your choice below.",
+                lambda token: formatter.components(token, choices, min_choices,
+                                                   max_choices),
+                formatter.component_checkfn(cfg.error_embed_base, choices,
+                                            min_choices, max_choices),
+                cfg, formatter)
 
-        embed = self._dialog_embed(title, preface, body, cfg, formatter)
-        await cfg.best_sender(embed=embed)
+    async def _paged_choice(self, title: str, choices: typing.Iterable[str],
+                            body: str | None, min_choices: int | None,
+                            max_choices: int | None,
+                            keys: typing.Iterable[str] | None,
+                            remove_duplicates: bool,
+                            case_insensitive: bool, normalize_whitespace: bool,
+                            page_size: int,
+                            search: _search.ChoiceIndex | None,
+                            formatter: Formatter[tuple[tuple[str, ...],
+                                                       tuple[int, ...]]],
+                            **cfg_overrides
+                            ) -> tuple[tuple[str, ...], tuple[int, ...]]:
+        if page_size < 1:
+            raise ValueError("page_size must be greater than or equal to 1")
+        cfg = self.cfg.override(**cfg_overrides)
+        if formatter == ...:
+            formatter = default_formatters.PagedChoiceFormatter()
+        deadline = _timer.deadline(cfg.timeout)
+
+        # other pages are shown in place of the prompt as the user
+        # navigates, through `Dialog._show`
+        def render(preface: str | None, body: str) -> types.Rerender:
+            return types.Rerender(self._dialog_embed(title, preface, body,
+                                                     cfg, formatter,
+                                                     deadline))
+
+        preface, body, checkfn = formatter.get_all(cfg.error_embed_base, body,
+                                                   choices, keys, page_size,
+                                                   min_choices, max_choices,
+                                                   render, case_insensitive,
+                                                   normalize_whitespace,
+                                                   search, remove_duplicates)
+        return await self._step(title, preface, body, checkfn, cfg,
+                                formatter, deadline)
 
-        runner: Runner[tuple[tuple[str, ...], tuple[int, ...]]] = Runner(cfg)
-        message, value = await runner.run(checkfn)
-        return value
-    
     async def file(self, title: str, body: str = None, min_files: int = None,
                    max_files: int = None,
                    allowed_mimetypes: typing.Iterable[str] = None,
                    allowed_extensions: typing.Iterable[str] = None,
                    finished_keyword: str = "done",
+                   max_file_size: int = None, max_total_size: int = None,
+                   inspector: AttachmentInspector = None,
                    formatter: Formatter[list[discord.Attachment]] = ...,
-                   **cfg_overrides) -> list[discord.Attachment]:
+                   **cfg_overrides) -> FileResult:
         cfg = self.cfg.override(**cfg_overrides)
         if formatter == ...:
             formatter = default_formatters.FileFormatter()
+        if inspector is None and cfg.inspector is not None:
+            inspector = cfg.inspector.scope()
+        result = FileResult(inspector=cfg.inspector)
         preface, body, checkfn = formatter.get_all(cfg.error_embed_base, body,
-                                                   [], min_files, max_files,
+                                                   result, min_files, max_files,
                                                    allowed_mimetypes,
                                                    allowed_extensions,
-                                                   finished_keyword)
+                                                   finished_keyword,
+                                                   max_file_size,
+                                                   max_total_size, inspector)
+        try:
+            value = await self._step(title, preface, body, checkfn, cfg,
+                                     formatter)
+            if value is not None and inspector is not None:
+                result.adopt(inspector)
+        except BaseException:
+            # the result is never handed out, so nothing else would release
+            # what was kept for it
+            await result.close()
+            raise
+        finally:
+            # anything else it prefetched (for rejected messages, or checks
+            # cut short by check_timeout) goes with it
+            if inspector is not None:
+                await inspector.close()
+        if value is None:
+            await result.close()
+            return value
+        self._files[id(result)] = result
+        return value
+
+    async def stream(self, title: str, body: str = None,
+                     finished_keyword: str = "done", files: bool = False,
+                     allowed_mimetypes: typing.Iterable[str] = None,
+                     allowed_extensions: typing.Iterable[str] = None,
+                     max_file_size: int = None, buffer: int = 16,
+                     batch_size: int = None, batch_interval: float = None,
+                     inspector: AttachmentInspector = None,
+                     formatter: Formatter[str | list[discord.Attachment]] = ...,
+                     **cfg_overrides
+                     ) -> typing.AsyncIterator[typing.Any]:
+        """Yield each valid response as it is sent, until the user types
+        `finished_keyword` or skips.
+
+        Responses are texts, or with `files`, a `FileResult` of the
+        attachments of each message, checked (and prefetched) by
+        `inspector` as in `Dialog.file`. At most `buffer` responses are
+        checked ahead of the consumer; with `batch_size` or
+        `batch_interval`, they are yielded in lists (see
+        `_stream.buffered`). Cancelling and timing out raise as they do
+        for other steps. The timeout is a single deadline for the whole
+        stream, as shown in the prompt; it is not extended as responses
+        arrive.
+        """
+        cfg = self.cfg.override(**cfg_overrides)
+        if formatter == ...:
+            formatter = default_formatters.StreamFormatter()
+        if files and inspector is None and cfg.inspector is not None:
+            inspector = cfg.inspector.scope()
+        preface, body, checkfn = formatter.get_all(cfg.error_embed_base, body,
+                                                   finished_keyword.lower(),
+                                                   files, allowed_mimetypes,
+                                                   allowed_extensions,
+                                                   max_file_size, inspector)
+        async with self._admission(cfg), self._instrumented(
+                cfg, formatter.kind), self._leased(cfg) as lease:
+            deadline = _timer.deadline(cfg.timeout)
+            embed = self._dialog_embed(title, preface, body, cfg, formatter,
+                                       deadline)
+            prompt = await self._show(cfg, embed, kind=formatter.kind)
 
-        embed = self._dialog_embed(title, preface, body, cfg, formatter)
-        await cfg.best_sender(embed=embed)
+            runner = self._runner(cfg, deadline, formatter.kind, prompt)
 
-        runner: Runner[list[discord.Attachment]] = Runner(cfg)
-        message, value = await runner.run(checkfn)
-        return value
+            async def values() -> typing.AsyncIterator[typing.Any]:
+                async with contextlib.aclosing(
+                        runner.stream(checkfn)) as responses:
+                    async for message, value in responses:
+                        if files:
+                            value = self._file_result(message, cfg, inspector)
+                        yield value
+
+            try:
+                async with contextlib.aclosing(_stream.buffered(
+                        values(), buffer, batch_size, batch_interval,
+                        lease and lease.guard)) as responses:
+                    async for response in responses:
+                        yield response
+            finally:
+                if inspector is not None:
+                    await inspector.close()
 
 # class Context:
 #     def __init__(self, __cfg: Config) -> None:
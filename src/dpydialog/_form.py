@@ -0,0 +1,362 @@
+from ._dialog import Dialog
+from ._config import Config
+from ._formatter import Formatter
+from ._spool import FileResult
+from ._lease import LeaseKey
+from ._state import Checkpoint, DialogStateStore
+from . import default_formatters
+from . import exceptions
+from . import _router
+from . import _timer
+from . import types
+from discord.ext import commands
+import discord
+import asyncio
+import typing
+import time
+
+
+KINDS = ("prompt", "text", "number", "choice", "file")
+# the options of each kind that are arguments of its `Dialog` method,
+# rather than config overrides, for the fields asked through `Dialog._step`
+_ARGUMENTS = {
+    "text": (),
+    "number": ("min_value", "max_value"),
+    "choice": ("choices", "min_choices", "max_choices", "keys",
+               "remove_duplicates", "case_insensitive",
+               "normalize_whitespace", "page_size", "search", "use_itx"),
+}
+
+
+class FormResult(typing.Mapping[str, typing.Any]):
+    """The results of a `Form` run, by field name.
+
+    Results can also be read as attributes. Text fields hold a `str`,
+    number fields a `float`, choice fields the (values, indexes) tuple of
+    `Dialog.choice`, file fields a `FileResult` and prompt fields None;
+    skipped fields are None, and fields left out by their `when`
+    condition are missing.
+    """
+    __slots__ = ("_values",)
+
+    def __init__(self, values: dict[str, typing.Any]) -> None:
+        object.__setattr__(self, "_values", values)
+
+    def __getitem__(self, name: str) -> typing.Any:
+        return self._values[name]
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        raise AttributeError("FormResult objects are immutable")
+
+    def __repr__(self) -> str:
+        return f"FormResult({self._values!r})"
+
+
+class Field:
+    """A single question of a `Form`.
+
+    `kind` is the name of the `Dialog` method used to ask it, and
+    `options` are passed on to that method. When `when` is given, the
+    field is only asked if it returns True for the results so far.
+    """
+    def __init__(self, name: str, kind: str, title: str, body: str = None,
+                 when: typing.Callable[[dict[str, typing.Any]], bool] = None,
+                 formatter: Formatter = ..., **options) -> None:
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        if kind == "prompt" and body is None:
+            raise ValueError("prompt fields require a body")
+        if kind == "choice" and "choices" not in options:
+            raise ValueError("choice fields require choices")
+        self.name = name
+        self.kind = kind
+        self.title = title
+        self.body = body
+        self.when = when
+        self.options = options
+        # formatters are stateless, so one instance serves every run
+        if formatter == ...:
+            formatter = self._default_formatter(kind, options)
+        self.formatter = formatter
+        # text, number and plain choice fields build their preface, body
+        # and checkfn once, for the error embed base they were last asked
+        # with; paged, searched and component choices keep per-run state,
+        # and the other kinds aren't worth it, so they go through their
+        # `Dialog` method
+        self._compiled: tuple[typing.Any, tuple] | None = None
+        self._arguments: dict[str, typing.Any] | None = None
+        self._cfg_overrides: dict[str, typing.Any] = {}
+        if kind in _ARGUMENTS and not (
+                options.get("page_size") is not None
+                or options.get("search") not in (None, False)
+                or options.get("use_itx")):
+            self._arguments = {k: v for k, v in options.items()
+                               if k in _ARGUMENTS[kind]}
+            self._cfg_overrides = {k: v for k, v in options.items()
+                                   if k not in _ARGUMENTS[kind]}
+            if kind == "choice":
+                choices = self._arguments["choices"] = list(
+                        self._arguments["choices"])
+                if not self._arguments.get("keys"):
+                    self._arguments["keys"] = [
+                            str(i) for i in range(1, len(choices) + 1)]
+
+    @staticmethod
+    def _default_formatter(kind: str, options: dict[str, typing.Any]
+                           ) -> Formatter:
+        if kind == "prompt":
+            return default_formatters.PromptFormatter()
+        if kind == "text":
+            return default_formatters.TextFormatter()
+        if kind == "number":
+            return default_formatters.NumberFormatter()
+        if kind == "choice" and options.get("page_size") is not None:
+            return default_formatters.PagedChoiceFormatter()
+        if kind == "choice":
+            return default_formatters.ChoiceFormatter()
+        return default_formatters.FileFormatter()
+
+    async def ask(self, dialog: Dialog) -> typing.Any:
+        if self._arguments is None:
+            method = getattr(dialog, self.kind)
+            return await method(self.title, body=self.body,
+                                formatter=self.formatter, **self.options)
+        cfg = dialog.cfg.override(**self._cfg_overrides)
+        preface, body, checkfn = self._get_all(cfg.error_embed_base)
+        return await dialog._step(self.title, preface, body, checkfn, cfg,
+                                  self.formatter)
+
+    def _get_all(self, embed_base: discord.Embed | dict) -> tuple:
+        if self._compiled is not None and self._compiled[0] is embed_base:
+            return self._compiled[1]
+        args = self._arguments
+        if self.kind == "text":
+            compiled = self.formatter.get_all(embed_base, self.body)
+        elif self.kind == "number":
+            compiled = self.formatter.get_all(embed_base, self.body,
+                                              args.get("min_value"),
+                                              args.get("max_value"))
+        else:
+            compiled = self.formatter.get_all(
+                    embed_base, self.body, args["choices"], list(args["keys"]),
+                    args.get("min_choices"), args.get("max_choices"),
+                    args.get("remove_duplicates", True),
+                    args.get("case_insensitive", False),
+                    args.get("normalize_whitespace", False))
+        self._compiled = (embed_base, compiled)
+        return compiled
+
+    def encode(self, value: typing.Any) -> typing.Any:
+        """Convert a result of this field into something JSON-serializable.
+
+        """
+        if value is None:
+            return None
+        if self.kind == "file":
+            # attachments are stored by where they were sent, as their
+            # urls expire
+            return [(*value.sources.get(attachment.id, (None, None)),
+                     attachment.id) for attachment in value]
+        return value
+
+    async def decode(self, value: typing.Any, bot: commands.Bot
+                     ) -> typing.Any:
+        """Convert a result encoded by `encode` back into its original form.
+
+        Attachments are fetched again from their messages; those whose
+        message was deleted (or is unknown) are left out.
+        """
+        if value is None:
+            return None
+        if self.kind == "choice":
+            return tuple(tuple(part) for part in value)
+        if self.kind == "file":
+            result = FileResult()
+            messages: dict[tuple[int, int], discord.Message | None] = {}
+            for channel_id, message_id, attachment_id in value:
+                if message_id is None:
+                    continue
+                source = (channel_id, message_id)
+                if source not in messages:
+                    channel = (bot.get_channel(channel_id)
+                               or bot.get_partial_messageable(channel_id))
+                    try:
+                        messages[source] = await channel.fetch_message(
+                                message_id)
+                    except discord.NotFound:
+                        messages[source] = None
+                message = messages[source]
+                attachment = message and discord.utils.get(
+                        message.attachments, id=attachment_id)
+                if attachment is not None:
+                    result.append(attachment)
+                    result.sources[attachment_id] = source
+            return result
+        return value
+
+
+class Form:
+    """A sequence of questions asked as a single dialog.
+
+    The config is resolved and a single router subscription is registered
+    once per run rather than once per question, and messages sent between
+    questions are kept for the next one instead of being dropped.
+
+    When run with a `DialogStateStore`, the progress of the run is
+    checkpointed after every prompt and answer, and runs interrupted by a
+    restart can be continued with `resume`. Forms used with a store need
+    a `name` that is stable across restarts.
+    """
+    def __init__(self, fields: typing.Iterable[Field], name: str = None,
+                 **cfg_overrides) -> None:
+        self.fields = list(fields)
+        names = [field.name for field in self.fields]
+        if len(set(names)) != len(names):
+            raise ValueError("field names must be unique")
+        self.name = name
+        self.cfg_overrides = cfg_overrides
+
+    def key(self, identity: types.Identity) -> str:
+        return f"{self.name}:{identity.channel_id}:{identity.user_id}"
+
+    async def run(self, dialog: Dialog, store: DialogStateStore = None
+                  ) -> FormResult:
+        """Ask each field in turn and return the results by field name.
+
+        Fields skipped by their `when` condition are left out of the
+        results; skipped (via the skip keyword) fields are None.
+        """
+        cfg = dialog.cfg.override(**self.cfg_overrides)
+        return await self._run(dialog, cfg, store, None)
+
+    async def resume(self, bot: commands.Bot, store: DialogStateStore,
+                     **cfg_overrides) -> list[asyncio.Task]:
+        """Continue every run of this form checkpointed in `store`.
+
+        Each run is continued in the channel it was started in, in a task
+        of its own. A prompt that was sent before the restart and has not
+        timed out yet is waited on again rather than sent a second time.
+        """
+        tasks: list[asyncio.Task] = []
+        for checkpoint in await store.pending(self.name):
+            # the run would have timed out while we were down
+            if (checkpoint.prompted and checkpoint.deadline is not None
+                and checkpoint.deadline <= time.time()):
+                store.delete(checkpoint.key)
+                continue
+            channel = (bot.get_channel(checkpoint.channel_id)
+                       or bot.get_partial_messageable(checkpoint.channel_id))
+            cfg = Config(bot, None, channel,
+                         identity=(checkpoint.channel_id,
+                                   checkpoint.user_id))
+            dialog = Dialog(cfg.override(**cfg_overrides))
+            # with leases, runs still owned by a live process (or handed
+            # to another one) are left to their owner
+            if dialog.cfg.leases is not None:
+                key = LeaseKey.from_cfg(dialog.cfg)
+                try:
+                    dialog._leases[key] = await dialog.cfg.leases.acquire(key)
+                except exceptions.LeaseHeld:
+                    continue
+            tasks.append(asyncio.ensure_future(
+                    self._resumed(dialog, store, checkpoint)))
+        return tasks
+
+    async def _resumed(self, dialog: Dialog, store: DialogStateStore,
+                       checkpoint: Checkpoint) -> FormResult:
+        try:
+            cfg = dialog.cfg.override(**self.cfg_overrides)
+            return await self._run(dialog, cfg, store, checkpoint)
+        finally:
+            await dialog.close()
+
+    async def _run(self, dialog: Dialog, cfg: Config,
+                   store: DialogStateStore | None,
+                   checkpoint: Checkpoint | None) -> FormResult:
+        if store is not None and (self.name is None or cfg.identity is None):
+            raise ValueError("forms run with a store require a name and a "
+                             "Config with an identity")
+        router = _router.DialogRouter.get(cfg.bot)
+        with router.subscribe(cfg.identity,
+                              cfg.identity_checkfn) as subscription:
+            session = Dialog(cfg, subscription)
+            # file results belong to the caller's dialog, so they are
+            # released when it is closed
+            session._files = dialog._files
+            session._leases = dialog._leases
+            session._admissions = dialog._admissions
+            session._held = dialog._held
+            session._panel = dialog._panel_for(cfg)
+            results: dict[str, typing.Any] = {}
+            encoded: dict[str, typing.Any] = {}
+            start = 0
+            if checkpoint is not None:
+                fields = {field.name: field for field in self.fields}
+                encoded = dict(checkpoint.values)
+                results = {name: await fields[name].decode(value, cfg.bot)
+                           for name, value in encoded.items()}
+                start = checkpoint.step
+            # the lease (if any) is held for the whole run
+            async with session._admission(cfg), session._leased(cfg):
+                return FormResult(await self._ask(session, cfg, store,
+                                                  checkpoint, start, results,
+                                                  encoded))
+
+    async def _ask(self, session: Dialog, cfg: Config,
+                   store: DialogStateStore | None,
+                   checkpoint: Checkpoint | None, start: int,
+                   results: dict[str, typing.Any],
+                   encoded: dict[str, typing.Any]) -> dict[str, typing.Any]:
+        if store is None:
+            for field in self.fields[start:]:
+                if field.when is not None and not field.when(results):
+                    continue
+                results[field.name] = await field.ask(session)
+            return results
+
+        key = self.key(cfg.identity)
+        checkpoint = checkpoint or Checkpoint(
+                key, self.name, cfg.identity.channel_id,
+                cfg.identity.user_id, 0, {})
+        if checkpoint.prompted:
+            session._resume_deadline = _timer.from_timestamp(
+                    checkpoint.deadline)
+
+        def on_prompt(message: typing.Any, deadline: float | None) -> None:
+            message_id = getattr(message, "id", None)
+            store.save(checkpoint._replace(
+                    prompted=True, deadline=_timer.timestamp(deadline),
+                    message_ids=(() if message_id is None
+                                 else (message_id,))))
+
+        session._on_prompt = on_prompt
+        try:
+            for step in range(start, len(self.fields)):
+                field = self.fields[step]
+                if field.when is None or field.when(results):
+                    results[field.name] = value = await field.ask(session)
+                    encoded[field.name] = field.encode(value)
+                # a resumed deadline only applies to the step it was
+                # saved for, even if that step doesn't use it
+                session._resume_deadline = types.MISSING
+                checkpoint = checkpoint._replace(
+                        step=step + 1, values=dict(encoded),
+                        prompted=False, deadline=None, message_ids=())
+                store.save(checkpoint)
+        except (exceptions.Cancelled, exceptions.TimedOut):
+            store.delete(key)
+            raise
+        store.delete(key)
+        return results
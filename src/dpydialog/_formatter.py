@@ -1,11 +1,81 @@
+from ._templates import Catalogue, CompiledEmbed, embed_attrs, build_embed
 from . import types
 from . import constants
+import collections
 import discord
 import typing
 
 
+class CacheInfo(typing.NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class ErrorEmbedCache:
+    """A bounded LRU cache of embeds built from an embed base.
+
+    Error embeds are keyed on the identity of the embed base and the
+    keyword arguments passed to `Formatter.error_embed`, which returns a
+    fresh copy of the cached embed each time. Compiled dialog embeds (see
+    `Formatter.dialog_embed`) are cached the same way.
+    """
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: collections.OrderedDict[
+            tuple, tuple[discord.Embed | dict, typing.Any]
+        ] = collections.OrderedDict()
+
+    def get(self, embed_base: discord.Embed | dict,
+            key: tuple) -> typing.Any:
+        entry = self._entries.get(key)
+        # the id of a collected base may be reused by a new object, so
+        # we also make sure the cached base is the same object
+        if entry is None or entry[0] is not embed_base:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, embed_base: discord.Embed | dict, key: tuple,
+            embed: typing.Any) -> None:
+        self._entries[key] = (embed_base, embed)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, embed_base: discord.Embed | dict = None) -> None:
+        """Drop the cached embeds built from `embed_base` (or all of them).
+
+        This must be called after mutating an embed base in place.
+        """
+        if embed_base is None:
+            self._entries.clear()
+            return
+        for key in [k for k, (base, _) in self._entries.items()
+                    if base is embed_base]:
+            del self._entries[key]
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self._entries))
+
 
 class Formatter(typing.Generic[types.VT]):
+    """Builds the text and checkfn of a dialog step.
+
+    Checkfns return the value of the step, an embed to reply with, or
+    None to ignore the response. They may also be coroutine functions,
+    or checkfns wrapped with `offload` to run them in an executor, for
+    checks too slow to run on the event loop.
+    """
+    # the type of dialog, as reported to instrumentation
+    kind = "custom"
+
     def get_all(self, *args, **kwargs
                 ) -> tuple[str | None, str, typing.Callable[[discord.Message],
                                                             typing.Union[
@@ -31,8 +101,24 @@ class Formatter(typing.Generic[types.VT]):
                                                           ]]:
         raise NotImplementedError()
 
+    error_embed_cache = ErrorEmbedCache()
+
     def error_embed(self, embed_base: discord.Embed | dict,
                     **kwargs) -> discord.Embed:
+        try:
+            key = (id(embed_base), frozenset(kwargs.items()))
+        except TypeError:
+            # unhashable values can't be cached
+            return self._build_error_embed(embed_base, **kwargs)
+        attrs = self.error_embed_cache.get(embed_base, key)
+        if attrs is None:
+            attrs = embed_attrs(self._build_error_embed(embed_base, **kwargs))
+            self.error_embed_cache.put(embed_base, key, attrs)
+        return build_embed(discord.Embed, attrs)
+
+    @staticmethod
+    def _build_error_embed(embed_base: discord.Embed | dict,
+                           **kwargs) -> discord.Embed:
         if isinstance(embed_base, discord.Embed):
             embed_dict = embed_base.to_dict()
         else:
@@ -43,53 +129,60 @@ class Formatter(typing.Generic[types.VT]):
             embed.set_footer(text=constants.CREATOR_REFERENCE)
         return embed
 
+    dialog_embed_cache = ErrorEmbedCache()
+    # the templates dialog embeds are rendered from
+    catalogue = Catalogue()
+
     def dialog_embed(self, title: str, preface: str, body: str,
                      timestamp: float | None, cancellable: bool,
                      skippable: bool, cancel_keyword: str, skip_keyword: str,
-                     embed_base: discord.Embed | dict) -> discord.Embed:
+                     embed_base: discord.Embed | dict,
+                     locale: str | None = None) -> discord.Embed:
         """Create and return a `discord.Embed` object based on various criteria.
         
+        Everything but the title, preface, body and timestamp is compiled
+        once per formatter class, embed base, flags and locale, and cached
+        in `dialog_embed_cache`. An embed base mutated in place keeps being
+        rendered as it was when compiled until
+        `dialog_embed_cache.invalidate(embed_base)` is called.
         """
-        buf: list[str] = []
+        # subclasses may compile embeds differently
+        key = (type(self), id(embed_base), id(self.catalogue), locale,
+               cancellable, skippable, cancel_keyword, skip_keyword,
+               constants.CREATOR_REFERENCE)
+        compiled = self.dialog_embed_cache.get(embed_base, key)
+        if compiled is None or compiled.catalogue is not self.catalogue:
+            compiled = self.compile_dialog_embed(cancellable, skippable,
+                                                 cancel_keyword, skip_keyword,
+                                                 embed_base, locale)
+            self.dialog_embed_cache.put(embed_base, key, compiled)
+        return compiled.render(title, preface, body, timestamp)
 
-        # preface and body
-        if preface:
-            buf.append(f"*`{preface}`*")
-        buf.append(body)
+    def compile_dialog_embed(self, cancellable: bool, skippable: bool,
+                             cancel_keyword: str, skip_keyword: str,
+                             embed_base: discord.Embed | dict,
+                             locale: str | None = None) -> CompiledEmbed:
+        templates = self.catalogue.get(locale)
 
         # cancel message and skip message
-        cancel_msg = f"**`{cancel_keyword}`** to cancel"
-        skip_msg = f"**`{skip_keyword}`** to skip"
+        cancel_msg = templates["cancel"].format(keyword=cancel_keyword)
+        skip_msg = templates["skip"].format(keyword=skip_keyword)
         if cancellable and skippable:
-            postface = f"You may type {cancel_msg} or {skip_msg}."
+            postface = templates["cancel_or_skip"].format(cancel=cancel_msg,
+                                                          skip=skip_msg)
         elif cancellable:
-            postface = f"You may type {cancel_msg}."
+            postface = templates["cancel_only"].format(cancel=cancel_msg)
         elif skippable:
-            postface = f"You may type {skip_msg}."
+            postface = templates["skip_only"].format(skip=skip_msg)
         else:
             postface = ""
-        
-        # auto cancel message (appended to postface)
-        if timestamp:
-            if postface:
-                postface += " "
-            postface += ("This dialog will be automatically cancelled "
-                        f"<t:{int(timestamp)}:R> if not responded to.")
-        
-        # add postface to buffer
-        if postface:
-            buf.append(f"*{postface}*")
-        
+
         # get base embed dict
         if isinstance(embed_base, discord.Embed):
             embed_dict = embed_base.to_dict()
         else:
             embed_dict = dict(embed_base)
-        
-        # add to base embed dict and return new embed
-        embed_dict["title"] = title
-        embed_dict["description"] = "\n\n".join(buf)
-        embed = discord.Embed.from_dict(embed_dict)
+        skeleton = discord.Embed.from_dict(embed_dict)
         if constants.CREATOR_REFERENCE:
-            embed.set_footer(text=constants.CREATOR_REFERENCE)
-        return embed
+            skeleton.set_footer(text=constants.CREATOR_REFERENCE)
+        return CompiledEmbed(skeleton, self.catalogue, templates, postface)
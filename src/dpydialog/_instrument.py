@@ -0,0 +1,198 @@
+from . import _timer
+from . import types
+import collections
+import contextlib
+import bisect
+import typing
+
+
+DIALOG_START = "dialog_start"
+DIALOG_END = "dialog_end"
+PROMPT_SENT = "prompt_sent"
+MESSAGE_RECEIVED = "message_received"
+CHECK_PASSED = "check_passed"
+CHECK_FAILED = "check_failed"
+CANCELLED = "cancelled"
+SKIPPED = "skipped"
+TIMED_OUT = "timed_out"
+
+EVENTS = (DIALOG_START, DIALOG_END, PROMPT_SENT, MESSAGE_RECEIVED,
+          CHECK_PASSED, CHECK_FAILED, CANCELLED, SKIPPED, TIMED_OUT)
+
+
+class Event(typing.NamedTuple):
+    """Something that happened in a dialog step.
+
+    `kind` is the type of dialog ("text", "number", ...) and `time` a
+    `time.monotonic` reading. `duration` depends on the event: the time
+    the prompt took to send (prompt_sent), the time since the prompt was
+    sent (message_received), the time the checkfn took (check_passed and
+    check_failed), or the time the whole step took (dialog_end).
+    `attempt` counts the responses received by the step so far.
+    `data` is the message or interaction received (message_received),
+    the embed sent (prompt_sent and check_failed), or the value the
+    check returned (check_passed).
+    """
+    name: str
+    kind: str
+    time: float
+    duration: float | None = None
+    attempt: int | None = None
+    identity: types.Identity | None = None
+    data: typing.Any = None
+
+
+class Instrumentation:
+    """An event bus for dialog events.
+
+    Set as the `instrumentation` flag of a `Config`; callbacks added with
+    `subscribe` are called with every `Event`. When the flag is None (the
+    default), dialogs skip instrumentation entirely.
+    """
+    def __init__(self) -> None:
+        self._callbacks: list[typing.Callable[[Event], typing.Any]] = []
+
+    def subscribe(self, callback: typing.Callable[[Event], typing.Any]
+                  ) -> typing.Callable[[Event], typing.Any]:
+        self._callbacks.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: typing.Callable[[Event], typing.Any]
+                    ) -> None:
+        self._callbacks.remove(callback)
+
+    def emit(self, name: str, kind: str, duration: float = None,
+             attempt: int = None, identity: types.Identity = None,
+             data: typing.Any = None) -> None:
+        if not self._callbacks:
+            return
+        event = Event(name, kind, _timer.now(), duration, attempt, identity,
+                      data)
+        for callback in self._callbacks:
+            callback(event)
+
+    @contextlib.asynccontextmanager
+    async def step(self, kind: str, identity: types.Identity | None
+                   ) -> typing.AsyncIterator[None]:
+        started = _timer.now()
+        self.emit(DIALOG_START, kind, identity=identity)
+        try:
+            yield
+        finally:
+            self.emit(DIALOG_END, kind, _timer.now() - started,
+                      identity=identity)
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0, 120.0, 300.0)
+ATTEMPT_BUCKETS = (1, 2, 3, 5, 10, 25)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: typing.Sequence[float]) -> None:
+        self.buckets = buckets
+        # the last count is for observations above every bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """The upper bound of the bucket the `q` quantile falls in.
+
+        """
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+def _escape(value: typing.Any) -> str:
+    # label values may hold backslashes, quotes and newlines (e.g. the
+    # kind of a custom formatter), which the exposition format escapes
+    return (str(value).replace("\\", "\\\\").replace('"', '\\"')
+            .replace("\n", "\\n"))
+
+
+def _labels(**labels: typing.Any) -> str:
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+
+class MetricsAggregator:
+    """Aggregates dialog events into counters and histograms in process.
+
+    Events are counted by name and kind, durations go into histograms
+    per name and kind, and the number of responses it took to pass each
+    check goes into a histogram per kind. `prometheus` renders everything
+    in the Prometheus text exposition format.
+    """
+    def __init__(self, instrumentation: Instrumentation,
+                 buckets: typing.Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counters: collections.Counter[tuple[str, str]] = (
+                collections.Counter())
+        self.durations: dict[tuple[str, str], Histogram] = {}
+        self.attempts: dict[str, Histogram] = {}
+        instrumentation.subscribe(self.record)
+
+    def record(self, event: Event) -> None:
+        key = (event.name, event.kind)
+        self.counters[key] += 1
+        if event.duration is not None:
+            histogram = self.durations.get(key)
+            if histogram is None:
+                histogram = self.durations[key] = Histogram(self.buckets)
+            histogram.observe(event.duration)
+        if event.name == CHECK_PASSED and event.attempt is not None:
+            histogram = self.attempts.get(event.kind)
+            if histogram is None:
+                histogram = self.attempts[event.kind] = Histogram(
+                        ATTEMPT_BUCKETS)
+            histogram.observe(event.attempt)
+
+    @staticmethod
+    def _histogram_lines(name: str, histogram: Histogram,
+                         **labels: typing.Any) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{{{_labels(**labels, le=bound)}}} "
+                         f"{cumulative}")
+        lines.append(f"{name}_bucket{{{_labels(**labels, le='+Inf')}}} "
+                     f"{histogram.count}")
+        lines.append(f"{name}_sum{{{_labels(**labels)}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{_labels(**labels)}}} "
+                     f"{histogram.count}")
+        return lines
+
+    def prometheus(self) -> str:
+        lines = ["# HELP dpydialog_events_total Dialog events by event and "
+                 "dialog kind.",
+                 "# TYPE dpydialog_events_total counter"]
+        for (name, kind), count in sorted(self.counters.items()):
+            lines.append(f"dpydialog_events_total"
+                         f"{{{_labels(event=name, kind=kind)}}} {count}")
+        lines += ["# HELP dpydialog_event_duration_seconds Durations "
+                  "carried by dialog events.",
+                  "# TYPE dpydialog_event_duration_seconds histogram"]
+        for (name, kind), histogram in sorted(self.durations.items()):
+            lines += self._histogram_lines(
+                    "dpydialog_event_duration_seconds", histogram,
+                    event=name, kind=kind)
+        lines += ["# HELP dpydialog_check_attempts Responses needed to pass "
+                  "a check.",
+                  "# TYPE dpydialog_check_attempts histogram"]
+        for kind, histogram in sorted(self.attempts.items()):
+            lines += self._histogram_lines("dpydialog_check_attempts",
+                                           histogram, kind=kind)
+        return "\n".join(lines) + "\n"
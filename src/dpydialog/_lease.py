@@ -0,0 +1,286 @@
+from ._state import DialogStateStore
+from . import exceptions
+import asyncio
+import sqlite3
+import threading
+import socket
+import typing
+import time
+import os
+
+
+class LeaseKey(typing.NamedTuple):
+    """The guild and user a dialog lease is held for.
+
+    Direct messages use a guild_id of 0.
+    """
+    guild_id: int
+    user_id: int
+
+    @classmethod
+    def from_cfg(cls, cfg: typing.Any) -> "LeaseKey":
+        if cfg.identity is None:
+            raise ValueError("leases require a Config with an identity")
+        # interactions and partial channels only know the guild's id
+        guild_id = getattr(cfg.utx, "guild_id", None)
+        if guild_id is None:
+            guild = getattr(cfg.utx, "guild", None)
+            guild_id = guild.id if guild is not None else 0
+        return cls(guild_id, cfg.identity.user_id)
+
+
+class LeaseBackend:
+    """Stores which process owns the dialog of each (guild, user) pair.
+
+    Methods are blocking and are called off the event loop. Expiry times
+    are unix timestamps, as they are compared across processes.
+    """
+    def acquire(self, key: LeaseKey, owner: str, ttl: float) -> str:
+        """Take the lease for `key` if it is free, expired or already ours.
+
+        Returns the owner of the lease after the attempt.
+        """
+        raise NotImplementedError()
+
+    def renew(self, keys: list[LeaseKey], owner: str,
+              ttl: float) -> set[LeaseKey]:
+        """Extend the leases `owner` still holds; return their keys.
+
+        """
+        raise NotImplementedError()
+
+    def release(self, keys: list[LeaseKey], owner: str) -> None:
+        raise NotImplementedError()
+
+    def transfer(self, key: LeaseKey, owner: str, to_owner: str,
+                 ttl: float) -> bool:
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """A `LeaseBackend` backed by an SQLite database shared by every process.
+
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # transactions are managed explicitly, so writers take the
+        # database lock up front with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=10,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS dialog_leases ("
+                    "guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, "
+                    "owner TEXT NOT NULL, expires REAL NOT NULL, "
+                    "PRIMARY KEY (guild_id, user_id))")
+
+    def _transaction(self, fn: typing.Callable[[sqlite3.Connection],
+                                               typing.Any]) -> typing.Any:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def acquire(self, key: LeaseKey, owner: str, ttl: float) -> str:
+        now = time.time()
+
+        def acquire(conn: sqlite3.Connection) -> str:
+            conn.execute(
+                    "INSERT INTO dialog_leases VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (guild_id, user_id) DO UPDATE "
+                    "SET owner = excluded.owner, expires = excluded.expires "
+                    "WHERE dialog_leases.owner = excluded.owner "
+                    "OR dialog_leases.expires < ?",
+                    (*key, owner, now + ttl, now))
+            return conn.execute(
+                    "SELECT owner FROM dialog_leases "
+                    "WHERE guild_id = ? AND user_id = ?", key).fetchone()[0]
+
+        return self._transaction(acquire)
+
+    def renew(self, keys: list[LeaseKey], owner: str,
+              ttl: float) -> set[LeaseKey]:
+        now = time.time()
+
+        def renew(conn: sqlite3.Connection) -> set[LeaseKey]:
+            conn.executemany(
+                    "UPDATE dialog_leases SET expires = ? "
+                    "WHERE guild_id = ? AND user_id = ? AND owner = ? "
+                    "AND expires >= ?",
+                    [(now + ttl, *key, owner, now) for key in keys])
+            held = conn.execute(
+                    "SELECT guild_id, user_id FROM dialog_leases "
+                    "WHERE owner = ? AND expires >= ?", (owner, now))
+            return set(keys).intersection(LeaseKey(*row) for row in held)
+
+        return self._transaction(renew)
+
+    def release(self, keys: list[LeaseKey], owner: str) -> None:
+        self._transaction(lambda conn: conn.executemany(
+                "DELETE FROM dialog_leases "
+                "WHERE guild_id = ? AND user_id = ? AND owner = ?",
+                [(*key, owner) for key in keys]))
+
+    def transfer(self, key: LeaseKey, owner: str, to_owner: str,
+                 ttl: float) -> bool:
+        return self._transaction(lambda conn: conn.execute(
+                "UPDATE dialog_leases SET owner = ?, expires = ? "
+                "WHERE guild_id = ? AND user_id = ? AND owner = ?",
+                (to_owner, time.time() + ttl, *key, owner)).rowcount == 1)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class Lease:
+    """Ownership of the dialog of a (guild, user) pair by this process.
+
+    `lost` is resolved once the lease expires or is handed off.
+    """
+    __slots__ = ("coordinator", "key", "lost")
+
+    def __init__(self, coordinator: "LeaseCoordinator",
+                 key: LeaseKey) -> None:
+        self.coordinator = coordinator
+        self.key = key
+        self.lost: asyncio.Future[str | None] = (
+                asyncio.get_running_loop().create_future())
+
+    async def guard(self, coro: typing.Awaitable) -> typing.Any:
+        """Await `coro`, raising `LeaseLost` if the lease is lost meanwhile.
+
+        """
+        if self.lost.done():
+            coro.close()
+            raise exceptions.LeaseLost(*self.key, self.lost.result())
+        task = asyncio.ensure_future(coro)
+        try:
+            await asyncio.wait((task, self.lost),
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not task.done():
+                task.cancel()
+        if task.done() and not task.cancelled():
+            return task.result()
+        raise exceptions.LeaseLost(*self.key, self.lost.result())
+
+    async def release(self) -> None:
+        await self.coordinator.release(self)
+
+
+class LeaseCoordinator:
+    """Gives each (guild, user) pair at most one open dialog across processes.
+
+    Set as the `leases` flag of a `Config`, dialogs take the lease of
+    their user for each step (and `Form` runs for the whole run), before
+    anything is sent, and release it once the step ends. Every lease held by this process is renewed in one backend
+    call every `ttl / 3` seconds, so leases of a process that died expire
+    after at most `ttl` seconds.
+
+    A dialog can be handed to another process with `handoff`: its lease
+    is transferred, the waiting dialog raises `LeaseLost`, and the new
+    owner continues it from the shared state store with `Form.resume`.
+    """
+    def __init__(self, backend: LeaseBackend, owner: str = None,
+                 ttl: float = 30.0) -> None:
+        self.backend = backend
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.ttl = ttl
+        self._leases: dict[LeaseKey, Lease] = {}
+        self._renewing: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._leases)
+
+    async def acquire(self, key: LeaseKey) -> Lease:
+        # the lease is registered before the backend is asked, so two
+        # dialogs of this process can't both take it
+        if key in self._leases:
+            raise exceptions.LeaseHeld(*key, self.owner)
+        lease = self._leases[key] = Lease(self, key)
+        try:
+            owner = await asyncio.to_thread(self.backend.acquire, key,
+                                            self.owner, self.ttl)
+        except BaseException:
+            del self._leases[key]
+            raise
+        if owner != self.owner:
+            del self._leases[key]
+            raise exceptions.LeaseHeld(*key, owner)
+        if self._renewing is None or self._renewing.done():
+            self._renewing = asyncio.ensure_future(self._renew())
+        return lease
+
+    async def release(self, lease: Lease) -> None:
+        if self._leases.get(lease.key) is not lease:
+            return
+        del self._leases[lease.key]
+        if not lease.lost.done():
+            lease.lost.set_result(None)
+            await asyncio.to_thread(self.backend.release, [lease.key],
+                                    self.owner)
+
+    async def handoff(self, key: LeaseKey, to_owner: str,
+                      store: DialogStateStore = None) -> bool:
+        """Transfer the lease for `key` to the process named `to_owner`.
+
+        The store is flushed first, so the new owner resumes the dialog
+        from its latest checkpoint.
+        """
+        lease = self._leases.get(key)
+        if lease is None:
+            return False
+        if store is not None:
+            await store.flush()
+        if not await asyncio.to_thread(self.backend.transfer, key,
+                                       self.owner, to_owner, self.ttl):
+            return False
+        self._lose(lease, to_owner)
+        return True
+
+    def _lose(self, lease: Lease, owner: str | None) -> None:
+        self._leases.pop(lease.key, None)
+        if not lease.lost.done():
+            lease.lost.set_result(owner)
+
+    async def _renew(self) -> None:
+        while self._leases:
+            await asyncio.sleep(self.ttl / 3)
+            leases = list(self._leases.values())
+            try:
+                held = await asyncio.to_thread(self.backend.renew,
+                                               [lease.key for lease in leases],
+                                               self.owner, self.ttl)
+            except Exception:
+                # leases that can't be renewed can't be relied on either,
+                # so their dialogs are stopped rather than left running
+                # after their leases expire
+                held = set()
+            for lease in leases:
+                if lease.key not in held:
+                    self._lose(lease, None)
+
+    async def close(self) -> None:
+        if self._renewing is not None:
+            self._renewing.cancel()
+        leases = list(self._leases.values())
+        self._leases.clear()
+        for lease in leases:
+            if not lease.lost.done():
+                lease.lost.set_result(None)
+        if leases:
+            await asyncio.to_thread(self.backend.release,
+                                    [lease.key for lease in leases],
+                                    self.owner)
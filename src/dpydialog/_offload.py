@@ -0,0 +1,47 @@
+from . import exceptions
+import concurrent.futures
+import asyncio
+import typing
+import time
+
+
+class Offloaded:
+    """A checkfn that runs in an executor instead of on the event loop.
+
+    Created with `offload`.
+    """
+    def __init__(self, fn: typing.Callable[[typing.Any], typing.Any],
+                 executor: concurrent.futures.Executor | None,
+                 timeout: float | None,
+                 extract: typing.Callable[[typing.Any], typing.Any] | None
+                 ) -> None:
+        self.fn = fn
+        self.executor = executor
+        self.timeout = timeout
+        self.extract = extract
+
+    async def __call__(self, message: typing.Any) -> typing.Any:
+        arg = message if self.extract is None else self.extract(message)
+        future = asyncio.get_running_loop().run_in_executor(self.executor,
+                                                            self.fn, arg)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise exceptions.CheckTimedOut(message, time.time()) from None
+
+
+def offload(fn: typing.Callable[[typing.Any], typing.Any],
+            executor: concurrent.futures.Executor = None,
+            timeout: float = None,
+            extract: typing.Callable[[typing.Any], typing.Any] = None
+            ) -> Offloaded:
+    """Mark `fn` to be run in `executor` (the loop's default if None).
+
+    `fn` receives `extract(message)` if `extract` is given, or the
+    message itself. With a `ProcessPoolExecutor`, `fn` and its argument
+    and result must be picklable, so `extract` should pull what is needed
+    out of the message (e.g. its content). A check still running after
+    `timeout` seconds raises `exceptions.CheckTimedOut`; threads can't be
+    interrupted, so the check itself runs on in its executor.
+    """
+    return Offloaded(fn, executor, timeout, extract)
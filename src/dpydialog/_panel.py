@@ -0,0 +1,128 @@
+from . import _config
+import discord
+import asyncio
+import typing
+
+
+class Panel:
+    """A single message a dialog edits for each of its steps.
+
+    The first step is sent as usual (as the interaction's original
+    response when there is one); every later step, and every reply to
+    invalid input, edits that message instead of sending a new one.
+    Replies are shown below the step they belong to. Edits are debounced
+    by `debounce` seconds, so a burst of re-renders costs one API call;
+    a debounced edit that fails raises its error from the next `show`,
+    `reply` or `flush` (which `Dialog.close` calls).
+    """
+    def __init__(self, cfg: _config.Config, debounce: float = 0.25) -> None:
+        self.cfg = cfg
+        self.debounce = debounce
+        self.message: typing.Any = None
+        self.edits = 0
+        self._itx: discord.Interaction | None = None
+        self._step: discord.Embed | None = None
+        self._pending: dict[str, typing.Any] | None = None
+        self._handle: asyncio.TimerHandle | None = None
+        self._flushing: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def sent(self) -> bool:
+        return self.message is not None or self._itx is not None
+
+    async def show(self, embed: discord.Embed,
+                   view: discord.ui.View | None = None) -> typing.Any:
+        """Show a new step, replacing the previous step and its reply.
+
+        Returns the panel message, if it is known.
+        """
+        self._raise_failed()
+        self._step = embed
+        if self.sent:
+            self._render(embeds=[embed], view=view)
+            return self.message
+
+        itx = self.cfg.itx(ignore=True)
+        kwargs = {"embed": embed} if view is None else {"embed": embed,
+                                                        "view": view}
+        async with self._lock:
+            message = await self.cfg.best_sender(**kwargs)
+        # responses to an interaction don't return a message, so its
+        # original response is edited instead
+        if itx is not None and not hasattr(message, "edit"):
+            self._itx = itx
+        else:
+            self.message = message
+        return self.message
+
+    async def reply(self, embed: discord.Embed) -> typing.Any:
+        """Show `embed` below the current step.
+
+        """
+        if not self.sent:
+            return await self.show(embed)
+        self._raise_failed()
+        # the view is left out so the step's components are kept
+        self._render(embeds=[self._step, embed])
+        return self.message
+
+    def strip(self) -> None:
+        """Remove the components of the current step.
+
+        """
+        if not self.sent:
+            return
+        pending = self._pending or {"embeds": [self._step]}
+        self._render(**{**pending, "view": None})
+
+    def _render(self, **kwargs) -> None:
+        self._pending = kwargs
+        if self._handle is None:
+            self._handle = asyncio.get_running_loop().call_later(
+                    self.debounce, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._handle = None
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.ensure_future(self._flush())
+
+    def _raise_failed(self) -> None:
+        # debounced edits run in their own task, so nothing awaits them;
+        # their errors are raised here instead of being lost
+        task = self._flushing
+        if task is None or not task.done():
+            return
+        self._flushing = None
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+
+    async def _edit(self, **kwargs) -> None:
+        if self._itx is not None:
+            edit = self._itx.edit_original_response
+        else:
+            edit = self.message.edit
+        if self.cfg.send_queue is not None:
+            await self.cfg.send_queue.send(self.cfg.channel_id, edit,
+                                           **kwargs)
+        else:
+            await edit(**kwargs)
+        self.edits += 1
+
+    async def flush(self) -> None:
+        """Apply the latest pending render now.
+
+        """
+        self._raise_failed()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        await self._flush()
+        # a debounced edit may have failed while this one waited for it
+        self._raise_failed()
+
+    async def _flush(self) -> None:
+        async with self._lock:
+            while self._pending is not None:
+                kwargs, self._pending = self._pending, None
+                await self._edit(**kwargs)
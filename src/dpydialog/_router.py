@@ -0,0 +1,134 @@
+from . import exceptions
+from . import _timer
+from . import types
+from discord.ext import commands
+import discord
+import asyncio
+import typing
+import weakref
+import time
+
+
+class Subscription:
+    """A dialog's registration with a `DialogRouter`.
+
+    """
+    # component subscriptions (see `ComponentRouter`) are keyed by a
+    # custom_id token instead of an identity, and receive interactions;
+    # channel subscriptions are keyed by a channel id
+    def __init__(self, router: typing.Any,
+                 identity: types.Identity | str | int | None,
+                 checkfn: typing.Callable[[discord.Message], bool] | None
+                 ) -> None:
+        self.router = router
+        self.identity = identity
+        self.checkfn = checkfn
+        self.queue: asyncio.Queue[discord.Message | _timer.Timer] = (
+                asyncio.Queue())
+
+    def deliver(self, message: discord.Message) -> None:
+        if self.checkfn is not None and not self.checkfn(message):
+            return
+        self.queue.put_nowait(message)
+
+    def expire(self, timer: _timer.Timer) -> None:
+        self.queue.put_nowait(timer)
+
+    async def get(self, timer: _timer.Timer | None = None) -> discord.Message:
+        while True:
+            item = await self.queue.get()
+            if not isinstance(item, _timer.Timer):
+                return item
+            # a subscription may outlive a single wait, so deadlines
+            # that expired during an earlier wait are ignored
+            if item is timer:
+                raise exceptions.TimedOut(None, time.time())
+
+    def close(self) -> None:
+        self.router.unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class DialogRouter:
+    """Routes incoming messages to the dialogs waiting on them.
+
+    A single `on_message` listener is added per bot; dialogs with a
+    structured identity are looked up by (channel_id, user_id), so the
+    cost per message does not grow with the number of open dialogs.
+    Broadcasts, which wait on everyone in a channel, are looked up by
+    channel_id. Dialogs that only have an `identity_checkfn` are checked
+    one by one, the same as `commands.Bot.wait_for` would.
+    """
+    def __init__(self, bot: commands.Bot) -> None:
+        # the bot holds the router (through its listener, and see `get`),
+        # so the router only holds the bot weakly
+        self._bot = weakref.ref(bot)
+        self._keyed: dict[types.Identity, list[Subscription]] = {}
+        self._unkeyed: list[Subscription] = []
+        self._channels: dict[int, list[Subscription]] = {}
+        bot.add_listener(self._on_message, "on_message")
+
+    @property
+    def bot(self) -> commands.Bot | None:
+        return self._bot()
+
+    @classmethod
+    def get(cls, bot: commands.Bot) -> "DialogRouter":
+        # kept on the bot itself, so it is collected along with the bot
+        router = getattr(bot, "_dpydialog_router", None)
+        if router is None:
+            router = cls(bot)
+            setattr(bot, "_dpydialog_router", router)
+        return router
+
+    def subscribe(self, identity: types.Identity | None = None,
+                  checkfn: typing.Callable[[discord.Message], bool] = None
+                  ) -> Subscription:
+        subscription = Subscription(self, identity, checkfn)
+        if identity is None:
+            self._unkeyed.append(subscription)
+        else:
+            self._keyed.setdefault(identity, []).append(subscription)
+        return subscription
+
+    def subscribe_channel(self, channel_id: int,
+                          checkfn: typing.Callable[[discord.Message],
+                                                   bool] = None
+                          ) -> Subscription:
+        subscription = Subscription(self, channel_id, checkfn)
+        self._channels.setdefault(channel_id, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription.identity is None:
+            if subscription in self._unkeyed:
+                self._unkeyed.remove(subscription)
+            return
+        table = (self._channels if isinstance(subscription.identity, int)
+                 else self._keyed)
+        subscriptions = table.get(subscription.identity)
+        if subscriptions and subscription in subscriptions:
+            subscriptions.remove(subscription)
+            if not subscriptions:
+                del table[subscription.identity]
+
+    def dispatch(self, message: discord.Message) -> None:
+        subscriptions = self._keyed.get(
+                types.Identity(message.channel.id, message.author.id))
+        if subscriptions:
+            for subscription in tuple(subscriptions):
+                subscription.deliver(message)
+        subscriptions = self._channels.get(message.channel.id)
+        if subscriptions:
+            for subscription in tuple(subscriptions):
+                subscription.deliver(message)
+        for subscription in tuple(self._unkeyed):
+            subscription.deliver(message)
+
+    async def _on_message(self, message: discord.Message) -> None:
+        self.dispatch(message)
@@ -1,15 +1,92 @@
+from ._formatter import Formatter
 from . import exceptions
 from . import _config
+from . import _router
+from . import _timer
+from . import _instrument
 from . import types
+import contextlib
 import discord
 import asyncio
+import inspect
 import typing
 import time
 
 
+async def resolve(checkval: typing.Any, message: typing.Any,
+                  timeout: float | None) -> typing.Any:
+    """Await the result of a coroutine (or offloaded) checkfn.
+
+    """
+    if not inspect.isawaitable(checkval):
+        return checkval
+    try:
+        return await asyncio.wait_for(checkval, timeout)
+    except asyncio.TimeoutError:
+        raise exceptions.CheckTimedOut(message, time.time()) from None
+
+
+class TokenBucket:
+    """Allows `rate` messages per `per` seconds, with bursts of up to `rate`.
+
+    """
+    __slots__ = ("rate", "per", "tokens", "updated", "notified")
+
+    def __init__(self, rate: int, per: float) -> None:
+        if rate < 1 or per <= 0:
+            raise ValueError("input_rate must allow at least one message "
+                             "per positive number of seconds")
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = _timer.now()
+        self.notified = -per
+
+    def take(self) -> bool:
+        now = _timer.now()
+        self.tokens = min(self.rate, self.tokens
+                          + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def should_notify(self) -> bool:
+        """Whether to tell the user to slow down; True once per window.
+
+        """
+        now = _timer.now()
+        if now - self.notified < self.per:
+            return False
+        self.notified = now
+        return True
+
+
 class Runner(typing.Generic[types.VT]):
-    def __init__(self, cfg: _config.Config) -> None:
+    def __init__(self, cfg: _config.Config,
+                 deadline: float | None | type[types.MISSING] = types.MISSING,
+                 subscription: _router.Subscription | None = None,
+                 reply: typing.Callable[..., typing.Awaitable] = None,
+                 kind: str = "custom",
+                 show: typing.Callable[[discord.Embed],
+                                       typing.Awaitable] = None) -> None:
         self.cfg = cfg
+        self.kind = kind
+        self.subscription = subscription
+        # replies to invalid input; dialogs rendered in a panel show
+        # them in the panel instead
+        self.reply = reply or cfg.error_sender
+        # re-renders of the prompt (`types.Rerender`), e.g. other pages
+        self.show = show or (lambda embed: cfg.best_sender(embed=embed))
+        # the deadline is usually computed by the caller before the
+        # dialog embed is sent, so the displayed timestamp and the actual
+        # timeout come from the same clock reading
+        if deadline is types.MISSING:
+            deadline = _timer.deadline(cfg.timeout)
+        self.deadline = deadline
+        # shared by every response to the step, including streamed ones
+        self.bucket = cfg.input_rate and TokenBucket(*cfg.input_rate)
     
     async def run(self, checkfn: typing.Callable[[discord.Message],
                                                  typing.Union[
@@ -17,42 +94,143 @@ class Runner(typing.Generic[types.VT]):
                                                      discord.Embed
                                                  ]]
                   ) -> tuple[discord.Message, types.VT]:
-        timestamp = self.cfg.timeout and time.time() + self.cfg.timeout
+        if self.subscription is not None:
+            return await self._run_with(checkfn, self.subscription)
+        router = _router.DialogRouter.get(self.cfg.bot)
+        with router.subscribe(self.cfg.identity,
+                              self.cfg.identity_checkfn) as subscription:
+            return await self._run_with(checkfn, subscription)
+
+    async def stream(self, checkfn: typing.Callable[[discord.Message],
+                                                    typing.Union[
+                                                        types.VT,
+                                                        discord.Embed
+                                                    ]]
+                     ) -> typing.AsyncIterator[tuple[discord.Message,
+                                                     types.VT]]:
+        """Yield every response that passes `checkfn`.
+
+        The stream ends when the checkfn returns `types.MISSING` (e.g. for
+        a finished keyword) or the step is skipped, and raises like `run`
+        when it is cancelled or times out.
+        """
+        router = _router.DialogRouter.get(self.cfg.bot)
+        with contextlib.ExitStack() as stack:
+            subscription = self.subscription or stack.enter_context(
+                    router.subscribe(self.cfg.identity,
+                                     self.cfg.identity_checkfn))
+            timer = self.deadline and _timer.TimerWheel.get().schedule(
+                    self.deadline, lambda: subscription.expire(timer))
+            try:
+                while True:
+                    message, value = await self._run(checkfn, subscription,
+                                                     timer)
+                    if value is None or value is types.MISSING:
+                        return
+                    yield message, value
+            except exceptions.TimedOut:
+                if self.cfg.instrumentation is not None:
+                    self.cfg.instrumentation.emit(_instrument.TIMED_OUT,
+                                                  self.kind,
+                                                  identity=self.cfg.identity)
+                raise
+            finally:
+                if timer:
+                    timer.cancel()
+
+    async def _run_with(self, checkfn: typing.Callable[[discord.Message],
+                                                       typing.Union[
+                                                           types.VT,
+                                                           discord.Embed
+                                                       ]],
+                        subscription: _router.Subscription
+                        ) -> tuple[discord.Message, types.VT]:
+        # the timer wheel expires the deadline through the subscription,
+        # which then raises an `exceptions.TimedOut`
+        timer = self.deadline and _timer.TimerWheel.get().schedule(
+                self.deadline, lambda: subscription.expire(timer))
         try:
-            while True:
-                # get the new timeout
-                if timestamp:
-                    timeout = timestamp - time.time()
-                    if timeout < 2:
-                        raise exceptions.TimedOut(time.time())
-                else:
-                    timeout = None
-
-                # wait for message and get content
-                message: discord.Message = await self.cfg.bot.wait_for(
-                        "message", check=self.cfg.identity_checkfn,
-                        timeout=timeout)
-                content = message.content and message.content.lower().strip()
-                
-                # handle cancel or skip
-                if self.cfg.cancellable and content == self.cfg.cancel_keyword:
-                    raise exceptions.Cancelled(message, time.time())
-                if self.cfg.skippable and content == self.cfg.skip_keyword:
-                    return message, None
-
-                # ensure value passes check
-                checkval = checkfn(message)
-                if isinstance(checkval, discord.Embed):
-                    await self.cfg.best_sender(embed=checkval)
-                    continue
-                if checkval == None:
-                    continue
-                
-                # return message and value
-                return message, checkval
-        except asyncio.TimeoutError as exc:
-            # `commands.Bot.wait_for` raises an asyncio.TimeoutError if
-            # the time passed is greater than the provided timeout. Here
-            # we simply catch that error and re-raise it as an
-            # `exceptions.TimedOut` error for consistency
-            raise exceptions.TimedOut(None, time.time()) from exc
+            return await self._run(checkfn, subscription, timer)
+        except exceptions.TimedOut:
+            if self.cfg.instrumentation is not None:
+                self.cfg.instrumentation.emit(_instrument.TIMED_OUT,
+                                              self.kind,
+                                              identity=self.cfg.identity)
+            raise
+        finally:
+            if timer:
+                timer.cancel()
+
+    async def _run(self, checkfn: typing.Callable[[discord.Message],
+                                                  typing.Union[
+                                                      types.VT,
+                                                      discord.Embed
+                                                  ]],
+                   subscription: _router.Subscription,
+                   timer: _timer.Timer | None
+                   ) -> tuple[discord.Message, types.VT]:
+        bucket = self.bucket
+        inst = self.cfg.instrumentation
+        started = inst and _timer.now()
+        attempt = 0
+        while True:
+            # wait for message and get content
+            message = await subscription.get(timer)
+            content = message.content and message.content.lower().strip()
+            attempt += 1
+            if inst is not None:
+                inst.emit(_instrument.MESSAGE_RECEIVED, self.kind,
+                          _timer.now() - started, attempt, self.cfg.identity,
+                          message)
+            
+            # handle cancel or skip
+            if self.cfg.cancellable and content == self.cfg.cancel_keyword:
+                if inst is not None:
+                    inst.emit(_instrument.CANCELLED, self.kind,
+                              attempt=attempt, identity=self.cfg.identity)
+                raise exceptions.Cancelled(message, time.time())
+            if self.cfg.skippable and content == self.cfg.skip_keyword:
+                if inst is not None:
+                    inst.emit(_instrument.SKIPPED, self.kind,
+                              attempt=attempt, identity=self.cfg.identity)
+                return message, None
+
+            # messages over the input rate are dropped without being
+            # checked, and the user is told so at most once per window;
+            # messages with attachments are always checked, so no file is
+            # silently lost
+            if bucket and not bucket.take() and not message.attachments:
+                if bucket.should_notify():
+                    await self.reply(embed=Formatter().error_embed(
+                            self.cfg.error_embed_base,
+                            description="*You are sending messages too "
+                                        "quickly; some were ignored.*"))
+                continue
+
+            # ensure value passes check
+            checked = inst and _timer.now()
+            try:
+                checkval = await resolve(checkfn(message), message,
+                                         self.cfg.check_timeout)
+            except exceptions.CheckTimedOut:
+                checkval = Formatter().error_embed(
+                        self.cfg.error_embed_base,
+                        description="*Your response could not be checked "
+                                    "in time, please try again.*")
+            if isinstance(checkval, types.Rerender):
+                await self.show(checkval.embed)
+                continue
+            if inst is not None and checkval is not None:
+                inst.emit(_instrument.CHECK_FAILED
+                          if isinstance(checkval, discord.Embed)
+                          else _instrument.CHECK_PASSED, self.kind,
+                          _timer.now() - checked, attempt, self.cfg.identity,
+                          checkval)
+            if isinstance(checkval, discord.Embed):
+                await self.reply(embed=checkval)
+                continue
+            if checkval == None:
+                continue
+            
+            # return message and value
+            return message, checkval
@@ -0,0 +1,127 @@
+import collections
+import bisect
+import typing
+
+
+def _fold(value: str) -> str:
+    return " ".join(value.split()).casefold()
+
+
+def _trigrams(value: str) -> set[str]:
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ChoiceIndex:
+    """A search index over a set of choices.
+
+    Prefix matches are found by bisecting a sorted array of every word
+    suffix of every (case-folded) choice, which behaves like a compact
+    trie; fuzzy matches fall back to a trigram index. Dialogs that reuse
+    the same choices should build an index once and pass it to
+    `Dialog.choice(search=...)`; `search=True` only reuses an index for
+    the very same sequence object (see `get`).
+    """
+    _cache: collections.OrderedDict[
+        int, tuple[typing.Sequence[str], "ChoiceIndex"]
+    ] = collections.OrderedDict()
+    cache_size = 32
+
+    def __init__(self, choices: typing.Iterable[str],
+                 fuzzy_threshold: float = 0.4) -> None:
+        self.choices = tuple(choices)
+        self.fuzzy_threshold = fuzzy_threshold
+        self._folded = [_fold(c) for c in self.choices]
+
+        # every word of a choice starts a prefix entry, so "sword" finds
+        # "Iron Sword" as well as "Sword of Truth"
+        prefixes: list[tuple[str, int]] = []
+        for i, folded in enumerate(self._folded):
+            start = 0
+            for word in folded.split(" "):
+                prefixes.append((folded[start:], i))
+                start += len(word) + 1
+        prefixes.sort()
+        self._prefix_keys = [p for p, _ in prefixes]
+        self._prefix_indexes = [i for _, i in prefixes]
+
+        self._trigrams: dict[str, list[int]] = {}
+        for i, folded in enumerate(self._folded):
+            for trigram in _trigrams(folded):
+                self._trigrams.setdefault(trigram, []).append(i)
+
+    @classmethod
+    def get(cls, choices: typing.Iterable[str]) -> "ChoiceIndex":
+        """Return a cached index for `choices`, building it if needed.
+
+        Indexes are cached by the identity of the `choices` sequence, so
+        nothing is copied or hashed per call; a sequence mutated in place
+        needs `invalidate`. Other iterables are indexed anew every time.
+        """
+        if not isinstance(choices, typing.Sequence):
+            return cls(choices)
+        key = id(choices)
+        entry = cls._cache.get(key)
+        # the id of a collected sequence may be reused by a new one, so we
+        # also make sure the cached sequence is the same object
+        if entry is not None and entry[0] is choices:
+            cls._cache.move_to_end(key)
+            return entry[1]
+        index = cls(choices)
+        cls._cache[key] = (choices, index)
+        cls._cache.move_to_end(key)
+        while len(cls._cache) > cls.cache_size:
+            cls._cache.popitem(last=False)
+        return index
+
+    @classmethod
+    def invalidate(cls, choices: typing.Sequence[str] = None) -> None:
+        """Drop the cached index of `choices` (or every cached index).
+
+        """
+        if choices is None:
+            cls._cache.clear()
+            return
+        entry = cls._cache.get(id(choices))
+        if entry is not None and entry[0] is choices:
+            del cls._cache[id(choices)]
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def prefix(self, query: str, limit: int) -> list[int]:
+        query = _fold(query)
+        start = bisect.bisect_left(self._prefix_keys, query)
+        matches: dict[int, None] = {}
+        for i in range(start, len(self._prefix_keys)):
+            if not self._prefix_keys[i].startswith(query):
+                break
+            matches[self._prefix_indexes[i]] = None
+            if len(matches) > limit:
+                break
+        return list(matches)
+
+    def fuzzy(self, query: str, limit: int) -> list[int]:
+        trigrams = _trigrams(_fold(query))
+        counts: collections.Counter[int] = collections.Counter()
+        for trigram in trigrams:
+            counts.update(self._trigrams.get(trigram, ()))
+        matches = [i for i, n in counts.most_common()
+                   if n / len(trigrams) >= self.fuzzy_threshold]
+        return matches[:limit + 1]
+
+    def search(self, query: str, limit: int = 25) -> list[int]:
+        """Return the indexes of the choices matching `query`.
+
+        An exact (case-folded) match is returned on its own. At most
+        `limit` + 1 indexes are returned, so callers can tell when a
+        query matched more choices than they would show.
+        """
+        folded = _fold(query)
+        if not folded:
+            return []
+        matches = self.prefix(folded, limit)
+        exact = [i for i in matches if self._folded[i] == folded]
+        if len(exact) == 1:
+            return exact
+        return matches or self.fuzzy(folded, limit)
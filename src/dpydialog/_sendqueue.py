@@ -0,0 +1,191 @@
+from . import _timer
+import collections
+import discord
+import asyncio
+import typing
+
+
+class SendQueueInfo(typing.NamedTuple):
+    sent: int
+    edited: int
+    coalesced: int
+    depth: int
+    peak_depth: int
+    rate_limit_wait: float
+
+
+class _Reply(typing.NamedTuple):
+    embed: discord.Embed | None
+    at: float
+    future: asyncio.Future
+
+
+class _Channel:
+    __slots__ = ("semaphore", "starts", "depth", "last_used", "replies",
+                 "last_target")
+
+    def __init__(self, concurrency: int, rate: int) -> None:
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # start times of the latest `rate` sends, for pacing
+        self.starts: collections.deque[float] = collections.deque(
+                maxlen=rate)
+        self.depth = 0
+        self.last_used = _timer.now()
+        # the latest reply (see `SendQueue.send`) per target, and the
+        # target of the latest send if it was a reply
+        self.replies: dict[typing.Hashable, _Reply] = {}
+        self.last_target: typing.Hashable = None
+
+
+class SendQueue:
+    """Paces the messages dialogs send to each channel.
+
+    Set as the `send_queue` flag of a `Config`, every send made through
+    `Config.best_sender` waits in a per-channel queue. At most
+    `concurrency` sends run at once per channel, and no more than `rate`
+    sends start per `per` seconds, so spammed channels are slowed down
+    here instead of running into 429s.
+
+    Replies to invalid input (sent through `Config.error_sender`) are
+    tracked per target, the dialog's identity. A reply with an embed
+    equal to that of the target's previous reply within
+    `coalesce_window` seconds is not sent again, so repeated identical
+    errors are only sent once.
+    With `edit_replies`, a new reply edits the target's previous one in
+    place, as long as nothing else was sent to the channel since. Other
+    sends to the channel forget every reply.
+    """
+    def __init__(self, concurrency: int = 1, rate: int = 5,
+                 per: float = 5.0, coalesce_window: float = 5.0,
+                 edit_replies: bool = False) -> None:
+        if concurrency < 1 or rate < 1:
+            raise ValueError("concurrency and rate must be greater than or "
+                             "equal to 1")
+        self.concurrency = concurrency
+        self.rate = rate
+        self.per = per
+        self.coalesce_window = coalesce_window
+        self.edit_replies = edit_replies
+        self.sent = 0
+        self.edited = 0
+        self.coalesced = 0
+        self.peak_depth = 0
+        self.rate_limit_wait = 0.0
+        self._depth = 0
+        self._channels: dict[int, _Channel] = {}
+
+    def info(self) -> SendQueueInfo:
+        return SendQueueInfo(self.sent, self.edited, self.coalesced,
+                             self._depth, self.peak_depth,
+                             self.rate_limit_wait)
+
+    def depth(self, channel_id: int = None) -> int:
+        """The number of sends waiting or running (in a channel).
+
+        """
+        if channel_id is None:
+            return self._depth
+        channel = self._channels.get(channel_id)
+        return channel.depth if channel is not None else 0
+
+    def sender(self, channel_id: int, send: typing.Callable[..., typing.Any],
+               reply: bool = False, target: typing.Hashable = None
+               ) -> typing.Callable[..., typing.Any]:
+        async def queued_send(**kwargs) -> typing.Any:
+            return await self.send(channel_id, send, reply, target, **kwargs)
+        return queued_send
+
+    def _channel(self, channel_id: int) -> _Channel:
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            self._prune()
+            channel = self._channels[channel_id] = _Channel(self.concurrency,
+                                                            self.rate)
+        channel.last_used = _timer.now()
+        return channel
+
+    def _prune(self) -> None:
+        # idle channels are forgotten once their pacing and coalescing
+        # state can no longer matter
+        if len(self._channels) < 1024:
+            return
+        cutoff = _timer.now() - max(self.per, self.coalesce_window)
+        for channel_id in [i for i, c in self._channels.items()
+                           if not c.depth and c.last_used < cutoff]:
+            del self._channels[channel_id]
+
+    async def send(self, channel_id: int, send: typing.Callable[..., typing.Any],
+                   reply: bool = False, target: typing.Hashable = None,
+                   **kwargs) -> typing.Any:
+        """Send through the channel's queue.
+
+        Replies are coalesced and edited per `target` (e.g. the user
+        they answer), so one user's replies never stand in for another's.
+        """
+        channel = self._channel(channel_id)
+        if not reply:
+            channel.replies.clear()
+            channel.last_target = None
+            return await self._submit(channel, send, kwargs)
+
+        embed = kwargs.get("embed")
+        now = _timer.now()
+        previous = channel.replies.get(target)
+        if (previous is not None and embed is not None
+            and (embed is previous.embed or embed == previous.embed)
+            and now - previous.at < self.coalesce_window):
+            self.coalesced += 1
+            return await asyncio.shield(previous.future)
+
+        call, edit = send, False
+        if (self.edit_replies and previous is not None
+            and channel.last_target == target and previous.future.done()
+            and not previous.future.cancelled()
+            and previous.future.exception() is None
+            and hasattr(previous.future.result(), "edit")):
+            message = previous.future.result()
+            edit = True
+
+            async def call(**kwargs) -> typing.Any:
+                await message.edit(**kwargs)
+                return message
+
+        if previous is None and len(channel.replies) >= 64:
+            # replies too old to be coalesced are forgotten, except the
+            # latest, which may still be edited
+            cutoff = now - self.coalesce_window
+            for key in [key for key, r in channel.replies.items()
+                        if r.at < cutoff and r.future.done()
+                        and key != channel.last_target]:
+                del channel.replies[key]
+        future = asyncio.ensure_future(self._submit(channel, call, kwargs,
+                                                    edit))
+        channel.replies[target] = _Reply(embed, now, future)
+        channel.last_target = target
+        return await asyncio.shield(future)
+
+    async def _submit(self, channel: _Channel,
+                      call: typing.Callable[..., typing.Any],
+                      kwargs: dict[str, typing.Any],
+                      edit: bool = False) -> typing.Any:
+        channel.depth += 1
+        self._depth += 1
+        self.peak_depth = max(self.peak_depth, self._depth)
+        try:
+            async with channel.semaphore:
+                if len(channel.starts) == self.rate:
+                    wait = channel.starts[0] + self.per - _timer.now()
+                    if wait > 0:
+                        self.rate_limit_wait += wait
+                        await asyncio.sleep(wait)
+                channel.starts.append(_timer.now())
+                result = await call(**kwargs)
+                if edit:
+                    self.edited += 1
+                else:
+                    self.sent += 1
+                return result
+        finally:
+            channel.depth -= 1
+            self._depth -= 1
+            channel.last_used = _timer.now()
@@ -0,0 +1,198 @@
+from ._attachments import AttachmentInspector
+import collections
+import discord
+import asyncio
+import tempfile
+import typing
+import mmap
+import io
+
+
+class SpoolBudget:
+    """Caps the number of attachment bytes spooled at once.
+
+    Waiters are served in FIFO order, so a large attachment isn't starved
+    by a stream of small ones.
+    """
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+        self._waiters: collections.deque[tuple[int, asyncio.Future]] = (
+                collections.deque())
+
+    async def acquire(self, size: int) -> None:
+        if size > self.limit:
+            raise ValueError(f"cannot spool {size} bytes with a budget of "
+                             f"{self.limit} bytes")
+        if not self._waiters and self.used + size <= self.limit:
+            self.used += size
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((size, fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.cancelled():
+                self._waiters.remove((size, fut))
+            else:
+                # the bytes were granted just before we were cancelled
+                self.release(size)
+            raise
+
+    def release(self, size: int) -> None:
+        self.used -= size
+        while self._waiters and (self.used + self._waiters[0][0]
+                                 <= self.limit):
+            size, fut = self._waiters.popleft()
+            if not fut.done():
+                self.used += size
+                fut.set_result(None)
+
+
+class SpooledAttachment:
+    """The contents of an attachment, held in a buffer or temporary file.
+
+    """
+    def __init__(self, attachment: discord.Attachment, fp: typing.BinaryIO,
+                 budget: SpoolBudget) -> None:
+        self.attachment = attachment
+        self.fp = fp
+        self._budget = budget
+        self._mmap: mmap.mmap | None = None
+        self.closed = False
+
+    def view(self) -> memoryview:
+        """Return a read-only view of the contents without copying them.
+
+        Views must be released before the attachment is closed.
+        """
+        if isinstance(self.fp, io.BytesIO):
+            return self.fp.getbuffer().toreadonly()
+        if self._mmap is None:
+            self.fp.seek(0, io.SEEK_END)
+            if not self.fp.tell():
+                return memoryview(b"")
+            self._mmap = mmap.mmap(self.fp.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def __del__(self) -> None:
+        # attachments dropped without being closed give their bytes back
+        # to the budget once collected
+        self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        # views that are still held keep their buffer alive until they
+        # are released; the bytes are given back to the budget regardless
+        for closeable in (self._mmap, self.fp):
+            try:
+                if closeable is not None:
+                    closeable.close()
+            except BufferError:
+                pass
+        self._budget.release(self.attachment.size)
+
+
+class FileResult(list[discord.Attachment]):
+    """The attachments collected by `Dialog.file`.
+
+    Besides being a list of `discord.Attachment`s, attachments can be
+    spooled to temporary files in chunks and accessed as memoryviews, or
+    streamed with `iter_chunks`, instead of loading each with
+    `discord.Attachment.read`. The bytes spooled by every `FileResult` in
+    the process are capped by `FileResult.budget`.
+    """
+    budget = SpoolBudget(256 * 1024 * 1024)
+
+    def __init__(self, attachments: typing.Iterable[discord.Attachment] = (),
+                 inspector: AttachmentInspector | None = None) -> None:
+        super().__init__(attachments)
+        self._inspector = inspector
+        self._owns_inspector = False
+        self._spooled: dict[int, SpooledAttachment] = {}
+        self._prefetched: dict[int, typing.BinaryIO] = {}
+        # the (channel_id, message_id) each attachment was sent in, so it
+        # can be fetched again later (e.g. when a `Form` is resumed)
+        self.sources: dict[int, tuple[int, int]] = {}
+
+    @property
+    def inspector(self) -> AttachmentInspector:
+        if self._inspector is None:
+            self._inspector = AttachmentInspector()
+            self._owns_inspector = True
+        return self._inspector
+
+    def add(self, message: discord.Message) -> None:
+        """Add the attachments of `message`, remembering where they were
+        sent.
+
+        """
+        for attachment in message.attachments:
+            self.sources[attachment.id] = (message.channel.id, message.id)
+        self.extend(message.attachments)
+
+    def adopt(self, inspector: AttachmentInspector) -> None:
+        """Take over the contents `inspector` prefetched for these
+        attachments, so they outlive it.
+
+        """
+        for attachment in self:
+            fp = inspector.take(attachment)
+            if fp is not None:
+                self._prefetched[attachment.id] = fp
+
+    def iter_chunks(self, attachment: discord.Attachment
+                    ) -> typing.AsyncIterator[bytes]:
+        return self.inspector.stream(attachment)
+
+    async def spool(self, attachment: discord.Attachment
+                    ) -> SpooledAttachment:
+        spooled = self._spooled.get(attachment.id)
+        if spooled is not None:
+            return spooled
+        await self.budget.acquire(attachment.size)
+        try:
+            # contents prefetched while the dialog ran are reused as is
+            fp = self._prefetched.pop(attachment.id, None)
+            if fp is None:
+                fp = self.inspector.take(attachment)
+            if fp is None:
+                fp = tempfile.TemporaryFile()
+                try:
+                    async for chunk in self.inspector.stream(attachment):
+                        fp.write(chunk)
+                except BaseException:
+                    fp.close()
+                    raise
+                fp.seek(0)
+        except BaseException:
+            self.budget.release(attachment.size)
+            raise
+        spooled = self._spooled[attachment.id] = SpooledAttachment(
+                attachment, fp, self.budget)
+        return spooled
+
+    async def spool_all(self) -> list[SpooledAttachment]:
+        return list(await asyncio.gather(*(self.spool(a) for a in self)))
+
+    async def close(self) -> None:
+        for spooled in self._spooled.values():
+            spooled.close()
+        self._spooled.clear()
+        for fp in self._prefetched.values():
+            fp.close()
+        self._prefetched.clear()
+        if self._inspector is not None:
+            if self._owns_inspector:
+                await self._inspector.close()
+            else:
+                self._inspector.discard(self)
+
+    async def __aenter__(self) -> "FileResult":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
@@ -0,0 +1,174 @@
+import threading
+import sqlite3
+import asyncio
+import typing
+import json
+import time
+
+
+class Checkpoint(typing.NamedTuple):
+    """The saved progress of a `Form` run.
+
+    `values` holds the JSON-encoded results of the fields answered so far
+    and `step` the index of the next field. When `prompted` is True, the
+    prompt for that field has already been sent (as `message_ids`) and
+    will be answerable until `deadline`, a unix timestamp.
+    """
+    key: str
+    form: str
+    channel_id: int
+    user_id: int
+    step: int
+    values: dict[str, typing.Any]
+    prompted: bool = False
+    deadline: float | None = None
+    message_ids: tuple[int, ...] = ()
+    updated: float = 0
+
+
+class DialogStateStore:
+    """Stores `Form` checkpoints so runs can be resumed after a restart.
+
+    `save` and `delete` only queue a write; implementations may batch
+    queued writes and perform them on `flush`.
+    """
+    def save(self, checkpoint: Checkpoint) -> None:
+        raise NotImplementedError()
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError()
+
+    async def load(self, key: str) -> Checkpoint | None:
+        raise NotImplementedError()
+
+    async def pending(self, form: str | None = None) -> list[Checkpoint]:
+        raise NotImplementedError()
+
+    async def flush(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        await self.flush()
+
+
+class MemoryStateStore(DialogStateStore):
+    def __init__(self) -> None:
+        self._checkpoints: dict[str, Checkpoint] = {}
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        self._checkpoints[checkpoint.key] = checkpoint._replace(
+                updated=time.time())
+
+    def delete(self, key: str) -> None:
+        self._checkpoints.pop(key, None)
+
+    async def load(self, key: str) -> Checkpoint | None:
+        return self._checkpoints.get(key)
+
+    async def pending(self, form: str | None = None) -> list[Checkpoint]:
+        return [c for c in self._checkpoints.values()
+                if form is None or c.form == form]
+
+
+class SQLiteStateStore(DialogStateStore):
+    """A `DialogStateStore` backed by a local SQLite database.
+
+    Writes are buffered per key, so repeated checkpoints of one run
+    collapse into a single row write, and are committed in one
+    transaction (off the event loop) every `flush_interval` seconds or
+    once `batch_size` keys are pending.
+    """
+    def __init__(self, path: str, flush_interval: float = 1.0,
+                 batch_size: int = 100) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._pending: dict[str, Checkpoint | None] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flushing: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS dialog_state ("
+                    "key TEXT PRIMARY KEY, form TEXT NOT NULL, "
+                    "channel_id INTEGER NOT NULL, user_id INTEGER NOT NULL, "
+                    "step INTEGER NOT NULL, \"values\" TEXT NOT NULL, "
+                    "prompted INTEGER NOT NULL, deadline REAL, "
+                    "message_ids TEXT NOT NULL, updated REAL NOT NULL)")
+
+    def _queue(self, key: str, checkpoint: Checkpoint | None) -> None:
+        self._pending[key] = checkpoint
+        if len(self._pending) >= self.batch_size:
+            self._schedule_flush(0)
+        elif self._flush_handle is None:
+            self._schedule_flush(self.flush_interval)
+
+    def _schedule_flush(self, delay: float) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._flush_handle = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._flush_handle = None
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.ensure_future(self.flush())
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        self._queue(checkpoint.key, checkpoint._replace(updated=time.time()))
+
+    def delete(self, key: str) -> None:
+        self._queue(key, None)
+
+    def _write(self, batch: dict[str, Checkpoint | None]) -> None:
+        deletes = [(k,) for k, c in batch.items() if c is None]
+        upserts = [(c.key, c.form, c.channel_id, c.user_id, c.step,
+                    json.dumps(c.values), int(c.prompted), c.deadline,
+                    json.dumps(c.message_ids), c.updated)
+                   for c in batch.values() if c is not None]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM dialog_state WHERE key = ?",
+                                   deletes)
+            self._conn.executemany(
+                    "INSERT OR REPLACE INTO dialog_state VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", upserts)
+
+    async def flush(self) -> None:
+        # batches are written one at a time so an older batch can't
+        # overwrite a newer one
+        async with self._flush_lock:
+            while self._pending:
+                batch, self._pending = self._pending, {}
+                await asyncio.to_thread(self._write, batch)
+
+    def _read(self, where: str, params: tuple) -> list[Checkpoint]:
+        with self._lock:
+            rows = self._conn.execute(
+                    f"SELECT * FROM dialog_state {where}", params).fetchall()
+        return [Checkpoint(key, form, channel_id, user_id, step,
+                           json.loads(values), bool(prompted), deadline,
+                           tuple(json.loads(message_ids)), updated)
+                for (key, form, channel_id, user_id, step, values, prompted,
+                     deadline, message_ids, updated) in rows]
+
+    async def load(self, key: str) -> Checkpoint | None:
+        await self.flush()
+        rows = await asyncio.to_thread(self._read, "WHERE key = ?", (key,))
+        return rows[0] if rows else None
+
+    async def pending(self, form: str | None = None) -> list[Checkpoint]:
+        await self.flush()
+        if form is None:
+            return await asyncio.to_thread(self._read, "", ())
+        return await asyncio.to_thread(self._read, "WHERE form = ?", (form,))
+
+    async def close(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        await self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,92 @@
+import contextlib
+import asyncio
+import typing
+
+
+T = typing.TypeVar("T")
+
+
+class _End(typing.NamedTuple):
+    # what ended the source; None when it was exhausted
+    exc: Exception | None
+
+
+async def _pump(source: typing.AsyncIterator[T], queue: asyncio.Queue
+                ) -> None:
+    async with contextlib.aclosing(source):
+        async for item in source:
+            await queue.put(item)
+
+
+async def buffered(source: typing.AsyncIterator[T], buffer: int = 16,
+                   batch_size: int = None, batch_interval: float = None,
+                   guard: typing.Callable[[typing.Awaitable],
+                                          typing.Awaitable] = None
+                   ) -> typing.AsyncIterator[T | list[T]]:
+    """Read `source` in a task, holding up to `buffer` unconsumed items.
+
+    The source is only read ahead while the buffer has room, so a slow
+    consumer slows down reading instead of items piling up. With
+    `batch_size` or `batch_interval`, items are yielded as lists of at
+    most `batch_size` items, each yielded at most `batch_interval`
+    seconds after its first item arrived. `guard` wraps the reading
+    task (e.g. `Lease.guard`). Exceptions raised by the source are
+    raised here once the items before them have been yielded.
+    """
+    if buffer < 1:
+        raise ValueError("buffer must be greater than or equal to 1")
+    if batch_size is not None and batch_size < 1:
+        raise ValueError("batch_size must be greater than or equal to 1")
+    queue: asyncio.Queue[T | _End] = asyncio.Queue(buffer)
+
+    async def read() -> None:
+        try:
+            pump = _pump(source, queue)
+            await (guard(pump) if guard is not None else pump)
+            end = _End(None)
+        except Exception as exc:
+            end = _End(exc)
+        # the end marker may wait for room like any other item
+        await queue.put(end)
+
+    reader = asyncio.ensure_future(read())
+    batching = batch_size is not None or batch_interval is not None
+    loop = asyncio.get_running_loop()
+    batch: list[T] = []
+    due: float | None = None
+    getter: asyncio.Future | None = None
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(queue.get())
+            # a pending get is kept across batch deadlines, so no item is
+            # lost to a timeout
+            timeout = None if due is None else max(due - loop.time(), 0)
+            await asyncio.wait((getter,), timeout=timeout)
+            if not getter.done():
+                yield batch
+                batch, due = [], None
+                continue
+            item, getter = getter.result(), None
+
+            if isinstance(item, _End):
+                if batch:
+                    yield batch
+                if item.exc is not None:
+                    raise item.exc
+                return
+            if not batching:
+                yield item
+                continue
+            batch.append(item)
+            if batch_interval is not None and due is None:
+                due = loop.time() + batch_interval
+            if batch_size is not None and len(batch) >= batch_size:
+                yield batch
+                batch, due = [], None
+    finally:
+        if getter is not None:
+            getter.cancel()
+        reader.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await reader
@@ -0,0 +1,140 @@
+import discord
+import typing
+import json
+import os
+
+
+DEFAULT_TEMPLATES: dict[str, str] = {
+    "preface": "*`{preface}`*",
+    "postface": "*{postface}*",
+    "cancel": "**`{keyword}`** to cancel",
+    "skip": "**`{keyword}`** to skip",
+    "cancel_or_skip": "You may type {cancel} or {skip}.",
+    "cancel_only": "You may type {cancel}.",
+    "skip_only": "You may type {skip}.",
+    "deadline": ("This dialog will be automatically cancelled "
+                 "<t:{timestamp}:R> if not responded to."),
+}
+
+
+class Catalogue:
+    """The templates dialog embeds are rendered from, per locale.
+
+    `loader` is called with a locale the first time it is asked for, and
+    returns the templates translated for it (any it leaves out are taken
+    from `DEFAULT_TEMPLATES`), or None if there is no translation, in
+    which case the locale's language ("pt" for "pt-BR") is tried before
+    falling back to the defaults. Loaded locales are cached.
+    """
+    def __init__(self, loader: typing.Callable[[str], typing.Mapping[
+                     str, str] | None] = None) -> None:
+        self.loader = loader
+        self._locales: dict[str | None, typing.Mapping[str, str]] = {
+            None: DEFAULT_TEMPLATES}
+
+    @classmethod
+    def from_directory(cls, path: str) -> "Catalogue":
+        """A catalogue of the "<locale>.json" files in `path`.
+
+        """
+        def load(locale: str) -> dict[str, str] | None:
+            try:
+                with open(os.path.join(path, f"{locale}.json"),
+                          encoding="utf-8") as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                return None
+        return cls(load)
+
+    def get(self, locale: str | None) -> typing.Mapping[str, str]:
+        templates = self._locales.get(locale)
+        if templates is None:
+            templates = self._locales[locale] = self._load(locale)
+        return templates
+
+    def _load(self, locale: str) -> typing.Mapping[str, str]:
+        loaded = self.loader and self.loader(locale)
+        if loaded:
+            return {**DEFAULT_TEMPLATES, **loaded}
+        language = locale.partition("-")[0]
+        if language != locale:
+            return self.get(language)
+        return DEFAULT_TEMPLATES
+
+    def clear(self) -> None:
+        """Forget every loaded locale, so they are loaded again on use.
+
+        Dialog embeds compiled from the old templates stay cached until
+        `Formatter.dialog_embed_cache` is invalidated.
+        """
+        self._locales = {None: DEFAULT_TEMPLATES}
+
+
+def _copy_value(value: typing.Any) -> typing.Any:
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        # embed fields are edited in place by `Embed.set_field_at`
+        return [dict(field) for field in value]
+    return value
+
+
+def embed_attrs(embed: discord.Embed, exclude: typing.Container[str] = ()
+                ) -> tuple[tuple[str, typing.Any], ...]:
+    """The attributes `embed` has set, to build copies of it from with
+    `build_embed`.
+
+    """
+    return tuple((attr, getattr(embed, attr))
+                 for attr in discord.Embed.__slots__
+                 if hasattr(embed, attr) and attr not in exclude)
+
+
+def build_embed(cls: type[discord.Embed],
+                attrs: tuple[tuple[str, typing.Any], ...]) -> discord.Embed:
+    # `discord.Embed.copy` round trips through a dict, which costs more
+    # than setting the attributes directly
+    embed = cls.__new__(cls)
+    for attr, value in attrs:
+        setattr(embed, attr, _copy_value(value))
+    return embed
+
+
+class CompiledEmbed:
+    """A dialog embed with everything but its title, preface, body and
+    deadline filled in.
+
+    """
+    __slots__ = ("skeleton", "attrs", "catalogue", "preface", "postface",
+                 "postface_template", "deadline")
+
+    def __init__(self, skeleton: discord.Embed, catalogue: Catalogue,
+                 templates: typing.Mapping[str, str], postface: str) -> None:
+        self.skeleton = skeleton
+        # the attributes the skeleton has set, so copying it doesn't have
+        # to look for the others
+        self.attrs = embed_attrs(skeleton, ("title", "description"))
+        self.catalogue = catalogue
+        self.preface = templates["preface"]
+        # the cancel and skip part of the postface, which doesn't change
+        self.postface = postface
+        self.postface_template = templates["postface"]
+        self.deadline = templates["deadline"]
+
+    def render(self, title: str, preface: str | None, body: str,
+               timestamp: float | None) -> discord.Embed:
+        buf: list[str] = []
+        if preface:
+            buf.append(self.preface.format(preface=preface))
+        buf.append(body)
+        postface = self.postface
+        if timestamp:
+            deadline = self.deadline.format(timestamp=int(timestamp))
+            postface = f"{postface} {deadline}" if postface else deadline
+        if postface:
+            buf.append(self.postface_template.format(postface=postface))
+
+        embed = build_embed(self.skeleton.__class__, self.attrs)
+        embed.title = title if title is None else str(title)
+        embed.description = "\n\n".join(buf)
+        return embed
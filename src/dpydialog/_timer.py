@@ -0,0 +1,123 @@
+import asyncio
+import typing
+import weakref
+import math
+import time
+
+
+def now() -> float:
+    """The clock all dialog deadlines are measured against.
+
+    """
+    return time.monotonic()
+
+
+def deadline(timeout: int | float | None) -> float | None:
+    return timeout and now() + timeout
+
+
+def timestamp(deadline: float | None) -> float | None:
+    """Convert a monotonic deadline into a unix timestamp for display.
+
+    """
+    return deadline and time.time() + (deadline - now())
+
+
+def from_timestamp(timestamp: float | None) -> float | None:
+    """Convert a unix timestamp into a monotonic deadline.
+
+    """
+    return timestamp and now() + (timestamp - time.time())
+
+
+class Timer:
+    """A deadline scheduled on a `TimerWheel`.
+
+    """
+    __slots__ = ("wheel", "deadline", "callback", "tick")
+
+    def __init__(self, wheel: "TimerWheel", deadline: float,
+                 callback: typing.Callable[[], typing.Any], tick: int) -> None:
+        self.wheel = wheel
+        self.deadline = deadline
+        self.callback = callback
+        self.tick = tick
+
+    def cancel(self) -> None:
+        self.wheel.cancel(self)
+
+
+class TimerWheel:
+    """A hashed timer wheel that expires deadlines in batches.
+
+    One wheel exists per event loop. Scheduling and cancelling a timer
+    are O(1), and a single loop callback per tick (only while timers are
+    pending) replaces a timer handle per waiting dialog.
+    """
+    _wheels: ("weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, "
+              "TimerWheel]") = weakref.WeakKeyDictionary()
+
+    def __init__(self, loop: asyncio.AbstractEventLoop,
+                 resolution: float = 0.5, slots: int = 512) -> None:
+        self.loop = loop
+        self.resolution = resolution
+        self._slots: list[set[Timer]] = [set() for _ in range(slots)]
+        self._start = now()
+        self._ticks = 0
+        self._count = 0
+        self._handle: asyncio.TimerHandle | None = None
+
+    @classmethod
+    def get(cls) -> "TimerWheel":
+        loop = asyncio.get_running_loop()
+        wheel = cls._wheels.get(loop)
+        if wheel is None:
+            wheel = cls._wheels[loop] = cls(loop)
+        return wheel
+
+    def __len__(self) -> int:
+        return self._count
+
+    def schedule(self, deadline: float,
+                 callback: typing.Callable[[], typing.Any]) -> Timer:
+        tick = max(math.ceil((deadline - self._start) / self.resolution),
+                   self._ticks + 1)
+        timer = Timer(self, deadline, callback, tick)
+        self._slots[tick % len(self._slots)].add(timer)
+        self._count += 1
+        if self._handle is None:
+            self._schedule_tick()
+        return timer
+
+    def cancel(self, timer: Timer) -> None:
+        slot = self._slots[timer.tick % len(self._slots)]
+        if timer in slot:
+            slot.remove(timer)
+            self._count -= 1
+
+    def _schedule_tick(self) -> None:
+        delay = self._start + (self._ticks + 1) * self.resolution - now()
+        self._handle = self.loop.call_later(max(delay, 0), self._advance)
+
+    def _advance(self) -> None:
+        self._handle = None
+        current = int((now() - self._start) / self.resolution)
+
+        # collect every expired timer first so callbacks that schedule
+        # new timers don't land in a slot we are still walking
+        expired: list[Timer] = []
+        ticks = range(self._ticks + 1, current + 1)
+        if len(ticks) > len(self._slots):
+            ticks = ticks[-len(self._slots):]
+        for tick in ticks:
+            slot = self._slots[tick % len(self._slots)]
+            due = [t for t in slot if t.tick <= current]
+            slot.difference_update(due)
+            expired.extend(due)
+        self._ticks = current
+        self._count -= len(expired)
+
+        for timer in expired:
+            timer.callback()
+        if self._count and self._handle is None:
+            self._schedule_tick()
@@ -0,0 +1,80 @@
+from ._instrument import Event, Instrumentation
+from . import _instrument
+from . import _timer
+import discord
+import typing
+import json
+
+
+class TraceRecorder:
+    """Writes dialog events to an append-only JSON lines trace.
+
+    Each line is one event, with its time (`t`, seconds since the
+    recorder was created), name (`e`), dialog kind (`k`), channel and
+    user (`c`, `u`), and, where present, its duration (`d`) and attempt
+    (`a`). Received messages record their content (`m`) and attachments
+    (`f`, as [filename, content_type, size]), received interactions
+    their data (`i`), and sent embeds their dict form (`x`).
+
+    Traces can be replayed offline with `benchmarks.replay`.
+    """
+    def __init__(self, instrumentation: Instrumentation,
+                 fp: str | typing.TextIO) -> None:
+        if isinstance(fp, str):
+            self._fp: typing.TextIO = open(fp, "a", encoding="utf-8")
+            self._owns_fp = True
+        else:
+            self._fp = fp
+            self._owns_fp = False
+        self._start = _timer.now()
+        self.instrumentation = instrumentation
+        instrumentation.subscribe(self.record)
+
+    def record(self, event: Event) -> None:
+        line: dict[str, typing.Any] = {"t": round(event.time - self._start, 6),
+                                       "e": event.name, "k": event.kind}
+        if event.identity is not None:
+            line["c"], line["u"] = event.identity
+        if event.duration is not None:
+            line["d"] = round(event.duration, 6)
+        if event.attempt is not None:
+            line["a"] = event.attempt
+        data = event.data
+        if event.name == _instrument.MESSAGE_RECEIVED:
+            if isinstance(data, discord.Interaction):
+                line["i"] = data.data
+            else:
+                line["m"] = data.content
+                if data.attachments:
+                    line["f"] = [[a.filename, a.content_type, a.size]
+                                 for a in data.attachments]
+        elif isinstance(data, discord.Embed):
+            line["x"] = data.to_dict()
+        self._fp.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+    def flush(self) -> None:
+        self._fp.flush()
+
+    def close(self) -> None:
+        self.instrumentation.unsubscribe(self.record)
+        if self._owns_fp:
+            self._fp.close()
+        else:
+            self._fp.flush()
+
+
+def read_trace(fp: str | typing.TextIO) -> typing.Iterator[dict[str,
+                                                                 typing.Any]]:
+    """Iterate over the events of a trace written by `TraceRecorder`.
+
+    A partially written last line (e.g. after a crash) is skipped.
+    """
+    if isinstance(fp, str):
+        with open(fp, encoding="utf-8") as f:
+            yield from read_trace(f)
+        return
+    for line in fp:
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
@@ -1,20 +1,56 @@
+from . import _attachments
 from . import _formatter
+from . import _search
+from . import _spool
+from . import _timer
 from . import types
 import typing
 import discord
+import functools
+import itertools
 import re
 import mimetypes
-import time
+
+
+# splits on unescaped commas, along with any surrounding whitespace
+COMMAS = re.compile(r"(?<!\\)(?:\s+)?,(?:\s+)?")
+
+
+@functools.cache
+def mimetype_extensions() -> dict[str, tuple[str, ...]]:
+    """Return a mapping of mimetypes to their extensions.
+
+    The table is built from `mimetypes.types_map` on first use.
+    """
+    table: dict[str, list[str]] = {}
+    for ext, mtype in mimetypes.types_map.items():
+        table.setdefault(mtype, []).append(ext)
+    return {mtype: tuple(exts) for mtype, exts in table.items()}
 
 
 def plural(value: int | float) -> typing.Literal[""] | typing.Literal["s"]:
     return "s" if abs(value) == 1 else ""
 
 
+def _index_key(lookup: dict[str, int], keys: typing.Sequence[str], i: int,
+               normalize: typing.Callable[[str], str] | None) -> None:
+    # map the (normalized) key to the index of its first occurrence, which
+    # is what `keys.index` would have returned; distinct keys that only
+    # differ in case or whitespace could never both be chosen
+    key = keys[i]
+    first = lookup.setdefault(normalize(key) if normalize else key, i)
+    if keys[first] != key:
+        raise ValueError(f"the keys {keys[first]!r} and {key!r} collide once "
+                         "normalized")
+
+
 class PromptFormatter(_formatter.Formatter[type[types.MISSING]]):
-    def get_all(self, body: str, continue_keyword: str | None, length: int | None):
+    kind = "prompt"
+
+    def get_all(self, body: str, continue_keyword: str | None, length: int | None,
+                deadline: float | None = None):
         return (self.preface(continue_keyword),
-                self.body(body, length),
+                self.body(body, length, deadline),
                 self.checkfn(continue_keyword))
 
     def preface(self, continue_keyword: str | None):
@@ -23,15 +59,32 @@ class PromptFormatter(_formatter.Formatter[type[types.MISSING]]):
         return (f"This is a prompt dialog. Please read the below, and type '{continue_keyword}' "
                 "once finished.")
     
-    def body(self, body: str, length: int | None):
+    def body(self, body: str, length: int | None,
+             deadline: float | None = None):
         if not length:
             return body
+        # `deadline` is the monotonic deadline the prompt continues at
+        if deadline is None:
+            deadline = _timer.deadline(length)
         
         # we add an extra second to make it more seemless; without, it
         # will often get to "2 seconds ago" before actually moving on
         return (f"{body}\n\n*This prompt will automatically continue "
-                f"<t:{int(time.time() + length + 1)}:R>.*")
+                f"<t:{int(_timer.timestamp(deadline) + 1)}:R>.*")
     
+    def components(self, token: str, continue_keyword: str | None
+                   ) -> list[discord.ui.Item]:
+        if not continue_keyword:
+            return []
+        return [discord.ui.Button(label=continue_keyword.capitalize(),
+                                  style=discord.ButtonStyle.primary,
+                                  custom_id=f"{token}:continue")]
+
+    def component_checkfn(self):
+        def cf(interaction: discord.Interaction) -> type[types.MISSING]:
+            return types.MISSING
+        return cf
+
     def checkfn(self, continue_keyword: str | None):
         def cf(message: discord.Message) -> type[types.MISSING] | None:
             if (continue_keyword is not None and message.content
@@ -41,6 +94,8 @@ class PromptFormatter(_formatter.Formatter[type[types.MISSING]]):
 
 
 class TextFormatter(_formatter.Formatter[str]):
+    kind = "text"
+
     def get_all(self, embed_base: dict | discord.Embed, body: str | None):
         return (self.preface(body),
                 self.body(body),
@@ -54,16 +109,17 @@ class TextFormatter(_formatter.Formatter[str]):
         return body or "Please type your response below."
     
     def checkfn(self, embed_base: dict):
+        no_text_msg = "*Your response must include text.*"
         def cf(message: discord.Message) -> str | discord.Embed:
             if not message.content:
-                return self.error_embed(embed_base,
-                                        description=("*Your response must "
-                                                     "include text.*"))
+                return self.error_embed(embed_base, description=no_text_msg)
             return message.content
         return cf
 
 
 class NumberFormatter(_formatter.Formatter[float]):
+    kind = "number"
+
     def get_all(self, embed_base: dict | discord.Embed, body: str,
                 min_value: int | float | None, max_value: int | float | None):
         return (self.preface(body, min_value, max_value),
@@ -106,11 +162,11 @@ class NumberFormatter(_formatter.Formatter[float]):
     def checkfn(self, embed_base: dict | discord.Embed,
                 min_value: int | float | None,
                 max_value: int | float | None):
+        no_text_msg = "*Your response must include text.*"
+        invalid_msg = f"*{self.body(None, min_value, max_value)}*"
         def cf(message: discord.Message) -> float | discord.Embed:
             if not message.content:
-                return self.error_embed(embed_base,
-                                        description=("*Your response must "
-                                                     "include text.*"))
+                return self.error_embed(embed_base, description=no_text_msg)
             try:
                 value = float(message.content.strip())
                 if min_value is not None and max_value is not None:
@@ -121,20 +177,30 @@ class NumberFormatter(_formatter.Formatter[float]):
                     assert max_value >= value
                 return value
             except (ValueError, AssertionError):
-                body = self.body(None, min_value, max_value)
-                return self.error_embed(embed_base, description=f"*{body}*")
+                return self.error_embed(embed_base, description=invalid_msg)
         return cf
 
 
 class ChoiceFormatter(_formatter.Formatter[tuple[tuple[str, ...],
                                            tuple[int, ...]]]):
+    kind = "choice"
+    # the number of matches shown when a search is ambiguous
+    search_limit = 25
+    # the number of options a select menu can hold
+    component_limit = 25
+
     def get_all(self, embed_base: dict | discord.Embed, body: str | None, choices: list[str],
                 keys: list[str] | None, min_choices: int | None, max_choices: int | None,
-                remove_duplicates: bool):
+                remove_duplicates: bool, case_insensitive: bool = False,
+                normalize_whitespace: bool = False,
+                search: _search.ChoiceIndex | None = None,
+                render: typing.Callable[[str | None, str],
+                                        types.Rerender] | None = None):
         return (self.preface(min_choices, max_choices),
                 self.body(body, choices, keys),
                 self.checkfn(embed_base, choices, keys, min_choices,
-                             max_choices, remove_duplicates))
+                             max_choices, remove_duplicates, case_insensitive,
+                             normalize_whitespace, search, render))
 
     def preface(self, min_choices: int | None, max_choices: int | None):
         base = "This is a choice dialog that requires you to choose"
@@ -163,104 +229,473 @@ class ChoiceFormatter(_formatter.Formatter[tuple[tuple[str, ...],
         if body:
             return f"{body}\n\n{body_}"
         return body_
+
+    def component_preface(self, min_choices: int | None,
+                          max_choices: int | None) -> str:
+        base = "This is a choice dialog that requires you to choose"
+        end = "from the menu below."
+        if min_choices is None and max_choices is None:
+            return f"{base} 1 choice {end}"
+        if min_choices is None:
+            return f"{base} at most {max_choices} choices {end}"
+        if max_choices is None:
+            return f"{base} at least {min_choices} choices {end}"
+        if min_choices == max_choices:
+            noun = "choice" if min_choices == 1 else "choices"
+            return f"{base} {min_choices} {noun} {end}"
+        return (f"{base} between {min_choices} and {max_choices} (inclusive) "
+                f"choices {end}")
+
+    def components(self, token: str, choices: list[str],
+                   min_choices: int | None, max_choices: int | None
+                   ) -> list[discord.ui.Item]:
+        if len(choices) > self.component_limit:
+            raise ValueError(f"at most {self.component_limit} choices can "
+                             "be shown as a select menu")
+        if min_choices is None and max_choices is None:
+            min_choices = max_choices = 1
+        # option values are indexes, so labels needn't be unique
+        options = [discord.SelectOption(label=c[:100], value=str(i))
+                   for i, c in enumerate(choices)]
+        return [discord.ui.Select(custom_id=f"{token}:select",
+                                  options=options,
+                                  min_values=min_choices or 1,
+                                  max_values=min(max_choices or len(choices),
+                                                 len(choices)))]
+
+    def component_checkfn(self, embed_base: dict, choices: list[str],
+                          min_choices: int | None, max_choices: int | None):
+        if min_choices is None and max_choices is None:
+            min_choices = max_choices = 1
+        invalid_msg = "*Your selection is not valid for this dialog.*"
+        def cf(interaction: discord.Interaction
+               ) -> tuple[tuple[str, ...], tuple[int, ...]] | discord.Embed:
+            # discord enforces the bounds of the select menu, but the
+            # payload comes from the client, so it's checked again here
+            try:
+                indexes = [int(v) for v in interaction.data.get("values", [])]
+            except ValueError:
+                return self.error_embed(embed_base, description=invalid_msg)
+            if (not all(0 <= i < len(choices) for i in indexes)
+                or len(set(indexes)) != len(indexes)
+                or (min_choices is not None and len(indexes) < min_choices)
+                or (max_choices is not None and len(indexes) > max_choices)):
+                return self.error_embed(embed_base, description=invalid_msg)
+            return tuple(choices[i] for i in indexes), tuple(indexes)
+        return cf
+
+    def search_body(self, body: str | None, query: str,
+                    matches: typing.Iterable[int],
+                    choices: typing.Sequence[str],
+                    keys: typing.Sequence[str]) -> str:
+        matches = list(matches)
+        shown = matches[:self.search_limit]
+        body_ = "\n".join(f"`{keys[i]}`: *{choices[i]}*" for i in shown)
+        more = (f" (showing the first {len(shown)})"
+                if len(matches) > len(shown) else "")
+        body_ = (f"*Several choices match '{query}'{more}. Type the key of "
+                 f"the one you meant, or a more specific search.*\n\n{body_}")
+        if body:
+            return f"{body}\n\n{body_}"
+        return body_
     
+    @staticmethod
+    def _key_normalizer(case_insensitive: bool, normalize_whitespace: bool
+                        ) -> typing.Callable[[str], str] | None:
+        if case_insensitive and normalize_whitespace:
+            return lambda k: " ".join(k.split()).casefold()
+        if case_insensitive:
+            return str.casefold
+        if normalize_whitespace:
+            return lambda k: " ".join(k.split())
+        return None
+
     def checkfn(self, embed_base: dict, choices: list[str],
                 keys: list[str] | None, min_choices: int | None,
-                max_choices: int | None, remove_duplicates: bool):
-        commas = re.compile(r"(?<!\\)(?:\s+)?,(?:\s+)?")
+                max_choices: int | None, remove_duplicates: bool,
+                case_insensitive: bool = False,
+                normalize_whitespace: bool = False,
+                search: _search.ChoiceIndex | None = None,
+                render: typing.Callable[[str | None, str],
+                                        types.Rerender] | None = None):
+        if search is not None and render is None:
+            raise ValueError("a render function is required when searching")
+        normalize = self._key_normalizer(case_insensitive,
+                                         normalize_whitespace)
+        lookup: dict[str, int] = {}
+        for i in range(len(keys)):
+            _index_key(lookup, keys, i, normalize)
+
+        no_text_msg = "*Your response must include text.*"
+        valid_keys = ", ".join(f"'{k}'" for k in keys)
+        invalid_keys_msg = ("*All of your choices must be valid keys "
+                            "corresponding to one of the above values. The "
+                            f"valid keys for the dialog are: {valid_keys}*")
+        if (min_choices is not None and max_choices is not None
+            and min_choices == max_choices):
+            count_msg = f"*You must choose {min_choices} of the above.*"
+        elif min_choices is not None and max_choices is not None:
+            count_msg = (f"*You must choose between {min_choices} and "
+                         f"{max_choices} of the above.*")
+        elif min_choices is None and max_choices is not None:
+            count_msg = f"*You must choose at most {max_choices} of the above.*"
+        elif min_choices is not None and max_choices is None:
+            count_msg = (f"*You must choose at least {min_choices} of the "
+                         "above.*")
+        else:
+            count_msg = "*You must choose 1 of the above.*"
         def cf(message: discord.Message
                ) -> tuple[tuple[str, ...], tuple[int, ...]] | discord.Embed:
             if not message.content:
-                return self.error_embed(embed_base,
-                                        description=("*Your response must "
-                                                     "include text.*"))
-            if remove_duplicates:
-                # we use `list(dict.fromkeys())` to remove duplicates while
-                # preserving order; its slower than some other methods, but
-                # simpler, and won't affect runtime in any significant way
-                user_choices = list(dict.fromkeys(re.split(commas,
-                                                           message.content)))
-            else:
-                user_choices = re.split(commas, message.content)
-
+                return self.error_embed(embed_base, description=no_text_msg)
+            user_choices = COMMAS.split(message.content)
+            if normalize:
+                user_choices = [normalize(k) for k in user_choices]
 
-            # ensure all of user's choices are valid
-            if not all(k in keys for k in user_choices):
-                valid_keys = ", ".join(f"'{k}'" for k in keys)
-                return self.error_embed(embed_base,
-                                        description=("*All of your choices "
-                                                     "must be valid keys "
-                                                     "corresponding to one of"
-                                                     " the above values. The "
-                                                     "valid keys for the dialog"
-                                                     f" are: {valid_keys}*"))
+            # ensure all of user's choices are valid; when searching, an
+            # invalid reply is treated as a search query instead
+            try:
+                indexes = [lookup[k] for k in user_choices]
+            except KeyError:
+                matches = search and search.search(message.content,
+                                                   self.search_limit)
+                if not matches:
+                    return self.error_embed(embed_base,
+                                            description=invalid_keys_msg)
+                if len(matches) > 1:
+                    return render(self.preface(min_choices, max_choices),
+                                  self.search_body(None, message.content,
+                                                   matches, choices, keys))
+                indexes = matches
+            if remove_duplicates:
+                # each key maps to a single index, so removing duplicate
+                # indexes (preserving order) is the same as removing
+                # duplicate keys
+                indexes = list(dict.fromkeys(indexes))
 
             # check to make sure number of user choices meet the requirements
-            if (min_choices is not None and max_choices is not None
-                and min_choices == max_choices
-                and len(user_choices) != min_choices):
-                return self.error_embed(embed_base,
-                                        description=(f"*You must choose "
-                                                     f"{min_choices} of "
-                                                     "the above.*"))
-            elif (min_choices is not None and max_choices is not None and not
-                  max_choices >= len(user_choices) >= min_choices):
-                return self.error_embed(embed_base,
-                                        description=(f"*You must choose between"
-                                                     f" {min_choices} and "
-                                                     f"{max_choices} of the "
-                                                     "above.*"))
-            elif (min_choices is None and max_choices is not None and
-                  len(user_choices) > max_choices):
-                return self.error_embed(embed_base,
-                                        description=(f"*You must choose at most"
-                                                     f" {max_choices} of the "
-                                                     "above.*"))
-            elif (min_choices is not None and max_choices is None and
-                  len(user_choices) < min_choices):
-                return self.error_embed(embed_base,
-                                        description=(f"*You must choose at "
-                                                     f"least {min_choices} of "
-                                                     "the above.*"))
-            elif (min_choices is None and max_choices is None
-                  and len(user_choices) != 1):
-                return self.error_embed(embed_base,
-                                        description=(f"*You must choose "
-                                                     f"1 of "
-                                                     "the above.*"))
+            if ((min_choices is not None and len(indexes) < min_choices)
+                or (max_choices is not None and len(indexes) > max_choices)
+                or (min_choices is None and max_choices is None
+                    and len(indexes) != 1)):
+                return self.error_embed(embed_base, description=count_msg)
 
             # prepare and return data
-            indexes = [keys.index(k) for k in user_choices]
             values = [choices[i] for i in indexes]
             return tuple(values), tuple(indexes)
         return cf
 
 
+class LazyChoices:
+    """Materializes (key, choice) pairs from an iterable as they are needed.
+
+    Only the choices up to the furthest page viewed are ever pulled from
+    the underlying iterable, so generators and database cursors can be
+    paged through without being read in full. `check` is called with each
+    key as it is pulled, and may raise to reject it.
+    """
+    def __init__(self, choices: typing.Iterable[str],
+                 keys: typing.Iterable[str] | None = None,
+                 normalize: typing.Callable[[str], str] | None = None,
+                 check: typing.Callable[[str], None] | None = None) -> None:
+        if keys is None:
+            keys = (str(i) for i in itertools.count(1))
+        self._pairs = zip(keys, choices)
+        self._normalize = normalize
+        self._check = check
+        self.keys: list[str] = []
+        self.choices: list[str] = []
+        self.lookup: dict[str, int] = {}
+        self.exhausted = False
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def fill(self, count: int) -> None:
+        while not self.exhausted and len(self.choices) < count:
+            try:
+                key, choice = next(self._pairs)
+            except StopIteration:
+                self.exhausted = True
+                return
+            if self._check is not None:
+                self._check(key)
+            self.keys.append(key)
+            try:
+                _index_key(self.lookup, self.keys, len(self.choices),
+                           self._normalize)
+            except ValueError:
+                del self.keys[-1]
+                raise
+            self.choices.append(choice)
+
+    def has_page(self, page: int, page_size: int) -> bool:
+        # pulling one extra choice tells us whether the page exists
+        self.fill(page * page_size + 1)
+        return page >= 0 and len(self.choices) > page * page_size
+
+    def page(self, page: int, page_size: int) -> range:
+        start = page * page_size
+        self.fill(start + page_size)
+        return range(start, min(start + page_size, len(self.choices)))
+
+    def index(self, key: str) -> int | None:
+        return self.lookup.get(self._normalize(key) if self._normalize
+                               else key)
+
+
+class PagedChoiceFormatter(ChoiceFormatter):
+    def __init__(self, next_keyword: str = "next", prev_keyword: str = "prev",
+                 page_keyword: str = "page", finished_keyword: str = "done"
+                 ) -> None:
+        self.next_keyword = next_keyword
+        self.prev_keyword = prev_keyword
+        self.page_keyword = page_keyword
+        self.finished_keyword = finished_keyword
+
+    def get_all(self, embed_base: dict | discord.Embed, body: str | None,
+                choices: typing.Iterable[str],
+                keys: typing.Iterable[str] | None, page_size: int,
+                min_choices: int | None, max_choices: int | None,
+                render: typing.Callable[[str | None, str], types.Rerender],
+                case_insensitive: bool = False,
+                normalize_whitespace: bool = False,
+                search: _search.ChoiceIndex | None = None,
+                remove_duplicates: bool = True):
+        normalize = self._key_normalizer(case_insensitive,
+                                         normalize_whitespace)
+        check = functools.partial(self.check_key,
+                                  single=self._is_single(min_choices,
+                                                         max_choices))
+        # keys given up front are all checked now; lazy ones as they are
+        # pulled (the first page of them below)
+        if isinstance(keys, typing.Collection):
+            keys = list(keys)
+            lookup: dict[str, int] = {}
+            for i, key in enumerate(keys):
+                check(key)
+                _index_key(lookup, keys, i, normalize)
+        lazy = LazyChoices(choices, keys, normalize, check)
+        preface = self.preface(min_choices, max_choices, remove_duplicates)
+        return (preface,
+                self.page_body(body, lazy, 0, page_size, ()),
+                self.checkfn(embed_base, body, lazy, page_size, min_choices,
+                             max_choices, preface, render, search,
+                             remove_duplicates))
+
+    @staticmethod
+    def _is_single(min_choices: int | None, max_choices: int | None) -> bool:
+        return ((min_choices is None and max_choices is None)
+                or min_choices == max_choices == 1)
+
+    def check_key(self, key: str, single: bool = False) -> None:
+        """Raise ValueError if typing `key` would change pages (or finish
+        a multiple choice dialog) instead of choosing it.
+
+        """
+        content = key.strip().lower()
+        number = (content[len(self.page_keyword):].strip()
+                  if content.startswith(self.page_keyword) else "")
+        if (content in (self.next_keyword, self.prev_keyword)
+            or number.isdigit()
+            or (not single and content == self.finished_keyword)):
+            raise ValueError(f"the key {key!r} collides with a navigation "
+                             "keyword")
+
+    def preface(self, min_choices: int | None, max_choices: int | None,
+                remove_duplicates: bool = True):
+        preface = super().preface(min_choices, max_choices)
+        if self._is_single(min_choices, max_choices):
+            return preface
+        if remove_duplicates:
+            again = "type a chosen key again to unselect it"
+        else:
+            again = "keys may be chosen more than once"
+        return (f"{preface} Choices are kept across pages; {again}, and "
+                f"type '{self.finished_keyword}' once finished.")
+
+    def page_body(self, body: str | None, lazy: LazyChoices, page: int,
+                  page_size: int, selected: typing.Collection[int]) -> str:
+        lines = [f"`{lazy.keys[i]}`: *{lazy.choices[i]}*"
+                 + (" **(selected)**" if i in selected else "")
+                 for i in lazy.page(page, page_size)]
+        if lazy.exhausted:
+            pages = -(-len(lazy) // page_size)
+            position = f"Page {page + 1} of {pages}."
+        else:
+            position = f"Page {page + 1}."
+        lines.append(f"\n*{position} Type `{self.next_keyword}`, "
+                     f"`{self.prev_keyword}` or `{self.page_keyword} "
+                     "<number>` to change pages.*")
+        body_ = "\n".join(lines)
+        if body:
+            return f"{body}\n\n{body_}"
+        return body_
+
+    def checkfn(self, embed_base: dict, body: str | None, lazy: LazyChoices,
+                page_size: int, min_choices: int | None,
+                max_choices: int | None, preface: str | None,
+                render: typing.Callable[[str | None, str], types.Rerender],
+                search: _search.ChoiceIndex | None = None,
+                remove_duplicates: bool = True):
+        single = self._is_single(min_choices, max_choices)
+        page = 0
+        selected: list[int] = []
+        # the indexes of every choice shown so far; only their keys may be
+        # chosen, even if later choices were pulled to look ahead
+        shown = set(lazy.page(0, page_size))
+        no_text_msg = "*Your response must include text.*"
+        no_page_msg = "*There is no such page.*"
+        invalid_keys_msg = ("*All of your choices must be valid keys "
+                            "corresponding to one of the values on the pages "
+                            "you have viewed.*")
+        if min_choices is not None and max_choices is not None:
+            count_msg = (f"*You must choose between {min_choices} and "
+                         f"{max_choices} of the choices.*")
+        elif max_choices is not None:
+            count_msg = f"*You must choose at most {max_choices} of the choices.*"
+        else:
+            count_msg = (f"*You must choose at least {min_choices or 1} of "
+                         "the choices.*")
+        def show(new_page: int) -> types.Rerender | discord.Embed:
+            nonlocal page
+            if not lazy.has_page(new_page, page_size):
+                return self.error_embed(embed_base, description=no_page_msg)
+            page = new_page
+            shown.update(lazy.page(page, page_size))
+            return render(preface, self.page_body(body, lazy, page, page_size,
+                                                  selected))
+        def cf(message: discord.Message
+               ) -> (tuple[tuple[str, ...], tuple[int, ...]] | types.Rerender
+                     | discord.Embed):
+            if not message.content:
+                return self.error_embed(embed_base, description=no_text_msg)
+            content = message.content.strip().lower()
+
+            # navigation
+            if content == self.next_keyword:
+                return show(page + 1)
+            if content == self.prev_keyword:
+                return show(page - 1)
+            if content.startswith(self.page_keyword):
+                number = content[len(self.page_keyword):].strip()
+                if number.isdigit():
+                    return show(int(number) - 1)
+
+            # finishing a multiple choice dialog
+            if not single and content == self.finished_keyword:
+                if ((min_choices is not None and len(selected) < min_choices)
+                    or (max_choices is not None
+                        and len(selected) > max_choices)
+                    or not selected):
+                    return self.error_embed(embed_base, description=count_msg)
+                return (tuple(lazy.choices[i] for i in selected),
+                        tuple(selected))
+
+            # selecting choices; only keys that have been shown are valid,
+            # and when searching an invalid reply is treated as a query
+            indexes = [lazy.index(k) for k in COMMAS.split(message.content)]
+            if None in indexes or not shown.issuperset(indexes):
+                matches = search and search.search(message.content,
+                                                   self.search_limit)
+                if not matches:
+                    return self.error_embed(embed_base,
+                                            description=invalid_keys_msg)
+                # the search index and the pages share the same choices,
+                # so matched choices only need to be materialized
+                lazy.fill(max(matches) + 1)
+                if len(matches) > 1:
+                    shown.update(matches)
+                    return render(preface, self.search_body(
+                            body, message.content, matches, lazy.choices,
+                            lazy.keys))
+                indexes = matches
+            if remove_duplicates:
+                indexes = list(dict.fromkeys(indexes))
+            if single:
+                if len(indexes) != 1:
+                    return self.error_embed(embed_base,
+                                            description=("*You must choose 1 "
+                                                         "of the choices.*"))
+                return (lazy.choices[indexes[0]],), (indexes[0],)
+            previous = list(selected)
+            for i in indexes:
+                # without remove_duplicates, choosing a key again counts
+                # it again instead of unselecting it
+                if remove_duplicates and i in selected:
+                    selected.remove(i)
+                else:
+                    selected.append(i)
+            if max_choices is not None and len(selected) > max_choices:
+                selected[:] = previous
+                return self.error_embed(embed_base, description=count_msg)
+            return render(preface, self.page_body(body, lazy, page, page_size,
+                                                  selected))
+        return cf
+
+
 class FileFormatter(_formatter.Formatter[list[discord.Attachment]]):
+    kind = "file"
+
     def get_all(self, embed_base: dict | discord.Embed, body: str,
                 attachments: list[discord.Attachment], min_files: int | None,
                 max_files: int | None, allowed_mimetypes: typing.Iterable[str],
                 allowed_extensions: typing.Iterable[str],
-                finished_keyword: str):
+                finished_keyword: str, max_file_size: int | None = None,
+                max_total_size: int | None = None,
+                inspector: _attachments.AttachmentInspector | None = None):
         return (self.preface(body, min_files, max_files, allowed_mimetypes,
                              allowed_extensions, finished_keyword),
                 self.body(body, min_files, max_files, allowed_mimetypes,
                           allowed_extensions, finished_keyword),
                 self.checkfn(embed_base, attachments, min_files, max_files,
                              allowed_mimetypes, allowed_extensions,
-                             finished_keyword))
+                             finished_keyword, max_file_size, max_total_size,
+                             inspector))
+
+    @staticmethod
+    def _get_allowed_types(allowed_mimetypes: typing.Iterable[str],
+                           allowed_extensions: typing.Iterable[str]
+                           ) -> frozenset[str]:
+        # the mimetypes file contents may be identified as when inspected
+        return frozenset(allowed_mimetypes or ()) | frozenset(
+                mimetypes.types_map[ext] for ext in allowed_extensions
+                if ext in mimetypes.types_map)
 
     @staticmethod
     def _get_allowed_extensions(allowed_mimetypes: typing.Iterable[str],
                                 allowed_extensions: typing.Iterable[str]
-                                ) -> list[str]:
-        allowed_extensions = list(allowed_extensions or [])
-        if allowed_mimetypes:
-            for ext, mtype in mimetypes.types_map.items():
-                if (mtype in allowed_mimetypes
-                    and ext not in allowed_extensions):
-                    allowed_extensions.append(ext)
-        return allowed_extensions
+                                ) -> tuple[str, ...]:
+        # extensions are lowercased and given a leading dot so they can
+        # be matched against the end of a filename
+        exts: dict[str, None] = {}
+        for ext in allowed_extensions or ():
+            ext = ext.lower()
+            exts[ext if ext.startswith(".") else f".{ext}"] = None
+        table = mimetype_extensions()
+        for mtype in allowed_mimetypes or ():
+            exts.update(dict.fromkeys(table.get(mtype, ())))
+        return tuple(exts)
+
+    @staticmethod
+    def _has_extension(filename: str, extensions: frozenset[str]) -> bool:
+        # check every dotted suffix ("x.tar.gz" -> ".tar.gz", ".gz"), so
+        # multi-part extensions match but "x.png.exe" isn't a ".png"
+        filename = filename.lower()
+        i = filename.find(".")
+        while i != -1:
+            if filename[i:] in extensions:
+                return True
+            i = filename.find(".", i + 1)
+        return False
+
+    @staticmethod
+    def _format_size(size: int) -> str:
+        for unit in ("bytes", "KiB", "MiB"):
+            if size < 1024:
+                return f"{size:g} {unit}"
+            size = round(size / 1024, 1)
+        return f"{size:g} GiB"
 
     @staticmethod
     def _make_message(min_files: int | None, max_files: int | None,
@@ -325,9 +760,18 @@ class FileFormatter(_formatter.Formatter[list[discord.Attachment]]):
                 min_files: int | None, max_files: int | None,
                 allowed_mimetypes: typing.Iterable[str],
                 allowed_extensions: typing.Iterable[str],
-                finished_keyword: str):
-        def cf(message: discord.Message
-               ) -> list[discord.Attachment] | discord.Embed | None:
+                finished_keyword: str, max_file_size: int | None = None,
+                max_total_size: int | None = None,
+                inspector: _attachments.AttachmentInspector | None = None):
+        _allowed_extensions = frozenset(self._get_allowed_extensions(
+                allowed_mimetypes, allowed_extensions))
+        allowed_types = self._get_allowed_types(allowed_mimetypes,
+                                                _allowed_extensions)
+        no_files_msg = ("*Unless finishing this dialog, your message must "
+                        "contain one or more files.*")
+        type_phrase = self._types_phrase(allowed_mimetypes, allowed_extensions)
+        wrong_type_msg = f"*All files sent must be {type_phrase}.*"
+        def precheck(message: discord.Message) -> discord.Embed | None:
             # this one is pretty complex, so here are the basic events:
             # 1. ensure user is sending files unless they are finishing
             #    the dialog
@@ -336,17 +780,19 @@ class FileFormatter(_formatter.Formatter[list[discord.Attachment]]):
             # 3. if sending files and mimetypes/extensions have been defined,
             #    ensure all files have an allowed extension (mimetypes get
             #    turned into all their extensions)
-            # 4. if the user is not finishing the dialog, simply return
-            # 5. if the user is finishing the dialog, ensure the number of
+            # 4. if sending files, ensure their sizes (as reported by
+            #    discord, so nothing is downloaded) are within the limits
+            # 5. if an inspector is set, check the contents of the files
+            #    (see `acf`)
+            # 6. if the user is not finishing the dialog, simply return
+            # 7. if the user is finishing the dialog, ensure the number of
             #    files sent meet the requirements (min_files and max_files)
-            # 6. return the attachments
-            _allowed_extensions = self._get_allowed_extensions(
-                    allowed_mimetypes, allowed_extensions)
-            
+            # 8. return the attachments
+
             # make sure there are attachments unless user is finishing dialog
             is_finishing = message.content is not None and message.content.strip().lower() == finished_keyword
             if not is_finishing and not message.attachments:
-                return self.error_embed(embed_base, description=("*Unless finishing this dialog, your message must contain one or more files.*"))
+                return self.error_embed(embed_base, description=no_files_msg)
 
             # make sure user isn't surpassing max number of files
             if message.attachments:
@@ -358,13 +804,28 @@ class FileFormatter(_formatter.Formatter[list[discord.Attachment]]):
             # ensure filetypes are correct
             if _allowed_extensions and message.attachments:
                 for attachment in message.attachments:
-                    filename = attachment.filename.lower()
-                    if not any(ext in filename for ext in _allowed_extensions):
-                        type_phrase = self._types_phrase(allowed_mimetypes,
-                                                         allowed_extensions)
-                        return self.error_embed(embed_base, description=
-                                f"*All files sent must be {type_phrase}.*")
-            attachments.extend(message.attachments)
+                    if not self._has_extension(attachment.filename,
+                                               _allowed_extensions):
+                        return self.error_embed(embed_base,
+                                                description=wrong_type_msg)
+
+            # ensure file sizes are within the limits
+            if max_file_size is not None:
+                for attachment in message.attachments:
+                    if attachment.size > max_file_size:
+                        return self.error_embed(embed_base, description=f"*Files must be at most {self._format_size(max_file_size)} each; {attachment.filename} is {self._format_size(attachment.size)}.*")
+            if max_total_size is not None and message.attachments:
+                total = sum(a.size for a in attachments) + sum(a.size for a in message.attachments)
+                if total > max_total_size:
+                    return self.error_embed(embed_base, description=f"*Addition of these files would surpass the total size of {self._format_size(max_total_size)} allowed by this dialog.*")
+
+        def accept(message: discord.Message
+                   ) -> list[discord.Attachment] | discord.Embed | None:
+            is_finishing = message.content is not None and message.content.strip().lower() == finished_keyword
+            if isinstance(attachments, _spool.FileResult):
+                attachments.add(message)
+            else:
+                attachments.extend(message.attachments)
             
             if not is_finishing:
                 return # causes loop to continue to another wait_for
@@ -382,4 +843,128 @@ class FileFormatter(_formatter.Formatter[list[discord.Attachment]]):
 
             # return the total attachments
             return attachments
-        return cf
+
+        def cf(message: discord.Message
+               ) -> list[discord.Attachment] | discord.Embed | None:
+            embed = precheck(message)
+            if embed is not None:
+                return embed
+            return accept(message)
+
+        async def acf(message: discord.Message
+                      ) -> list[discord.Attachment] | discord.Embed | None:
+            embed = precheck(message)
+            if embed is not None:
+                return embed
+            if message.attachments:
+                rejected = await inspector.inspect(message.attachments,
+                                                   allowed_types)
+                if rejected is not None:
+                    return self.error_embed(embed_base, description=f"*The contents of {rejected.filename} could not be verified as a file{type_phrase}.*")
+            return accept(message)
+
+        return cf if inspector is None else acf
+
+
+class StreamFormatter(_formatter.Formatter[str | list[discord.Attachment]]):
+    """Checks each response of a `Dialog.stream` on its own.
+
+    Responses are texts, or with `files`, the attachments of a message.
+    """
+    kind = "stream"
+
+    def get_all(self, embed_base: dict | discord.Embed, body: str | None,
+                finished_keyword: str, files: bool,
+                allowed_mimetypes: typing.Iterable[str] = None,
+                allowed_extensions: typing.Iterable[str] = None,
+                max_file_size: int | None = None,
+                inspector: _attachments.AttachmentInspector | None = None):
+        return (self.preface(body, finished_keyword, files, allowed_mimetypes,
+                             allowed_extensions),
+                self.body(body, finished_keyword, files, allowed_mimetypes,
+                          allowed_extensions),
+                self.checkfn(embed_base, finished_keyword, files,
+                             allowed_mimetypes, allowed_extensions,
+                             max_file_size, inspector))
+
+    def preface(self, body: str | None, finished_keyword: str, files: bool,
+                allowed_mimetypes: typing.Iterable[str],
+                allowed_extensions: typing.Iterable[str]):
+        if not body:
+            return
+        if files:
+            types_phrase = FileFormatter._types_phrase(allowed_mimetypes,
+                                                       allowed_extensions)
+            return (f"This is a file dialog that accepts any number of "
+                    f"files{types_phrase} over any number of messages. Type "
+                    f"'{finished_keyword}' once finished.")
+        return ("This is a text dialog that accepts any number of messages. "
+                f"Type '{finished_keyword}' once finished.")
+
+    def body(self, body: str | None, finished_keyword: str, files: bool,
+             allowed_mimetypes: typing.Iterable[str],
+             allowed_extensions: typing.Iterable[str]):
+        if body:
+            return body
+        if files:
+            types_phrase = FileFormatter._types_phrase(allowed_mimetypes,
+                                                       allowed_extensions,
+                                                       "`")
+            return (f"Please upload your files{types_phrase} below. Type "
+                    f"`{finished_keyword}` once finished.")
+        return ("Please type your responses below, one per message. Type "
+                f"`{finished_keyword}` once finished.")
+
+    def checkfn(self, embed_base: dict, finished_keyword: str, files: bool,
+                allowed_mimetypes: typing.Iterable[str] = None,
+                allowed_extensions: typing.Iterable[str] = None,
+                max_file_size: int | None = None,
+                inspector: _attachments.AttachmentInspector | None = None):
+        _allowed_extensions = frozenset(FileFormatter._get_allowed_extensions(
+                allowed_mimetypes, allowed_extensions))
+        allowed_types = FileFormatter._get_allowed_types(allowed_mimetypes,
+                                                         _allowed_extensions)
+        type_phrase = FileFormatter._types_phrase(allowed_mimetypes,
+                                                  allowed_extensions)
+        no_text_msg = "*Your response must include text.*"
+        no_files_msg = ("*Unless finishing this dialog, your message must "
+                        "contain one or more files.*")
+        wrong_type_msg = f"*All files sent must be {type_phrase}.*"
+        def cf(message: discord.Message
+               ) -> str | list[discord.Attachment] | discord.Embed | type[
+                   types.MISSING]:
+            # messages with files are never taken as finishing the dialog,
+            # so no files are dropped
+            if ((not files or not message.attachments) and message.content
+                and message.content.strip().lower() == finished_keyword):
+                return types.MISSING
+            if not files:
+                if not message.content:
+                    return self.error_embed(embed_base,
+                                            description=no_text_msg)
+                return message.content
+            if not message.attachments:
+                return self.error_embed(embed_base, description=no_files_msg)
+            for attachment in message.attachments:
+                if (_allowed_extensions
+                    and not FileFormatter._has_extension(
+                        attachment.filename, _allowed_extensions)):
+                    return self.error_embed(embed_base,
+                                            description=wrong_type_msg)
+                if max_file_size is not None and attachment.size > max_file_size:
+                    return self.error_embed(embed_base, description=f"*Files must be at most {FileFormatter._format_size(max_file_size)} each; {attachment.filename} is {FileFormatter._format_size(attachment.size)}.*")
+            return list(message.attachments)
+
+        # contents are checked the same way `FileFormatter` checks them
+        async def acf(message: discord.Message
+                      ) -> list[discord.Attachment] | discord.Embed | type[
+                          types.MISSING]:
+            checkval = cf(message)
+            if not isinstance(checkval, list):
+                return checkval
+            rejected = await inspector.inspect(checkval, allowed_types)
+            if rejected is not None:
+                return self.error_embed(embed_base, description=f"*The contents of {rejected.filename} could not be verified as a file{type_phrase}.*")
+            return checkval
+
+        return acf if files and inspector is not None else cf
@@ -17,3 +17,38 @@ class Cancelled(TimedMessage):
     """The dialog has been cancelled.
     
     """
+
+
+class LeaseError(Exception):
+    def __init__(self, guild_id: int, user_id: int, owner: str | None,
+                 *args) -> None:
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.owner = owner
+        super().__init__(*args)
+
+
+class LeaseHeld(LeaseError):
+    """The user already has a dialog open, possibly in another process.
+    
+    """
+class LeaseLost(LeaseError):
+    """The dialog's lease expired or was handed off to another process.
+    
+    """
+
+
+class Overloaded(Exception):
+    """Too many dialogs are open to admit another one.
+    
+    """
+    def __init__(self, scope: str, *args) -> None:
+        # one of "user", "guild" or "global"
+        self.scope = scope
+        super().__init__(*args)
+
+
+class CheckTimedOut(TimedMessage):
+    """Checking a response took longer than its timeout.
+    
+    """
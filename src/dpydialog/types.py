@@ -6,3 +6,27 @@ class MISSING:
     """Indicates a missing value.
     
     """
+
+
+class Rerender(typing.NamedTuple):
+    """An embed a checkfn returns to show in place of the dialog's prompt
+    (e.g. another page of choices), rather than as a reply to invalid
+    input.
+
+    """
+    embed: typing.Any
+
+
+class Identity(typing.NamedTuple):
+    """The channel and user a dialog is waiting on.
+    
+    """
+    channel_id: int
+    user_id: int
+
+    @classmethod
+    def from_utx(cls, utx: typing.Any) -> "Identity":
+        # `utx` is either a `commands.Context` or a `discord.Interaction`
+        if hasattr(utx, "author"):
+            return cls(utx.channel.id, utx.author.id)
+        return cls(utx.channel_id, utx.user.id)
@@ -0,0 +1,127 @@
+from benchmarks.fakes import Bot, context, settle
+from dpydialog import LeaseKey
+import dpydialog
+import asyncio
+import pytest
+
+
+def test_limits_reject_per_scope():
+    async def main():
+        admission = dpydialog.AdmissionController(max_per_user=1,
+                                                  max_per_guild=2,
+                                                  max_global=3)
+        await admission.acquire(LeaseKey(1, 10))
+        with pytest.raises(dpydialog.exceptions.Overloaded) as info:
+            await admission.acquire(LeaseKey(1, 10))
+        assert info.value.scope == "user"
+        await admission.acquire(LeaseKey(1, 11))
+        with pytest.raises(dpydialog.exceptions.Overloaded) as info:
+            await admission.acquire(LeaseKey(1, 12))
+        assert info.value.scope == "guild"
+        await admission.acquire(LeaseKey(2, 20))
+        with pytest.raises(dpydialog.exceptions.Overloaded) as info:
+            await admission.acquire(LeaseKey(3, 30))
+        assert info.value.scope == "global"
+        admission.release(LeaseKey(1, 10))
+        await admission.acquire(LeaseKey(3, 30))
+        assert admission.active() == 3 and admission.active(guild_id=1) == 1
+    asyncio.run(main())
+
+
+def test_waiting_slots_go_to_the_least_recently_served_guild():
+    async def main():
+        admission = dpydialog.AdmissionController(max_global=1,
+                                                  overflow="wait")
+        await admission.acquire(LeaseKey(1, 10))
+        order = []
+
+        async def wait(key):
+            await admission.acquire(key)
+            order.append(key.guild_id)
+
+        # guild 1 queues two more before guild 2 queues one
+        tasks = [asyncio.ensure_future(wait(LeaseKey(1, 11))),
+                 asyncio.ensure_future(wait(LeaseKey(1, 12))),
+                 asyncio.ensure_future(wait(LeaseKey(2, 20)))]
+        await settle()
+        for key in (LeaseKey(1, 10), LeaseKey(2, 20), LeaseKey(1, 11)):
+            admission.release(key)
+            await settle()
+        await asyncio.gather(*tasks)
+        assert order == [2, 1, 1]
+    asyncio.run(main())
+
+
+def test_waits_time_out_as_overloaded():
+    async def main():
+        admission = dpydialog.AdmissionController(max_per_user=1,
+                                                  overflow="wait",
+                                                  wait_timeout=0.01)
+        await admission.acquire(LeaseKey(1, 10))
+        with pytest.raises(dpydialog.exceptions.Overloaded) as info:
+            await admission.acquire(LeaseKey(1, 10))
+        assert info.value.scope == "user"
+        assert admission.info().waiting == 0
+    asyncio.run(main())
+
+
+def test_dialog_steps_hold_a_slot_until_they_end():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        admission = dpydialog.AdmissionController(max_per_user=1)
+        cfg = dpydialog.Config(bot, None, ctx, admission=admission)
+        task = asyncio.ensure_future(dpydialog.Dialog(cfg).text("Name"))
+        await settle()
+        with pytest.raises(dpydialog.exceptions.Overloaded):
+            await dpydialog.Dialog(cfg).text("Name")
+        await bot.say(ctx, "bob")
+        assert await task == "bob"
+        assert admission.active() == 0
+    asyncio.run(main())
+
+
+def test_concurrent_steps_share_a_slot_until_the_last_ends():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        admission = dpydialog.AdmissionController(max_per_user=1)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   admission=admission))
+        task = asyncio.ensure_future(dialog.text("Name"))
+        await settle()
+        prompt = asyncio.ensure_future(dialog.prompt(
+                "Rules", "Be nice", length=0.6, continue_keyword=None))
+        await settle()
+        await bot.say(ctx, "bob")
+        assert await task == "bob"
+        # the prompt still runs, so the slot is still taken
+        assert admission.active() == 1
+        await prompt
+        assert admission.active() == 0
+    asyncio.run(main())
+
+
+def test_held_dialogs_keep_their_slot_across_steps():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        admission = dpydialog.AdmissionController(max_per_user=1)
+        cfg = dpydialog.Config(bot, None, ctx, admission=admission)
+        async with dpydialog.Dialog(cfg) as dialog:
+            for name in ("bob", "alice"):
+                task = asyncio.ensure_future(dialog.text("Name"))
+                await settle()
+                await bot.say(ctx, name)
+                assert await task == name
+                assert admission.active() == 1
+            # forms run on a held dialog use its slot
+            form = dpydialog.Form([dpydialog.Field("age", "number", "Age?")])
+            task = asyncio.ensure_future(form.run(dialog))
+            await settle()
+            await bot.say(ctx, "30")
+            assert await task == {"age": 30.0}
+            with pytest.raises(dpydialog.exceptions.Overloaded):
+                await dpydialog.Dialog(cfg).text("Name")
+        assert admission.active() == 0
+    asyncio.run(main())
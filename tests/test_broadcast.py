@@ -0,0 +1,69 @@
+from benchmarks.fakes import Bot, context, settle
+import dpydialog
+import asyncio
+import pytest
+
+
+def test_replies_are_collected_per_user():
+    async def main():
+        bot = Bot()
+        ctx = context(bot, user_id=1)
+        broadcast = dpydialog.Dialog(dpydialog.Config(bot, None, ctx)
+                                     ).broadcast(users=[2, 3, 4])
+        task = asyncio.ensure_future(broadcast.number("How many?"))
+        await settle()
+        await bot.say(ctx, "5", user_id=9)
+        await bot.say(ctx, "lots", user_id=2)
+        await bot.say(ctx, "2", user_id=2)
+        await bot.say(ctx, "7", user_id=2)
+        await bot.say(ctx, "3", user_id=3)
+        await bot.say(ctx, "4", user_id=4)
+        assert await asyncio.wait_for(task, 1) == {2: 2.0, 3: 3.0, 4: 4.0}
+        # one prompt, and one error replied to the invalid message
+        (error,) = ctx.channel.sent[1:]
+        assert error["reference"].content == "lots"
+    asyncio.run(main())
+
+
+def test_results_can_be_iterated_as_they_arrive():
+    async def main():
+        bot = Bot()
+        ctx = context(bot, user_id=1)
+        broadcast = dpydialog.Dialog(dpydialog.Config(bot, None, ctx)
+                                     ).broadcast(roles=[5], max_replies=2)
+        seen = []
+
+        async def watch():
+            async for user_id, value in broadcast:
+                seen.append((user_id, value))
+
+        task = asyncio.ensure_future(broadcast.text("Name?"))
+        watcher = asyncio.ensure_future(watch())
+        await settle()
+        await bot.say(ctx, "no role", user_id=2)
+        await bot.say(ctx, "a", user_id=3, roles=[5])
+        await bot.say(ctx, "b", user_id=4, roles=[5, 6])
+        assert await asyncio.wait_for(task, 1) == {3: "a", 4: "b"}
+        await asyncio.wait_for(watcher, 1)
+        assert seen == [(3, "a"), (4, "b")]
+    asyncio.run(main())
+
+
+def test_the_owner_may_cancel_and_open_broadcasts_need_an_end():
+    async def main():
+        bot = Bot()
+        ctx = context(bot, user_id=1)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   cancellable=True))
+        with pytest.raises(ValueError):
+            await dialog.broadcast().text("Name?")
+        broadcast = dialog.broadcast(max_replies=5)
+        task = asyncio.ensure_future(broadcast.text("Name?"))
+        await settle()
+        await bot.say(ctx, "cancel", user_id=2)
+        await bot.say(ctx, "cancel")
+        with pytest.raises(dpydialog.exceptions.Cancelled):
+            await asyncio.wait_for(task, 1)
+        with pytest.raises(ValueError):
+            await broadcast.choice("Pick", ["a", "b"], page_size=1)
+    asyncio.run(main())
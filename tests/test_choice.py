@@ -0,0 +1,147 @@
+from benchmarks.fakes import Bot, context, settle
+import dpydialog
+import asyncio
+import pytest
+
+
+CHOICES = [f"choice {i}" for i in range(1, 11)]
+
+
+def run_choice(replies, panel=False, send_queue=None, **kwargs):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        cfg = dpydialog.Config(bot, None, ctx, panel=panel,
+                               panel_debounce=0, send_queue=send_queue)
+        dialog = dpydialog.Dialog(cfg)
+        task = asyncio.ensure_future(dialog.choice("Pick", iter(CHOICES),
+                                                   **kwargs))
+        await settle()
+        for reply in replies:
+            await bot.say(ctx, reply)
+            await settle()
+        result = await asyncio.wait_for(task, 1)
+        await dialog.close()
+        return result, ctx.channel
+    return asyncio.run(main())
+
+
+def test_pages_are_shown_as_prompts_not_replies():
+    (choices, indexes), channel = run_choice(
+            ["next", "next", "5"], send_queue=dpydialog.SendQueue(),
+            page_size=2)
+    assert choices == ("choice 5",)
+    # the two identical page turns aren't coalesced like error replies,
+    # and aren't sent as replies at all; they edit the prompt in place
+    assert len(channel.sent) == 1
+    prompt = next(m for m in channel.messages.values() if m.author.bot)
+    assert [message for message, _ in channel.edits] == [prompt, prompt]
+    assert "Page 3." in channel.edits[-1][1]["embed"].description
+
+
+def test_pages_edit_the_panel():
+    _, channel = run_choice(["next", "page 3", "5"], panel=True, page_size=2)
+    assert len(channel.sent) == 1
+    # every page replaced the step instead of showing below it
+    assert all(len(edit["embeds"]) == 1 for _, edit in channel.edits)
+    assert "Page 3." in channel.edits[-1][1]["embeds"][0].description
+
+
+def test_only_keys_on_shown_pages_can_be_chosen():
+    # looking for page 3 pulls its first choice, and jumping to page 4
+    # skips page 3, but neither makes a key on an unseen page valid
+    (choices, _), channel = run_choice(["next", "5", "page 4", "5", "7"],
+                                       page_size=2)
+    assert choices == ("choice 7",)
+    assert len(channel.sent) == 3
+    assert all(kwargs["embed"].description.startswith("*All of your choices")
+               for kwargs in channel.sent[1:])
+
+
+def test_paged_multiple_choice_removes_duplicates():
+    (choices, indexes), _ = run_choice(["1, 1, 2", "next", "3", "done"],
+                                       page_size=2, min_choices=1,
+                                       max_choices=5)
+    assert indexes == (0, 1, 2)
+    (choices, indexes), _ = run_choice(["1, 1", "2", "1", "done"],
+                                       page_size=2, min_choices=1,
+                                       max_choices=5, remove_duplicates=False)
+    assert indexes == (0, 0, 1, 0)
+    (choices, indexes), _ = run_choice(["2, 2"], page_size=2)
+    assert indexes == (1,)
+
+
+def test_keys_colliding_with_navigation_are_rejected():
+    formatter = dpydialog.default_formatters.PagedChoiceFormatter()
+    for key in ("next", " Prev", "page 2", "PAGE3"):
+        with pytest.raises(ValueError):
+            run_choice([], page_size=2, keys=[key, "b"])
+    # the finished keyword only navigates in multiple choice dialogs
+    with pytest.raises(ValueError):
+        run_choice([], page_size=2, keys=["done", "b"], min_choices=1,
+                   max_choices=2)
+    (choices, _), _ = run_choice(["done"], page_size=2,
+                                 keys=["done", "page", "pages 2"])
+    assert choices == ("choice 1",)
+    # lazy keys are checked as they are pulled
+    (choices, _), _ = run_choice(["2"], page_size=2,
+                                 keys=(k for k in ("1", "2", "next")))
+    assert choices == ("choice 2",)
+    with pytest.raises(ValueError):
+        run_choice(["next"], page_size=2,
+                   keys=(k for k in ("1", "2", "next")))
+    formatter.check_key("nextt")
+
+
+def run_keyed_choice(replies, keys, **kwargs):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        task = asyncio.ensure_future(dialog.choice("Pick", CHOICES[:3],
+                                                   keys=keys, **kwargs))
+        await settle()
+        for reply in replies:
+            await bot.say(ctx, reply)
+            await settle()
+        return await asyncio.wait_for(task, 1), ctx.channel
+    return asyncio.run(main())
+
+
+def test_keys_can_be_matched_loosely():
+    keys = ["Red", "Dark  Blue", "green"]
+    (choices, _), channel = run_keyed_choice(["red", "Red"], keys)
+    # keys are matched exactly by default
+    assert choices == ("choice 1",)
+    assert len(channel.sent) == 2
+    (choices, _), _ = run_keyed_choice(["rED"], keys, case_insensitive=True)
+    assert choices == ("choice 1",)
+    (choices, _), _ = run_keyed_choice(["Dark Blue"], keys,
+                                       normalize_whitespace=True)
+    assert choices == ("choice 2",)
+    (choices, _), _ = run_keyed_choice([" dark \t BLUE , GREEN"], keys,
+                                       case_insensitive=True,
+                                       normalize_whitespace=True,
+                                       min_choices=2, max_choices=2)
+    assert choices == ("choice 2", "choice 3")
+
+
+def test_keys_colliding_once_normalized_are_rejected():
+    with pytest.raises(ValueError):
+        run_keyed_choice([], ["a", "A", "b"], case_insensitive=True)
+    with pytest.raises(ValueError):
+        run_keyed_choice([], ["a b", "a  b", "c"], normalize_whitespace=True)
+    with pytest.raises(ValueError):
+        run_choice([], page_size=2, keys=["x", "y", "a", "A"],
+                   case_insensitive=True)
+    # lazy keys are checked as they are pulled
+    with pytest.raises(ValueError):
+        run_choice(["next"], page_size=2,
+                   keys=(k for k in ("a", "b", "A")), case_insensitive=True)
+    # without the options, the keys are distinct
+    (choices, _), _ = run_keyed_choice(["A"], ["a", "A", "b"])
+    assert choices == ("choice 2",)
+    # repeating a key is still allowed; the first one is chosen
+    (choices, indexes), _ = run_keyed_choice(["a"], ["a", "a", "b"],
+                                             case_insensitive=True)
+    assert indexes == (0,)
@@ -0,0 +1,121 @@
+from benchmarks.fakes import Bot, context, settle
+from dpydialog import _components
+import dpydialog
+import asyncio
+import pytest
+
+
+def token(ctx) -> str:
+    # the token every component of the latest step starts with
+    view = ctx.channel.sent[-1]["view"]
+    return view.children[0].custom_id.rpartition(":")[0]
+
+
+def test_selections_are_routed_by_token():
+    async def main():
+        bot = Bot()
+        first, second = context(bot, 1, 2), context(bot, 2, 3)
+        one = asyncio.ensure_future(dpydialog.Dialog(dpydialog.Config(
+                bot, None, first)).choice("Pick", ["a", "b"], use_itx=True))
+        two = asyncio.ensure_future(dpydialog.Dialog(dpydialog.Config(
+                bot, None, second)).choice("Pick", ["c", "d"], use_itx=True))
+        await settle()
+        assert len(bot.listeners["on_interaction"]) == 1
+        # unknown tokens are ignored
+        await bot.click(first, "dpydialog:unknown:select", ["0"])
+        click = await bot.click(second, f"{token(second)}:select", ["1"])
+        await bot.click(first, f"{token(first)}:select", ["0"])
+        assert await one == (("a",), (0,))
+        assert await two == (("d",), (1,))
+        # answering strips the components
+        assert click.response.edits == [{"view": None}]
+        assert not _components.ComponentRouter.get(bot)._waiting
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("values", [["2"], ["x"], ["0", "0"], ["0", "1"], []])
+def test_invalid_selections_get_ephemeral_errors(values):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        task = asyncio.ensure_future(dpydialog.Dialog(dpydialog.Config(
+                bot, None, ctx)).choice("Pick", ["a", "b"], use_itx=True))
+        await settle()
+        click = await bot.click(ctx, f"{token(ctx)}:select", values)
+        await settle()
+        [reply] = click.response.sent
+        assert reply["ephemeral"] and "not valid" in reply["embed"].description
+        assert not click.response.edits
+        # the dialog keeps waiting for a valid selection
+        await bot.click(ctx, f"{token(ctx)}:select", ["1"])
+        assert await task == (("b",), (1,))
+    asyncio.run(main())
+
+
+def test_other_users_are_turned_away():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        task = asyncio.ensure_future(dpydialog.Dialog(dpydialog.Config(
+                bot, None, ctx)).choice("Pick", ["a", "b"], use_itx=True))
+        await settle()
+        click = await bot.click(ctx, f"{token(ctx)}:select", ["0"], user_id=9)
+        await settle()
+        assert click.response.sent[0]["ephemeral"]
+        assert not task.done()
+        await bot.click(ctx, f"{token(ctx)}:select", ["0"])
+        assert await task == (("a",), (0,))
+    asyncio.run(main())
+
+
+def test_cancelling_strips_components():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        task = asyncio.ensure_future(dpydialog.Dialog(dpydialog.Config(
+                bot, None, ctx, cancellable=True)).choice(
+                    "Pick", ["a", "b"], use_itx=True))
+        await settle()
+        click = await bot.click(ctx, f"{token(ctx)}:cancel")
+        with pytest.raises(dpydialog.exceptions.Cancelled):
+            await task
+        assert click.response.edits == [{"view": None}]
+    asyncio.run(main())
+
+
+def test_timed_out_and_cancelled_steps_lose_their_components():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   timeout=0.6))
+        with pytest.raises(dpydialog.exceptions.TimedOut):
+            await dialog.choice("Pick", ["a", "b"], use_itx=True)
+        message, kwargs = ctx.channel.edits[-1]
+        assert kwargs == {"view": None} and "view" in ctx.channel.sent[-1]
+
+        task = asyncio.ensure_future(dialog.choice("Pick", ["a", "b"],
+                                                   use_itx=True))
+        await settle()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert len(ctx.channel.edits) == 2
+        assert ctx.channel.edits[-1][1] == {"view": None}
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("kwargs", [{"keys": ["x", "y"]},
+                                    {"remove_duplicates": False}])
+def test_keys_and_duplicates_fall_back_to_typed_replies(kwargs):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        task = asyncio.ensure_future(dpydialog.Dialog(dpydialog.Config(
+                bot, None, ctx)).choice("Pick", ["a", "b"], use_itx=True,
+                                        **kwargs))
+        await settle()
+        assert "view" not in ctx.channel.sent[-1]
+        await bot.say(ctx, kwargs.get("keys", ["1", "2"])[1])
+        assert await task == (("b",), (1,))
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+from benchmarks.fakes import Bot, context
+from dpydialog._config import VALID_FLAGS
+from dpydialog.types import Identity
+import dpydialog
+import pytest
+
+
+def baseline_override(cfg: dpydialog.Config, **kwargs) -> dpydialog.Config:
+    # how override() worked before configs were made immutable: every flag
+    # went through __init__ again
+    flags = {flag: getattr(cfg, flag) for flag in VALID_FLAGS}
+    flags.update(kwargs)
+    return dpydialog.Config(**flags)
+
+
+def flags(cfg: dpydialog.Config) -> dict:
+    return {flag: getattr(cfg, flag) for flag in VALID_FLAGS}
+
+
+def checkfn(message) -> bool:
+    return True
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"identity": None},
+    {"identity": (5, 6)},
+    {"identity_checkfn": checkfn},
+    {"identity_checkfn": checkfn, "identity": None},
+    {"identity_checkfn": None},
+    {"utx": "other"},
+    {"utx": "other", "identity": None},
+    {"timeout": 3, "cancel_keyword": "  STOP "},
+    {"dialog_embed_base": None, "error_embed_base": None},
+])
+def test_override_matches_baseline(kwargs):
+    bot = Bot()
+    ctx = context(bot)
+    other = context(bot, channel_id=7, user_id=8)
+    kwargs = {k: other if v == "other" else v for k, v in kwargs.items()}
+    for cfg in (dpydialog.Config(bot, None, ctx),
+                dpydialog.Config(bot, checkfn, ctx),
+                dpydialog.Config(bot, None, ctx, identity=(3, 4))):
+        assert flags(cfg.override(**kwargs)) == flags(
+                baseline_override(cfg, **kwargs))
+
+
+def test_override_identity_none_waits_on_the_origin():
+    bot = Bot()
+    ctx = context(bot, channel_id=1, user_id=2)
+    cfg = dpydialog.Config(bot, None, ctx, identity=(3, 4))
+    assert cfg.override(identity=None).identity == Identity(1, 2)
+    # an explicit checkfn still opts out of the identity
+    assert cfg.override(identity=None,
+                        identity_checkfn=checkfn).identity is None
+
+
+def test_override_keeps_the_original_and_caches_per_config():
+    bot = Bot()
+    cfg = dpydialog.Config(bot, None, context(bot, channel_id=1))
+    assert cfg.channel_id == 1
+    moved = cfg.override(utx=context(bot, channel_id=9, user_id=2),
+                         identity=None)
+    assert moved.channel_id == 9
+    assert cfg.channel_id == 1
+    assert cfg.override() is cfg
+    with pytest.raises(AttributeError):
+        cfg.timeout = 5
+    with pytest.raises(TypeError):
+        cfg.override(nonsense=1)
@@ -0,0 +1,190 @@
+from benchmarks.fakes import (Attachment, Bot, LocalInspector, Message, context,
+                             settle)
+from dpydialog._spool import SpoolBudget
+import dpydialog
+import discord
+import asyncio
+import gc
+import pytest
+
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(100)
+
+
+def test_results_are_closed_when_the_step_raises():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        inspector = LocalInspector(prefetch="memory")
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   cancellable=True))
+        task = asyncio.ensure_future(dialog.file("Files",
+                                                 inspector=inspector))
+        await settle()
+        await bot.say(ctx, attachments=[Attachment("a.png", size=len(PNG),
+                                                   data=PNG)])
+        await settle()
+        assert len(inspector._prefetched) == 1
+        await bot.say(ctx, "cancel")
+        with pytest.raises(dpydialog.exceptions.Cancelled):
+            await task
+        assert not inspector._prefetched
+        assert not dialog._files
+    asyncio.run(main())
+
+
+def test_finished_results_are_not_kept_by_the_dialog():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        for _ in range(3):
+            task = asyncio.ensure_future(dialog.file("Files"))
+            await settle()
+            await bot.say(ctx, attachments=[Attachment("a.txt")])
+            await bot.say(ctx, "done")
+            result = await task
+            assert len(result) == 1
+        assert len(dialog._files) == 1
+        del result, task
+        await settle()
+        gc.collect()
+        assert not dialog._files
+    asyncio.run(main())
+
+
+def test_dropped_spools_give_back_their_budget():
+    async def main():
+        budget = SpoolBudget(1024)
+        result = dpydialog.FileResult([Attachment("a.png", size=len(PNG),
+                                                  data=PNG)],
+                                      inspector=LocalInspector())
+        result.budget = budget
+        spooled = await result.spool(result[0])
+        assert bytes(spooled.view()) == PNG
+        assert budget.used == len(PNG)
+        del result, spooled
+        gc.collect()
+        assert budget.used == 0
+    asyncio.run(main())
+
+
+class SlowInspector(LocalInspector):
+    async def stream(self, attachment):
+        if attachment.filename.startswith("slow"):
+            # finishes its download after the check has timed out
+            await asyncio.shield(asyncio.sleep(0.05))
+        yield attachment.data
+
+
+def test_inspectors_are_closed_when_the_step_ends():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        inspector = SlowInspector(prefetch="memory")
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   check_timeout=0.01))
+        task = asyncio.ensure_future(dialog.file("Files",
+                                                 inspector=inspector))
+        await settle()
+        await bot.say(ctx, attachments=[Attachment("slow.png", data=PNG)])
+        await settle(0.1)
+        await bot.say(ctx, attachments=[Attachment("a.png", size=len(PNG),
+                                                   data=PNG)])
+        await bot.say(ctx, "done")
+        result = await task
+        # the accepted contents were handed over before the inspector went
+        assert [a.filename for a in result] == ["a.png"]
+        assert not inspector._prefetched
+        async with result:
+            spooled = await result.spool(result[0])
+            assert bytes(spooled.view()) == PNG
+            del spooled
+    asyncio.run(main())
+
+
+def test_config_inspectors_are_shared_and_left_open():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        inspector = LocalInspector(prefetch="memory")
+        cfg = dpydialog.Config(bot, None, ctx, inspector=inspector)
+        for _ in range(2):
+            dialog = dpydialog.Dialog(cfg)
+            task = asyncio.ensure_future(dialog.file("Files"))
+            await settle()
+            await bot.say(ctx, attachments=[Attachment("a.png", data=PNG)])
+            await bot.say(ctx, "done")
+            result = await task
+            # the step prefetched with a scope of the shared inspector
+            assert result.inspector is inspector
+            assert not inspector._prefetched
+            async with result:
+                spooled = await result.spool(result[0])
+                assert bytes(spooled.view()) == PNG
+                del spooled
+        session = inspector.session
+        assert inspector.scope().session is session
+        assert not session.closed
+        await inspector.close()
+        assert session.closed
+    asyncio.run(main())
+
+
+class StallingInspector(LocalInspector):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.cancelled = 0
+
+    async def head(self, attachment):
+        if attachment.filename.startswith("stall"):
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        return await super().head(attachment)
+
+
+def test_inspection_stops_at_the_first_rejection():
+    async def main():
+        inspector = StallingInspector()
+        attachments = [Attachment("stall.png", data=PNG),
+                       Attachment("b.png", data=b"MZ\x90\x00")]
+        rejected = await asyncio.wait_for(
+                inspector.inspect(attachments, {"image/png"}), 1)
+        assert rejected is attachments[1]
+        assert inspector.cancelled == 1
+        await inspector.close()
+    asyncio.run(main())
+
+
+def check_files(filenames, allowed_extensions=None, allowed_mimetypes=None):
+    bot = Bot()
+    ctx = context(bot)
+    formatter = dpydialog.default_formatters.FileFormatter()
+    cf = formatter.checkfn({}, [], None, None, allowed_mimetypes,
+                           allowed_extensions, "done")
+    message = Message(ctx.channel, ctx.author,
+                      attachments=[Attachment(name) for name in filenames])
+    return not isinstance(cf(message), discord.Embed)
+
+
+def test_extensions_match_whole_suffixes():
+    assert check_files(["backup.tar.gz"], [".tar.gz"])
+    assert check_files(["backup.tar.gz"], [".gz"])
+    assert not check_files(["backup.gz"], [".tar.gz"])
+    assert not check_files(["x.png.exe"], [".png"])
+    assert not check_files(["xpng"], ["png"])
+    assert check_files(["X.PNG"], ["png"])
+    assert check_files(["x.png"], ["PNG", "jpg"])
+    assert not check_files(["x.png", "y.gif"], ["png", "jpg"])
+    # mimetypes are turned into their extensions
+    assert check_files(["x.png"], allowed_mimetypes=["image/png"])
+    assert not check_files(["x.png.exe"], allowed_mimetypes=["image/png"])
+
+
+def test_accepted_types_are_shown_with_dots():
+    formatter = dpydialog.default_formatters.FileFormatter()
+    body = formatter.body(None, None, None, None, ["PNG", "jpg"], "done")
+    assert "of type `.png` or `.jpg`." in body
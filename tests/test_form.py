@@ -0,0 +1,141 @@
+from benchmarks.fakes import Attachment, Bot, context, settle
+import dpydialog
+import asyncio
+import pytest
+
+
+FIELDS = [dpydialog.Field("name", "text", "Name?"),
+          dpydialog.Field("photos", "file", "Photos?"),
+          dpydialog.Field("age", "number", "Age?")]
+
+
+def test_forms_ask_each_field_in_turn():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        form = dpydialog.Form(FIELDS)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        task = asyncio.ensure_future(form.run(dialog))
+        await settle()
+        await bot.say(ctx, "bob")
+        await settle()
+        await bot.say(ctx, attachments=[Attachment("a.png")])
+        await bot.say(ctx, "done")
+        await settle()
+        await bot.say(ctx, "30")
+        results = await asyncio.wait_for(task, 1)
+        assert isinstance(results, dpydialog.FormResult)
+        assert results.name == "bob" and results["age"] == 30.0
+        assert [a.filename for a in results["photos"]] == ["a.png"]
+        await dialog.close()
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("sqlite", [False, True])
+def test_resumed_forms_fetch_their_files_again(tmp_path, sqlite):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        if sqlite:
+            # checkpoints round trip through JSON
+            store = dpydialog.SQLiteStateStore(str(tmp_path / "state.db"))
+        else:
+            store = dpydialog.MemoryStateStore()
+        form = dpydialog.Form(FIELDS, name="profile")
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        task = asyncio.ensure_future(form.run(dialog, store))
+        await settle()
+        await bot.say(ctx, "bob")
+        await settle()
+        kept = Attachment("kept.png")
+        await bot.say(ctx, attachments=[kept])
+        gone = await bot.say(ctx, attachments=[Attachment("gone.png")])
+        await bot.say(ctx, "done")
+        await settle()
+        # the process goes down while the age is asked
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        (checkpoint,) = await store.pending("profile")
+        assert checkpoint.step == 2 and checkpoint.prompted
+        del ctx.channel.messages[gone.id]
+
+        (resumed,) = await form.resume(bot, store)
+        await settle()
+        # the prompt sent before the restart is answered, not sent again
+        assert len(ctx.channel.embeds) == 3
+        await bot.say(ctx, "30")
+        results = await asyncio.wait_for(resumed, 1)
+        assert results["name"] == "bob"
+        assert [a.filename for a in results["photos"]] == ["kept.png"]
+        assert not await store.pending("profile")
+        await store.close()
+    asyncio.run(main())
+
+
+def test_sqlite_checkpoints_collapse_per_key(tmp_path):
+    async def main():
+        store = dpydialog.SQLiteStateStore(str(tmp_path / "state.db"),
+                                           flush_interval=60)
+        for step in range(5):
+            store.save(dpydialog.Checkpoint("f:1:2", "f", 1, 2, step,
+                                            {"name": "bob"}, True, None,
+                                            (7, 8)))
+        assert len(store._pending) == 1
+        (checkpoint,) = await store.pending()
+        assert (checkpoint.step, checkpoint.message_ids) == (4, (7, 8))
+        store.delete("f:1:2")
+        assert await store.load("f:1:2") is None
+        await store.close()
+    asyncio.run(main())
+
+
+class Counting(dpydialog.default_formatters.ChoiceFormatter):
+    calls = 0
+
+    def get_all(self, *args, **kwargs):
+        Counting.calls += 1
+        return super().get_all(*args, **kwargs)
+
+
+def test_fields_build_their_checkfn_once():
+    async def main():
+        bot = Bot()
+        form = dpydialog.Form([
+            dpydialog.Field("color", "choice", "Color?", formatter=Counting(),
+                            choices=["red", "blue"], keys=["r", "b"],
+                            case_insensitive=True),
+            dpydialog.Field("shade", "number", "Shade?", min_value=1,
+                            max_value=9, timeout=30,
+                            when=lambda results: results["color"][0]
+                            == ("blue",))])
+        for reply, expected in (("R", {"color": (("red",), (0,))}),
+                                ("b", {"color": (("blue",), (1,)),
+                                       "shade": 5.0})):
+            ctx = context(bot)
+            dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+            task = asyncio.ensure_future(form.run(dialog))
+            await settle()
+            await bot.say(ctx, reply)
+            await settle()
+            if "shade" in expected:
+                # the field's options that aren't arguments override the
+                # config
+                assert "<t:" in ctx.channel.embeds[-1].description
+                await bot.say(ctx, "5")
+            assert await asyncio.wait_for(task, 1) == expected
+        assert Counting.calls == 1
+    asyncio.run(main())
+
+
+def test_results_are_a_read_only_mapping():
+    results = dpydialog.FormResult({"name": "bob", "age": 30.0})
+    assert results.name == "bob" and results["age"] == 30.0
+    assert dict(results) == {"name": "bob", "age": 30.0}
+    assert results == {"name": "bob", "age": 30.0}
+    assert "photos" not in results and results.get("photos") is None
+    with pytest.raises(AttributeError):
+        results.photos
+    with pytest.raises(AttributeError):
+        results.name = "alice"
+    with pytest.raises(TypeError):
+        results["name"] = "alice"
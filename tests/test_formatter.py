@@ -0,0 +1,106 @@
+from benchmarks.fakes import Bot, context
+import dpydialog
+import discord
+
+
+def render(formatter: dpydialog.Formatter, base: dict | discord.Embed,
+           **kwargs) -> discord.Embed:
+    return formatter.dialog_embed("Title", None, "Body", None, True, False,
+                                  "cancel", "skip", base, **kwargs)
+
+
+def baseline_render(base: dict | discord.Embed) -> discord.Embed:
+    # how dialog embeds were built before they were compiled and cached
+    embed_dict = (base.to_dict() if isinstance(base, discord.Embed)
+                  else dict(base))
+    embed_dict.update(title="Title", description="Body\n\n"
+                      "*You may type **`cancel`** to cancel.*")
+    embed = discord.Embed.from_dict(embed_dict)
+    if dpydialog.constants.CREATOR_REFERENCE:
+        embed.set_footer(text=dpydialog.constants.CREATOR_REFERENCE)
+    return embed
+
+
+def test_rendered_embeds_match_baseline():
+    for base in ({}, {"color": 0x123456},
+                 discord.Embed(color=0x654321, url="https://example.com")
+                 .add_field(name="a", value="b")):
+        assert (render(dpydialog.Formatter(), base).to_dict()
+                == baseline_render(base).to_dict())
+
+
+def test_rendered_embeds_are_independent_copies():
+    base = discord.Embed().add_field(name="a", value="b")
+    first = render(dpydialog.Formatter(), base)
+    first.set_field_at(0, name="changed", value="c")
+    assert render(dpydialog.Formatter(), base).fields[0].name == "a"
+
+
+def test_mutated_bases_are_stale_until_invalidated():
+    base = {"color": 0x111111}
+    assert render(dpydialog.Formatter(), base).color.value == 0x111111
+    base["color"] = 0x222222
+    # documented: the compiled embed is keyed on the identity of the base
+    assert render(dpydialog.Formatter(), base).color.value == 0x111111
+    dpydialog.Formatter.dialog_embed_cache.invalidate(base)
+    assert render(dpydialog.Formatter(), base).color.value == 0x222222
+
+
+class Shouting(dpydialog.Formatter):
+    def compile_dialog_embed(self, cancellable, skippable, cancel_keyword,
+                             skip_keyword, embed_base, locale=None):
+        return super().compile_dialog_embed(
+                cancellable, skippable, cancel_keyword, skip_keyword,
+                {**embed_base, "author": {"name": "LOUD"}}, locale)
+
+
+def test_formatter_subclasses_are_cached_separately():
+    base = {}
+    assert render(dpydialog.Formatter(), base).author.name is None
+    assert render(Shouting(), base).author.name == "LOUD"
+    assert render(dpydialog.Formatter(), base).author.name is None
+
+
+def test_locales_come_from_the_catalogue():
+    class Translated(dpydialog.Formatter):
+        catalogue = dpydialog.Catalogue(
+                lambda locale: {"cancel": "**`{keyword}`** pour annuler",
+                                "cancel_only": "Tapez {cancel}."}
+                if locale == "fr" else None)
+    embed = render(Translated(), {}, locale="fr-CA")
+    assert embed.description.endswith("*Tapez **`cancel`** pour annuler.*")
+    assert render(Translated(), {}, locale="de").description.endswith(
+            "*You may type **`cancel`** to cancel.*")
+
+
+def test_default_bases_are_shared_across_configs():
+    bot = Bot()
+    first = dpydialog.Config(bot, None, context(bot))
+    second = dpydialog.Config(bot, None, context(bot))
+    assert first.dialog_embed_base is second.dialog_embed_base
+    formatter = dpydialog.Formatter()
+    render(formatter, first.dialog_embed_base)
+    hits = formatter.dialog_embed_cache.info().hits
+    render(formatter, second.dialog_embed_base)
+    assert formatter.dialog_embed_cache.info().hits == hits + 1
+
+
+def test_error_embeds_are_independent_copies():
+    formatter = dpydialog.Formatter()
+    base = {"color": 0x123456}
+    first = formatter.error_embed(base, description="Invalid")
+    first.description = "changed"
+    first.add_field(name="a", value="b")
+    second = formatter.error_embed(base, description="Invalid")
+    assert second is not first
+    assert second.description == "Invalid" and not second.fields
+    assert formatter.error_embed(base, description="Invalid") == second
+
+
+def test_default_error_base_is_shared_across_configs():
+    bot = Bot()
+    first = dpydialog.Config(bot, None, context(bot))
+    second = dpydialog.Config(bot, None, context(bot))
+    assert first.error_embed_base is second.error_embed_base
+    assert (first.error_embed_base["color"]
+            == dpydialog.constants.EMBED_COLOR__NEG)
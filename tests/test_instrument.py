@@ -0,0 +1,136 @@
+from benchmarks.fakes import Bot, context, settle
+from dpydialog import _instrument
+import dpydialog
+import discord
+import asyncio
+import pytest
+
+
+def instrumented(ctx, **cfg_overrides):
+    instrumentation = dpydialog.Instrumentation()
+    events: list[_instrument.Event] = []
+    instrumentation.subscribe(events.append)
+    dialog = dpydialog.Dialog(dpydialog.Config(
+            ctx.bot, None, ctx, instrumentation=instrumentation,
+            **cfg_overrides))
+    return dialog, events
+
+
+def test_events_of_a_step():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog, events = instrumented(ctx)
+        task = asyncio.ensure_future(dialog.number("Age"))
+        await settle()
+        wrong = await bot.say(ctx, "old")
+        right = await bot.say(ctx, "42")
+        assert await task == 42
+
+        assert [e.name for e in events] == [
+            _instrument.DIALOG_START, _instrument.PROMPT_SENT,
+            _instrument.MESSAGE_RECEIVED, _instrument.CHECK_FAILED,
+            _instrument.MESSAGE_RECEIVED, _instrument.CHECK_PASSED,
+            _instrument.DIALOG_END]
+        assert {e.kind for e in events} == {"number"}
+        start, prompt, received, failed, received2, passed, end = events
+        assert start.duration is None
+        assert all(e.duration is not None and e.duration >= 0
+                   for e in events[1:])
+        assert [received.attempt, failed.attempt] == [1, 1]
+        assert [received2.attempt, passed.attempt] == [2, 2]
+        assert received.data is wrong and received2.data is right
+        assert isinstance(prompt.data, discord.Embed)
+        assert isinstance(failed.data, discord.Embed)
+        assert passed.data == 42
+        assert end.duration >= received2.duration
+        assert all(e.identity == dialog.cfg.identity for e in events)
+        assert [e.time for e in events] == sorted(e.time for e in events)
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("outcome", ["cancelled", "skipped", "timed_out"])
+def test_events_of_unanswered_steps(outcome):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog, events = instrumented(ctx, cancellable=True, skippable=True,
+                                      timeout=0.6)
+        task = asyncio.ensure_future(dialog.text("Name"))
+        await settle()
+        if outcome != "timed_out":
+            await bot.say(ctx, {"cancelled": "cancel",
+                                "skipped": "skip"}[outcome])
+        try:
+            await task
+        except (dpydialog.exceptions.Cancelled,
+                dpydialog.exceptions.TimedOut):
+            pass
+        names = [e.name for e in events]
+        assert names[-2:] == [outcome, _instrument.DIALOG_END]
+        assert names.count(_instrument.CHECK_PASSED) == 0
+    asyncio.run(main())
+
+
+def test_no_events_without_instrumentation():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        task = asyncio.ensure_future(dialog.text("Name"))
+        await settle()
+        await bot.say(ctx, "me")
+        assert await task == "me"
+        assert dialog.cfg.instrumentation is None
+    asyncio.run(main())
+
+
+def aggregate(*events: _instrument.Event,
+              buckets=(0.1, 1.0)) -> dpydialog.MetricsAggregator:
+    instrumentation = dpydialog.Instrumentation()
+    metrics = dpydialog.MetricsAggregator(instrumentation, buckets)
+    for event in events:
+        instrumentation.emit(*event)
+    return metrics
+
+
+def test_prometheus_output():
+    metrics = aggregate(
+        ("check_passed", "text", 0.05, 1),
+        ("check_passed", "text", 0.5, 3),
+        ("check_passed", "text", 5.0, 1),
+        ("dialog_start", "text"))
+    lines = metrics.prometheus().splitlines()
+    assert "# TYPE dpydialog_events_total counter" in lines
+    assert 'dpydialog_events_total{event="check_passed",kind="text"} 3' in lines
+    assert 'dpydialog_events_total{event="dialog_start",kind="text"} 1' in lines
+    # buckets are cumulative, with +Inf counting every observation
+    prefix = 'dpydialog_event_duration_seconds_bucket{event="check_passed",kind="text",'
+    assert f'{prefix}le="0.1"}} 1' in lines
+    assert f'{prefix}le="1.0"}} 2' in lines
+    assert f'{prefix}le="+Inf"}} 3' in lines
+    assert ('dpydialog_event_duration_seconds_sum{event="check_passed",'
+            'kind="text"} 5.55') in lines
+    assert ('dpydialog_event_duration_seconds_count{event="check_passed",'
+            'kind="text"} 3') in lines
+    # events without durations have no histogram
+    assert not any('event="dialog_start"' in line and "_bucket" in line
+                   for line in lines)
+    assert 'dpydialog_check_attempts_bucket{kind="text",le="1"} 2' in lines
+    assert 'dpydialog_check_attempts_bucket{kind="text",le="3"} 3' in lines
+    assert 'dpydialog_check_attempts_count{kind="text"} 3' in lines
+
+
+def test_prometheus_label_values_are_escaped():
+    metrics = aggregate(("dialog_start", 'a "quoted"\\kind\n'))
+    assert ('dpydialog_events_total{event="dialog_start",'
+            'kind="a \\"quoted\\"\\\\kind\\n"} 1') in metrics.prometheus()
+
+
+def test_histogram_quantiles():
+    metrics = aggregate(*[("dialog_end", "text", d)
+                          for d in (0.05, 0.05, 0.5, 2.0)])
+    histogram = metrics.durations[("dialog_end", "text")]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
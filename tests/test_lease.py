@@ -0,0 +1,149 @@
+from benchmarks.fakes import Bot, context, settle
+import dpydialog
+import asyncio
+import pytest
+
+
+def coordinator(tmp_path, owner: str, ttl: float = 30.0
+                ) -> dpydialog.LeaseCoordinator:
+    backend = dpydialog.SQLiteLeaseBackend(str(tmp_path / "leases.db"))
+    return dpydialog.LeaseCoordinator(backend, owner=owner, ttl=ttl)
+
+
+def test_leases_are_released_when_the_step_ends(tmp_path):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        leases = coordinator(tmp_path, "a")
+        # never closed, like most callers
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   leases=leases))
+        task = asyncio.ensure_future(dialog.text("Name"))
+        await settle()
+        assert len(leases) == 1
+        await bot.say(ctx, "bob")
+        assert await task == "bob"
+        assert len(leases) == 0
+
+        again = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                  leases=leases))
+        task = asyncio.ensure_future(again.text("Name"))
+        await settle()
+        await bot.say(ctx, "alice")
+        assert await task == "alice"
+        await leases.close()
+    asyncio.run(main())
+
+
+def test_a_user_has_one_dialog_at_a_time(tmp_path):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        a = coordinator(tmp_path, "a")
+        b = coordinator(tmp_path, "b")
+        first = dpydialog.Dialog(dpydialog.Config(bot, None, ctx, leases=a))
+        task = asyncio.ensure_future(first.text("Name"))
+        await settle()
+        with pytest.raises(dpydialog.exceptions.LeaseHeld):
+            await dpydialog.Dialog(dpydialog.Config(
+                    bot, None, ctx, leases=a)).text("Name")
+        with pytest.raises(dpydialog.exceptions.LeaseHeld) as info:
+            await b.acquire(dpydialog.LeaseKey(0, 2))
+        assert info.value.owner == "a"
+        # nothing was sent for the rejected dialogs
+        assert len(ctx.channel.sent) == 1
+        await bot.say(ctx, "bob")
+        await task
+        lease = await b.acquire(dpydialog.LeaseKey(0, 2))
+        await lease.release()
+        await a.close()
+        await b.close()
+    asyncio.run(main())
+
+
+def test_forms_hold_the_lease_for_the_whole_run(tmp_path):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        leases = coordinator(tmp_path, "a")
+        form = dpydialog.Form([dpydialog.Field("name", "text", "Name?"),
+                               dpydialog.Field("age", "number", "Age?")])
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   leases=leases))
+        task = asyncio.ensure_future(form.run(dialog))
+        await settle()
+        await bot.say(ctx, "bob")
+        await settle()
+        assert len(leases) == 1
+        await bot.say(ctx, "5")
+        assert await task == {"name": "bob", "age": 5.0}
+        assert len(leases) == 0
+    asyncio.run(main())
+
+
+def test_held_dialogs_keep_the_lease_until_closed(tmp_path):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        a = coordinator(tmp_path, "a")
+        b = coordinator(tmp_path, "b")
+        async with dpydialog.Dialog(dpydialog.Config(
+                bot, None, ctx, leases=a)) as dialog:
+            for name in ("bob", "alice"):
+                task = asyncio.ensure_future(dialog.text("Name"))
+                await settle()
+                await bot.say(ctx, name)
+                assert await task == name
+                # no other process can prompt the user between steps
+                assert len(a) == 1
+                with pytest.raises(dpydialog.exceptions.LeaseHeld):
+                    await b.acquire(dpydialog.LeaseKey(0, 2))
+        assert len(a) == 0
+        lease = await b.acquire(dpydialog.LeaseKey(0, 2))
+        await lease.release()
+        await a.close()
+        await b.close()
+    asyncio.run(main())
+
+
+class FailingBackend(dpydialog.LeaseBackend):
+    def acquire(self, key, owner, ttl):
+        return owner
+
+    def renew(self, keys, owner, ttl):
+        raise OSError("backend unavailable")
+
+    def release(self, keys, owner):
+        pass
+
+
+def test_failed_renewals_lose_the_leases():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        leases = dpydialog.LeaseCoordinator(FailingBackend(), owner="a",
+                                            ttl=0.06)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   leases=leases))
+        with pytest.raises(dpydialog.exceptions.LeaseLost):
+            await asyncio.wait_for(dialog.text("Name"), 1)
+        assert len(leases) == 0
+    asyncio.run(main())
+
+
+def test_handoff_stops_the_waiting_dialog(tmp_path):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        a = coordinator(tmp_path, "a")
+        b = coordinator(tmp_path, "b")
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx, leases=a))
+        task = asyncio.ensure_future(dialog.text("Name"))
+        await settle()
+        assert await a.handoff(dpydialog.LeaseKey(0, 2), "b")
+        with pytest.raises(dpydialog.exceptions.LeaseLost) as info:
+            await task
+        assert info.value.owner == "b"
+        await a.close()
+        await b.close()
+    asyncio.run(main())
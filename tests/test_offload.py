@@ -0,0 +1,144 @@
+from benchmarks.fakes import Bot, context, settle
+from dpydialog import default_formatters
+import concurrent.futures
+import dpydialog
+import threading
+import asyncio
+import pytest
+import time
+
+
+class Checked(dpydialog.Formatter):
+    def __init__(self, checkfn) -> None:
+        self._checkfn = checkfn
+
+    def get_all(self, embed_base, body):
+        return None, "Type something.", self._checkfn
+
+
+def shout(content: str) -> str:
+    return content.upper()
+
+
+def content(message) -> str:
+    return message.content
+
+
+def text(ctx, checkfn, **cfg_overrides) -> asyncio.Future:
+    dialog = dpydialog.Dialog(dpydialog.Config(ctx.bot, None, ctx,
+                                               **cfg_overrides))
+    return asyncio.ensure_future(dialog.text("Title",
+                                             formatter=Checked(checkfn)))
+
+
+def test_offloaded_checkfns_run_in_a_thread_pool():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        threads = []
+        def check(message):
+            threads.append(threading.get_ident())
+            return message.content
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            task = text(ctx, dpydialog.offload(check, executor))
+            await settle()
+            await bot.say(ctx, "hello")
+            assert await task == "hello"
+        assert threads and threads[0] != threading.get_ident()
+    asyncio.run(main())
+
+
+def test_offloaded_checkfns_run_in_a_process_pool():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        with concurrent.futures.ProcessPoolExecutor(1) as executor:
+            # messages can't be pickled, so only their content is sent
+            task = text(ctx, dpydialog.offload(shout, executor,
+                                               extract=content))
+            await settle()
+            await bot.say(ctx, "hello")
+            assert await task == "HELLO"
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("slow", ["coroutine", "offloaded"])
+def test_slow_checks_time_out_and_ask_again(slow):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        calls = []
+        async def coroutine_check(message):
+            calls.append(message.content)
+            if len(calls) == 1:
+                await asyncio.sleep(1)
+            return message.content
+        def thread_check(message):
+            calls.append(message.content)
+            if len(calls) == 1:
+                time.sleep(0.3)
+            return message.content
+        if slow == "coroutine":
+            task = text(ctx, coroutine_check, check_timeout=0.05)
+        else:
+            task = text(ctx, dpydialog.offload(thread_check, timeout=0.05))
+        await settle()
+        await bot.say(ctx, "slow")
+        await settle(0.1)
+        assert "try again" in ctx.channel.embeds[-1].description
+        assert not task.done()
+        await bot.say(ctx, "fast")
+        assert await task == "fast"
+    asyncio.run(main())
+
+
+def test_check_timed_out_is_raised_by_offloaded_checkfns():
+    async def main():
+        checkfn = dpydialog.offload(lambda message: time.sleep(0.2),
+                                    timeout=0.01)
+        with pytest.raises(dpydialog.exceptions.CheckTimedOut):
+            await checkfn("message")
+    asyncio.run(main())
+
+
+class SlowChoices(default_formatters.ChoiceFormatter):
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+
+    def component_checkfn(self, *args):
+        checkfn = super().component_checkfn(*args)
+        async def cf(interaction):
+            await asyncio.sleep(self.delay)
+            return checkfn(interaction)
+        return cf
+
+
+def token(ctx) -> str:
+    view = ctx.channel.sent[-1]["view"]
+    return view.children[0].custom_id.rpartition(":")[0]
+
+
+def test_coroutine_checkfns_in_component_dialogs():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        task = asyncio.ensure_future(dialog.choice(
+                "Pick", ["a", "b"], use_itx=True, formatter=SlowChoices(0.01)))
+        await settle()
+        await bot.click(ctx, f"{token(ctx)}:select", ["1"])
+        assert await task == (("b",), (1,))
+
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   check_timeout=0.05))
+        task = asyncio.ensure_future(dialog.choice(
+                "Pick", ["a", "b"], use_itx=True, formatter=SlowChoices(1)))
+        await settle()
+        click = await bot.click(ctx, f"{token(ctx)}:select", ["1"])
+        await settle(0.1)
+        [reply] = click.response.sent
+        assert reply["ephemeral"] and "in time" in reply["content"]
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(main())
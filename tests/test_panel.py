@@ -0,0 +1,85 @@
+from benchmarks.fakes import Bot, context, settle
+from dpydialog._panel import Panel
+import dpydialog
+import discord
+import asyncio
+import pytest
+
+
+def panel(ctx, debounce: float = 0.05) -> Panel:
+    return Panel(dpydialog.Config(ctx.bot, None, ctx), debounce)
+
+
+def test_renders_are_debounced():
+    async def main():
+        ctx = context(Bot())
+        p = panel(ctx)
+        message = await p.show(discord.Embed(title="1"))
+        assert len(ctx.channel.sent) == 1
+        for title in "234":
+            assert await p.show(discord.Embed(title=title)) is message
+        await settle(0.1)
+        # the burst became a single edit, of the latest step
+        assert p.edits == 1 and len(ctx.channel.sent) == 1
+        [(edited, kwargs)] = ctx.channel.edits
+        assert edited is message and kwargs["embeds"][0].title == "4"
+    asyncio.run(main())
+
+
+def test_replies_are_shown_below_their_step():
+    async def main():
+        ctx = context(Bot())
+        p = panel(ctx)
+        step = discord.Embed(title="step")
+        await p.show(step)
+        await p.reply(discord.Embed(title="error"))
+        await settle(0.1)
+        [(_, kwargs)] = ctx.channel.edits
+        assert [e.title for e in kwargs["embeds"]] == ["step", "error"]
+        # the step's components are kept
+        assert "view" not in kwargs
+    asyncio.run(main())
+
+
+def test_close_flushes_pending_renders():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        async with dpydialog.Dialog(dpydialog.Config(
+                bot, None, ctx, panel=True, panel_debounce=10)) as dialog:
+            task = asyncio.ensure_future(dialog.text("First"))
+            await settle()
+            await bot.say(ctx, "one")
+            assert await task == "one"
+            task = asyncio.ensure_future(dialog.text("Second"))
+            await settle()
+            task.cancel()
+            assert not ctx.channel.edits
+        [(_, kwargs)] = ctx.channel.edits
+        assert kwargs["embeds"][0].title == "Second"
+        assert len(ctx.channel.sent) == 1
+    asyncio.run(main())
+
+
+class Broken:
+    async def edit(self, **kwargs):
+        raise RuntimeError("edit failed")
+
+
+@pytest.mark.parametrize("then", ["show", "reply", "flush"])
+def test_failed_debounced_edits_are_raised(then):
+    async def main():
+        ctx = context(Bot())
+        p = panel(ctx, debounce=0.01)
+        await p.show(discord.Embed(title="1"))
+        p.message = Broken()
+        await p.show(discord.Embed(title="2"))
+        await settle(0.05)
+        with pytest.raises(RuntimeError, match="edit failed"):
+            if then == "flush":
+                await p.flush()
+            else:
+                await getattr(p, then)(discord.Embed(title="3"))
+        # the error is only raised once
+        await p.flush()
+    asyncio.run(main())
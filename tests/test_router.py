@@ -0,0 +1,69 @@
+from benchmarks.fakes import Bot, context, settle
+from dpydialog import _components
+from dpydialog import _router
+import dpydialog
+import asyncio
+import weakref
+import gc
+
+
+def test_messages_are_routed_by_channel_and_user():
+    async def main():
+        bot = Bot()
+        ctx = context(bot, channel_id=1, user_id=2)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        task = asyncio.ensure_future(dialog.text("Name"))
+        await settle()
+        await bot.say(ctx, "someone else", user_id=3)
+        await bot.say(ctx, "me")
+        assert await task == "me"
+        router = _router.DialogRouter.get(bot)
+        assert not router._keyed and not router._unkeyed
+    asyncio.run(main())
+
+
+def test_one_listener_per_bot():
+    async def main():
+        bot = Bot()
+        ctxs = [context(bot, channel_id=i, user_id=i) for i in range(5)]
+        tasks = [asyncio.ensure_future(
+                     dpydialog.Dialog(dpydialog.Config(bot, None, c)).text("x"))
+                 for c in ctxs]
+        await settle()
+        assert len(bot.listeners["on_message"]) == 1
+        for i, ctx in enumerate(ctxs):
+            await bot.say(ctx, str(i))
+        assert await asyncio.gather(*tasks) == ["0", "1", "2", "3", "4"]
+    asyncio.run(main())
+
+
+def test_timeouts_expire_through_the_subscription():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   timeout=0.05))
+        try:
+            await dialog.text("Name")
+        except dpydialog.exceptions.TimedOut:
+            pass
+        else:
+            raise AssertionError("expected TimedOut")
+    asyncio.run(main())
+
+
+def test_routers_do_not_keep_their_bot_alive():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        task = asyncio.ensure_future(dialog.text("Name"))
+        await settle()
+        await bot.say(ctx, "bob")
+        await task
+        assert _router.DialogRouter.get(bot) is _router.DialogRouter.get(bot)
+        _components.ComponentRouter.get(bot)
+        return weakref.ref(bot)
+    ref = asyncio.run(main())
+    gc.collect()
+    assert ref() is None
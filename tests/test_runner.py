@@ -0,0 +1,40 @@
+from benchmarks.fakes import Attachment, Bot, context, settle
+import dpydialog
+import asyncio
+
+
+def test_messages_over_the_input_rate_are_dropped():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   input_rate=(2, 60)))
+        task = asyncio.ensure_future(dialog.number("Age"))
+        await settle()
+        for content in ("a", "b", "c", "d", "5"):
+            await bot.say(ctx, content)
+            await settle()
+        assert not task.done()
+        descriptions = [e.description for e in ctx.channel.embeds[1:]]
+        # two errors, then a single notice for the three dropped messages
+        assert len(descriptions) == 3
+        assert "too quickly" in descriptions[-1]
+        task.cancel()
+    asyncio.run(main())
+
+
+def test_messages_with_attachments_are_never_dropped():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   input_rate=(1, 60)))
+        task = asyncio.ensure_future(dialog.file("Files"))
+        await settle()
+        for name in ("a.txt", "b.txt", "c.txt"):
+            await bot.say(ctx, attachments=[Attachment(name)])
+        await bot.say(ctx, "done", attachments=[Attachment("d.txt")])
+        result = await asyncio.wait_for(task, 1)
+        assert [a.filename for a in result] == ["a.txt", "b.txt", "c.txt",
+                                                "d.txt"]
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+from dpydialog import ChoiceIndex
+
+
+CHOICES = ["Iron Sword", "Sword of Truth", "Wooden Shield", "Iron Helmet"]
+
+
+def test_prefix_fuzzy_and_exact_matches():
+    index = ChoiceIndex(CHOICES)
+    assert index.search("sword") == [0, 1]
+    assert index.search("iron") == [3, 0]
+    assert index.search("  IRON   sword ") == [0]
+    assert index.search("wooden shild") == [2]
+    assert index.search("") == []
+
+
+def test_indexes_are_cached_by_the_identity_of_the_sequence():
+    ChoiceIndex.invalidate()
+    choices = list(CHOICES)
+    index = ChoiceIndex.get(choices)
+    assert ChoiceIndex.get(choices) is index
+    # an equal but distinct sequence isn't looked up by value
+    assert ChoiceIndex.get(list(CHOICES)) is not index
+    # iterators can't be identified, so they are always indexed anew
+    assert ChoiceIndex.get(iter(choices)) is not ChoiceIndex.get(
+            iter(choices))
+
+    choices.append("Iron Boots")
+    assert ChoiceIndex.get(choices) is index
+    ChoiceIndex.invalidate(choices)
+    assert len(ChoiceIndex.get(choices)) == 5
+
+
+def test_the_cache_is_bounded():
+    ChoiceIndex.invalidate()
+    kept = [[str(i)] for i in range(ChoiceIndex.cache_size + 5)]
+    for choices in kept:
+        ChoiceIndex.get(choices)
+    assert len(ChoiceIndex._cache) == ChoiceIndex.cache_size
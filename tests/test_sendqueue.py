@@ -0,0 +1,98 @@
+from benchmarks.fakes import Bot, Channel, Context, Message, User, settle
+import dpydialog
+import asyncio
+import discord
+import pytest
+
+
+def test_sends_are_paced_per_channel():
+    async def main():
+        queue = dpydialog.SendQueue(rate=2, per=0.05)
+        channel, other = Channel(1), Channel(2)
+        started = asyncio.get_running_loop().time()
+        await asyncio.gather(*(queue.send(1, channel.send, content=str(i))
+                               for i in range(4)),
+                             queue.send(2, other.send, content="x"))
+        assert asyncio.get_running_loop().time() - started >= 0.05
+        assert len(channel.sent) == 4 and len(other.sent) == 1
+        info = queue.info()
+        assert info.sent == 5 and info.edited == 0
+        assert info.rate_limit_wait > 0 and info.depth == 0
+    asyncio.run(main())
+
+
+def test_replies_are_coalesced_per_target():
+    async def main():
+        queue = dpydialog.SendQueue()
+        channel = Channel(1)
+        error = discord.Embed(title="cached error")
+        first = await queue.send(1, channel.send, True, "a", embed=error)
+        again = await queue.send(1, channel.send, True, "a", embed=error)
+        assert again is first
+        # error embeds are copies of the cached one, which are equal
+        again = await queue.send(1, channel.send, True, "a",
+                                 embed=error.copy())
+        assert again is first
+        # another user making the same mistake still gets a reply
+        other = await queue.send(1, channel.send, True, "b", embed=error)
+        assert other is not first
+        assert len(channel.sent) == 2
+        assert queue.info().coalesced == 2
+
+        # anything else sent to the channel ends coalescing
+        await queue.send(1, channel.send, content="prompt")
+        await queue.send(1, channel.send, True, "a", embed=error)
+        assert len(channel.sent) == 4
+    asyncio.run(main())
+
+
+def test_edited_replies_stay_with_their_target():
+    async def main():
+        queue = dpydialog.SendQueue(edit_replies=True)
+        channel = Channel(1)
+        one, two = discord.Embed(title="1"), discord.Embed(title="2")
+        first = await queue.send(1, channel.send, True, "a", embed=one)
+        edited = await queue.send(1, channel.send, True, "a", embed=two)
+        assert edited is first and first.edits == [{"embed": two}]
+        # b's reply is new, and a's next reply can't edit above it
+        theirs = await queue.send(1, channel.send, True, "b", embed=one)
+        assert theirs is not first and not theirs.edits
+        await queue.send(1, channel.send, True, "a", embed=one)
+        assert len(first.edits) == 1
+        info = queue.info()
+        # edits are counted once, as edits
+        assert (info.sent, info.edited) == (3, 1)
+        assert len(channel.sent) == 3
+    asyncio.run(main())
+
+
+def test_dialog_errors_are_coalesced_per_user():
+    async def main():
+        bot = Bot()
+        queue = dpydialog.SendQueue()
+        channel = Channel(1)
+        tasks = []
+        for user_id in (2, 3):
+            ctx = Context(Message(channel, User(user_id)), bot)
+            dialog = dpydialog.Dialog(dpydialog.Config(
+                    bot, None, ctx, send_queue=queue))
+            tasks.append(asyncio.ensure_future(dialog.number("Age")))
+        await settle()
+        prompts = len(channel.sent)
+        for user_id in (2, 3, 2):
+            await bot.say(ctx, "not a number", user_id=user_id)
+            await settle()
+        # both users were answered once, the repeat was coalesced
+        assert len(channel.sent) == prompts + 2
+        assert queue.info().coalesced == 1
+        for user_id in (2, 3):
+            await bot.say(ctx, "4", user_id=user_id)
+        assert await asyncio.gather(*tasks) == [4.0, 4.0]
+    asyncio.run(main())
+
+
+def test_invalid_limits_are_rejected():
+    with pytest.raises(ValueError):
+        dpydialog.SendQueue(rate=0)
+    with pytest.raises(ValueError):
+        dpydialog.SendQueue(concurrency=0)
@@ -0,0 +1,92 @@
+from benchmarks.fakes import Attachment, Bot, LocalInspector, context, settle
+import dpydialog
+import asyncio
+import pytest
+
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(100)
+
+
+async def collect(stream) -> list:
+    return [item async for item in stream]
+
+
+def test_texts_are_streamed_until_the_finished_keyword():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        task = asyncio.ensure_future(collect(dialog.stream("Notes")))
+        await settle()
+        for content in ("one", "two", "done", "late"):
+            await bot.say(ctx, content)
+        assert await asyncio.wait_for(task, 1) == ["one", "two"]
+    asyncio.run(main())
+
+
+def test_batches_are_yielded_by_size():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        task = asyncio.ensure_future(collect(dialog.stream("Notes",
+                                                           batch_size=2)))
+        await settle()
+        for content in ("1", "2", "3", "done"):
+            await bot.say(ctx, content)
+            await settle()
+        assert await asyncio.wait_for(task, 1) == [["1", "2"], ["3"]]
+    asyncio.run(main())
+
+
+def test_streamed_files_are_inspected_and_spoolable():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        inspector = LocalInspector(prefetch="memory")
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        task = asyncio.ensure_future(collect(dialog.stream(
+                "Images", files=True, allowed_mimetypes=["image/png"],
+                inspector=inspector)))
+        await settle()
+        # the extension is right, but the contents are not an image
+        await bot.say(ctx, attachments=[Attachment("fake.png",
+                                                   data=b"MZ" + bytes(50))])
+        await settle()
+        await bot.say(ctx, attachments=[Attachment("real.png", size=len(PNG),
+                                                   data=PNG)])
+        await bot.say(ctx, "done")
+        results = await asyncio.wait_for(task, 1)
+        assert "could not be verified" in ctx.channel.embeds[1].description
+        assert [[a.filename for a in r] for r in results] == [["real.png"]]
+        assert isinstance(results[0], dpydialog.FileResult)
+        assert not inspector._prefetched
+        spooled = await results[0].spool(results[0][0])
+        assert bytes(spooled.view()) == PNG
+        del spooled
+        await dialog.close()
+    asyncio.run(main())
+
+
+def test_the_deadline_is_not_extended_by_responses():
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx,
+                                                   timeout=0.6))
+        seen = []
+
+        async def consume():
+            async for item in dialog.stream("Notes"):
+                seen.append(item)
+
+        task = asyncio.ensure_future(consume())
+        # the timer wheel has a resolution of half a second
+        for i in range(5):
+            await settle(0.25)
+            if not task.done():
+                await bot.say(ctx, str(i))
+        with pytest.raises(dpydialog.exceptions.TimedOut):
+            await asyncio.wait_for(task, 1)
+        assert 0 < len(seen) < 5
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+from benchmarks.fakes import Bot, context, settle
+from dpydialog import _timer
+import dpydialog
+import asyncio
+import pytest
+import time
+import re
+
+
+def wheel() -> _timer.TimerWheel:
+    return _timer.TimerWheel(asyncio.get_running_loop(), resolution=0.01,
+                             slots=8)
+
+
+def test_timers_fire_after_their_deadline():
+    async def main():
+        w = wheel()
+        fired: list[float] = []
+        deadline = _timer.now() + 0.05
+        w.schedule(deadline, lambda: fired.append(_timer.now()))
+        assert len(w) == 1
+        await asyncio.sleep(0.1)
+        assert len(fired) == 1 and fired[0] >= deadline
+        assert len(w) == 0
+    asyncio.run(main())
+
+
+def test_cancelled_timers_dont_fire():
+    async def main():
+        w = wheel()
+        fired = []
+        timer = w.schedule(_timer.now() + 0.02, lambda: fired.append(1))
+        timer.cancel()
+        timer.cancel()
+        assert len(w) == 0
+        await asyncio.sleep(0.05)
+        assert fired == []
+    asyncio.run(main())
+
+
+def test_deadlines_beyond_one_rotation():
+    async def main():
+        # 8 slots of 10ms wrap after 80ms
+        w = wheel()
+        fired = []
+        w.schedule(_timer.now() + 0.15, lambda: fired.append("late"))
+        w.schedule(_timer.now() + 0.02, lambda: fired.append("early"))
+        await asyncio.sleep(0.05)
+        assert fired == ["early"]
+        await asyncio.sleep(0.15)
+        assert fired == ["early", "late"]
+    asyncio.run(main())
+
+
+def test_past_deadlines_fire_on_the_next_tick():
+    async def main():
+        w = wheel()
+        fired = []
+        w.schedule(_timer.now() - 1, lambda: fired.append(1))
+        await asyncio.sleep(0.03)
+        assert fired == [1]
+    asyncio.run(main())
+
+
+def test_timestamp_round_trip():
+    deadline = _timer.now() + 30
+    assert abs(_timer.from_timestamp(_timer.timestamp(deadline))
+               - deadline) < 0.01
+    assert _timer.deadline(None) is None
+    assert _timer.timestamp(None) is None
+
+
+def test_prompts_show_the_wheel_deadline(monkeypatch):
+    async def main():
+        bot = Bot()
+        ctx = context(bot)
+        dialog = dpydialog.Dialog(dpydialog.Config(bot, None, ctx))
+        task = asyncio.ensure_future(
+                dialog.prompt("Rules", "Be nice", length=0.6,
+                              continue_keyword=None))
+        await settle()
+        # the wall clock jumping doesn't move the deadline the prompt
+        # continues at, and the shown timestamp is taken from it
+        monkeypatch.setattr(time, "time", lambda: real_time() + 3600)
+        start = _timer.now()
+        await task
+        assert _timer.now() - start < 1
+        shown = int(re.search(r"<t:(\d+):R>",
+                              ctx.channel.embeds[-1].description)[1])
+        assert abs(shown - (real_time() + 0.6 + 1)) < 2
+    real_time = time.time
+    asyncio.run(main())
+
+
+def test_config_timestamp_is_deprecated():
+    bot = Bot()
+    cfg = dpydialog.Config(bot, None, context(bot), timeout=30)
+    with pytest.warns(DeprecationWarning):
+        timestamp = cfg.timestamp
+    assert abs(timestamp - (time.time() + 30)) < 1
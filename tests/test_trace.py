@@ -0,0 +1,54 @@
+from benchmarks.fakes import Bot, context, settle
+from benchmarks import replay
+import dpydialog
+import asyncio
+import io
+
+
+def record() -> str:
+    async def main(fp: io.StringIO):
+        bot = Bot()
+        ctx = context(bot, channel_id=5, user_id=6)
+        instrumentation = dpydialog.Instrumentation()
+        recorder = dpydialog.TraceRecorder(instrumentation, fp)
+        dialog = dpydialog.Dialog(dpydialog.Config(
+                bot, None, ctx, instrumentation=instrumentation))
+        task = asyncio.ensure_future(dialog.text("Name"))
+        await settle()
+        await bot.say(ctx, "")
+        await bot.say(ctx, "Ferris")
+        assert await task == "Ferris"
+        recorder.close()
+    fp = io.StringIO()
+    asyncio.run(main(fp))
+    return fp.getvalue()
+
+
+def test_recorded_traces_read_back():
+    events = list(dpydialog.read_trace(io.StringIO(record())))
+    assert [e["e"] for e in events] == [
+        "dialog_start", "prompt_sent", "message_received", "check_failed",
+        "message_received", "check_passed", "dialog_end"]
+    assert all(e["k"] == "text" and (e["c"], e["u"]) == (5, 6)
+               for e in events)
+    assert [e["m"] for e in events if "m" in e] == ["", "Ferris"]
+    assert [e["a"] for e in events if "a" in e] == [1, 1, 2, 2]
+    assert "x" in events[1] and "x" in events[3]
+    assert [e["t"] for e in events] == sorted(e["t"] for e in events)
+
+
+def test_partial_last_lines_are_skipped():
+    trace = record()
+    events = list(dpydialog.read_trace(io.StringIO(trace + '{"t": 1.0, "e"')))
+    assert len(events) == 7
+
+
+def test_recorded_traces_replay():
+    events = dpydialog.read_trace(io.StringIO(record()))
+    replayer = replay.Replayer(events, speed=0)
+    result = asyncio.run(replayer.run())
+    assert (result.dialogs, result.messages) == (1, 2)
+    # the recorded replies complete the replayed dialog
+    [replayed] = replayer.replayed.values()
+    assert replayed.task.result() == "Ferris"
+    assert result.p99_latency >= result.p50_latency > 0